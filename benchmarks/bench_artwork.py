@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark the per-image saving of the on-demand display rescale in Artwork.
+
+Headless runs (--aws, --export, --json) never access Artwork.img_rescaled, so
+they only pay for the image load. Plotting runs pay for the load plus the
+rescale on first access.
+
+    Typical Usage:
+
+    python3 benchmarks/bench_artwork.py -i "tests/*.png" -r 5
+"""
+
+import argparse
+import sys
+from time import time
+
+from colorkeys.artwork import Artwork
+from colorkeys.constants import _const as CONSTANTS
+from colorkeys import filepath
+
+
+def get_command(args):
+    parser = argparse.ArgumentParser(
+        description = "Artwork Rescale Benchmark"
+    )
+    parser.add_argument(
+        "-i", "--images",
+        action = "append",
+        help = "Image(s) to benchmark",
+        nargs = "+",
+        required = True,
+        type = str,
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        action = "store",
+        default = 3,
+        help = "Number of runs per image",
+        type = int,
+    )
+    args = vars(parser.parse_args(args))
+    return args
+
+
+def bench_artwork(imgsrc, repeat):
+    """Get mean load and rescale times of an image.
+
+    Args:
+        imgsrc (str): Image source location.
+        repeat (int): Number of runs.
+
+    Returns:
+        secs_load (float): Mean seconds to load artwork (headless).
+        secs_rescale (float): Mean seconds to rescale artwork for display.
+    """
+    secs_load = 0.0
+    secs_rescale = 0.0
+    for _ in range(repeat):
+        time_start = time()
+        artwork = Artwork(imgsrc)
+        time_load = time()
+        artwork.img_rescaled
+        time_rescale = time()
+        secs_load += time_load - time_start
+        secs_rescale += time_rescale - time_load
+    return secs_load / repeat, secs_rescale / repeat
+
+
+def main():
+    args = get_command(sys.argv[1:])
+    imgsrcs = filepath.get_files(args["images"], CONSTANTS().IMG_SUFFIXES)
+    print(f"{'image':<40} {'shape':>16} {'headless':>10} {'plot':>10} {'saving':>8}")
+    for imgsrc in imgsrcs:
+        secs_load, secs_rescale = bench_artwork(imgsrc, args["repeat"])
+        shape = "x".join(str(i) for i in Artwork(imgsrc).img.shape)
+        secs_plot = secs_load + secs_rescale
+        print(
+            f"{imgsrc[-40:]:<40} {shape:>16} "
+            f"{secs_load * 1000:>8.1f}ms {secs_plot * 1000:>8.1f}ms "
+            f"{secs_rescale / secs_plot:>8.1%}"
+        )
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -10,12 +10,15 @@ This module facilitates creating an image matrix for data analysis.
 
 import errno
 import logging
+import numpy as np
 import os
-import skimage.io as skiio
 import skimage.color as skicolor
 import skimage.transform as skitransform
 
 from colorkeys.constants import _const as CONSTANTS
+from colorkeys.source import ImageSource
+from colorkeys.source import downscale
+from colorkeys.source import get_hash
 
 logger = logging.getLogger(__name__)
 
@@ -24,14 +27,17 @@ class Artwork:
     """A class for loading image data and exposing underliying image properties.
 
     Attributes:
-        imgsrc (str): Image source location.
+        imgsrc (str): Image source location (or label of an image matrix).
+        filehash (str): Hash of image source, from the bytes decoded (or of
+            the pixels of an image matrix).
         img_colorspace (str): Color space of image.
         img (numpy.ndarray): Matrix of image data.
         img_height (int): Height of image.
         img_width (int): Width of image.
         num_channels (int): Number of channels in image.
         aspect_ratio (float): Aspect ratio of image.
-        img_rescaled (numpy.ndarray): Matrix of image rescaled for display.
+        img_rescaled (numpy.ndarray): Matrix of image rescaled for display,
+            rescaled on first access.
         rescaled_height (int): Height of display image.
         rescaled_width (int): Width of display image.
     """
@@ -40,26 +46,35 @@ class Artwork:
 
         Args:
             imgsrc (str): Image source location.
+
+        kwargs:
+            artwork (colorkeys.artwork.Artwork): Previously loaded artwork of the
+                same image source. Its image data is shared instead of decoded
+                and rescaled again.
+            img (numpy.ndarray): Image matrix already decoded (e.g. a video
+                frame), used instead of reading imgsrc, which labels it.
+            max_side (int): Longest side of image analysed. Larger images are
+                downscaled as they are decoded (see colorkeys.source). Default
+                None analyses images at full resolution.
         """
-        self._imgsrc = self._get_imgsrc(imgsrc)
-        self._img_colorspace = self._get_colorspace()
-        self._img = self._get_img()
-        self._img_height, self._img_width, self._num_channels = self._img.shape
-        self._aspect_ratio = self._img_width / self._img_height
-        self._rescaled_height = CONSTANTS().RESCALED_HEIGHT
-        self._rescaled_width = int(self.aspect_ratio * self._rescaled_height)
-        self._img_rescaled = skitransform.rescale(
-            self.img,
-            (self.rescaled_width / self.img_width),
-            multichannel = True,
-            anti_aliasing = True,
-        )
+        artwork = kwargs.setdefault("artwork", None)
+        img = kwargs.setdefault("img", None)
+        max_side = kwargs.setdefault("max_side", None)
+        if artwork:
+            self._share(artwork)
+        else:
+            self._load(imgsrc, img, max_side)
 
     @property
     def imgsrc(self):
         "Image source location"
         return self._imgsrc
 
+    @property
+    def filehash(self):
+        "Image source hash"
+        return self._filehash
+
     @property
     def img_colorspace(self):
         "Image color space"
@@ -93,6 +108,8 @@ class Artwork:
     @property
     def img_rescaled(self):
         "Image matrix rescaled for display"
+        if self._img_rescaled is None:
+            self._img_rescaled = self._get_img_rescaled()
         return self._img_rescaled
 
     @property
@@ -105,6 +122,89 @@ class Artwork:
         "Image width"
         return self._rescaled_width
 
+    def _load(self, imgsrc, img, max_side):
+        """Load image data from image source, or from an image matrix.
+
+        The hash is of the image source (or image matrix) at full resolution.
+
+        Args:
+            imgsrc (str): Image source location.
+            img (numpy.ndarray): Image matrix already decoded, None to read and
+                decode imgsrc.
+            max_side (int): Longest side of image, None for full resolution.
+
+        Returns:
+            None
+        """
+        self._img_colorspace = self._get_colorspace()
+        if img is None:
+            self._imgsrc = self._get_imgsrc(imgsrc)
+            with ImageSource(self._imgsrc) as source:
+                self._filehash = source.filehash
+                self._img = self._get_img(source.decode(max_side=max_side))
+        else:
+            self._imgsrc = imgsrc
+            self._img = self._get_img(img)
+            self._filehash = get_hash(np.ascontiguousarray(self._img).data)
+            if max_side:
+                self._img = downscale(self._img, max_side)
+        self._img_height, self._img_width, self._num_channels = self._img.shape
+        self._aspect_ratio = self._img_width / self._img_height
+        self._rescaled_height = CONSTANTS().RESCALED_HEIGHT
+        self._rescaled_width = int(self.aspect_ratio * self._rescaled_height)
+        self._img_rescaled = None
+        self._artwork = None
+        return None
+
+    def _share(self, artwork):
+        """Share image data of a previously loaded artwork.
+
+        The image matrices are shared by reference, not copied. The rescaled
+        image is rescaled once by the loaded artwork, on first access.
+
+        Args:
+            artwork (colorkeys.artwork.Artwork): Loaded artwork.
+
+        Returns:
+            None
+        """
+        self._imgsrc = artwork.imgsrc
+        self._filehash = artwork.filehash
+        self._img_colorspace = artwork.img_colorspace
+        self._img = artwork.img
+        self._img_height = artwork.img_height
+        self._img_width = artwork.img_width
+        self._num_channels = artwork.num_channels
+        self._aspect_ratio = artwork.aspect_ratio
+        self._rescaled_height = artwork.rescaled_height
+        self._rescaled_width = artwork.rescaled_width
+        self._img_rescaled = None
+        self._artwork = artwork
+        return None
+
+    def _get_img_rescaled(self):
+        """Get image matrix rescaled for display.
+
+        Rescaling is expensive on large images and is only needed for plotting,
+        so it is deferred until the rescaled image is requested.
+
+        Args:
+            None
+
+        Returns:
+            img_rescaled (numpy.ndarray): Image matrix rescaled for display.
+        """
+        if self._artwork:
+            img_rescaled = self._artwork.img_rescaled
+        else:
+            img_rescaled = skitransform.rescale(
+                self.img,
+                (self.rescaled_width / self.img_width),
+                channel_axis = -1,
+                anti_aliasing = True,
+            )
+        return img_rescaled
+
     def _get_imgsrc(self, imgsrc):
         """Get imgsrc.
 
@@ -152,14 +252,14 @@ class Artwork:
             raise ValueError(f"Invalid colorspace, {colorspace}")
         return colorspace
 
-    def _get_img(self):
+    def _get_img(self, img):
         """Get image matrix for the requested color space.
 
-        Read image and convert to correct color space, if necessary. Disregard alpha
-        channel.
+        Convert decoded image to correct color space, if necessary. Disregard
+        alpha channel.
 
         Args:
-            None
+            img (numpy.ndarray): Image matrix decoded.
 
         Returns:
             img (numpy.ndarray): Image matrix.
@@ -167,9 +267,9 @@ class Artwork:
         Raises:
             ValueError: colorspace not valid.
         """
-        img = skiio.imread(self._imgsrc)
         if img.shape[2] == 4:
-            img = img[:, :, :3]  # Disregard alpha channel
+            # Disregard alpha channel, contiguous so later reshapes are views.
+            img = np.ascontiguousarray(img[:, :, :3])
 
         if self._img_colorspace == "RGB":
             pass
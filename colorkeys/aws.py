@@ -10,13 +10,17 @@ credentials preexisting in the environment.
 """
 
 import boto3
-import botocore.exceptions
-import io
+import botocore.config
+import collections
+import concurrent.futures
+import functools
 import logging
-import zipfile
+import random
+import time
+from pathlib import Path
 
-from boto3.dynamodb.conditions import Attr
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from boto3.dynamodb.types import TypeSerializer
 from decimal import Decimal
 
 from colorkeys.constants import _const as CONSTANTS
@@ -60,32 +64,31 @@ class AWS():
         """Task description."""
         return self._task_desc
 
-    def upload_S3(self, bucket, obj):
-        """Upload JSON-encoded object to S3."""
-        return self._upload_S3(bucket, obj)
+    def upload_file_S3(self, bucket, filename):
+        """Upload file (e.g. exported JSON archive) to S3."""
+        return self._upload_file_S3(bucket, filename)
 
-    def _upload_S3(self, bucket, obj):
-        """Upload JSON-encoded object to S3 bucket.
+    def _upload_file_S3(self, bucket, filename):
+        """Upload file to S3 bucket, streamed from disk.
+
+        The key is the file name with its basename replaced by the task hash,
+        e.g. "{hash}.colorkeys.ndjson.gz" for an export archive of NDJSON
+        records (one palette per line). This replaces the former
+        "{hash}.colorkeys.json.zip" of a single JSON array; colordb load reads
+        both.
 
         Args:
             bucket (str): Bucket name.
-            obj (str): JSON-encoded object.
+            filename (str): File name.
 
         Returns:
             None
-
         """
-        jsonfile = f"{self._task_hash[:8]}.colorkeys.json"
-        my_bucket = bucket
-        my_key = f"{jsonfile}.zip"
+        suffixes = Path(filename).name.split(".", 1)[1]
+        my_key = f"{self._task_hash[:8]}.{suffixes}"
         logger.debug(f"my_key: {my_key}")
-        logger.debug(f"my_bucket: {my_bucket}")
-        zbuffer = io.BytesIO()
-        zf = zipfile.ZipFile(zbuffer, "w")
-        zf.writestr(jsonfile, obj)
-        zf.close()
-        zbuffer.seek(0)
-        self.s3.upload_fileobj(zbuffer, my_bucket, my_key)
+        logger.debug(f"my_bucket: {bucket}")
+        self.s3.upload_file(filename, bucket, my_key)
         return None
 
     def _get_task_arn(self):
@@ -115,81 +118,354 @@ class AWS():
         return task_desc
 
 
-def load_dynamodb(site, table, colorkeys):
-    """Load colorkey into DynamoDB.
+@functools.lru_cache(maxsize=None)
+def get_dynamodb_client(site):
+    """Get DynamoDB client of site, shared by all calls and threads.
+
+    Clients (unlike resources) are thread-safe. The connection pool is sized for
+    CONSTANTS().DYNAMODB_MAX_WORKERS threads, and throttled requests are retried
+    by botocore.
 
     Args:
         site (str): Local or cloud DynamoDB instance.
-        table (str): Table in which to load colorkeys.
-        colorkeys (colorkeys.Colorkey): colorkey to load into DynamoDB.
 
     Returns:
-        None
+        client (botocore.client.DynamoDB): DynamoDB client.
 
     Raises:
-        botocore.exceptions.ClientError: put_item failure.
+        ValueError: site not valid.
     """
+    config = botocore.config.Config(
+        max_pool_connections = CONSTANTS().DYNAMODB_MAX_WORKERS,
+        retries = {"mode": "standard"},
+    )
     if site == "cloud":
-        db = boto3.resource("dynamodb")
+        client = boto3.client("dynamodb", config=config)
     elif site == "local":
-        db = boto3.resource(
+        client = boto3.client(
             "dynamodb",
-            endpoint_url=CONSTANTS().DYNAMODB_URL_LOCAL
+            endpoint_url = CONSTANTS().DYNAMODB_URL_LOCAL,
+            config = config,
         )
-    tbl = db.Table(table)
+    else:
+        raise ValueError(f"Invalid site, {site}")
+    return client
+
+
+def load_dynamodb(site, table, colorkeys, **kwargs):
+    """Load colorkeys into DynamoDB.
+
+    Colorkeys are written by BatchWriteItem, CONSTANTS().DYNAMODB_BATCH_SIZE at a
+    time, spread over a pool of threads. At most two batches per thread are in
+    flight, so memory does not grow with the number of colorkeys.
+
+    BatchWriteItem does not take a ConditionExpression, so the keys of each
+    batch are first read by BatchGetItem, and items already in the table are
+    skipped: the first write of a key wins and loading again leaves existing
+    items untouched. Duplicate keys across the whole load are dropped, so no key
+    is written by two batches in flight at once. Between the read and the write
+    of a batch, a key may still be written by another process loading the same
+    key, whose write is then replaced.
+
+    Args:
+        site (str): Local or cloud DynamoDB instance.
+        table (str): Table in which to load colorkeys.
+        colorkeys (iterable): Colorkeys (dicts decoded by codecjson.decode) to load
+            into DynamoDB.
+
+    kwargs:
+        workers (int): Number of writer threads. Default
+            CONSTANTS().DYNAMODB_WORKERS.
+        cache (colorkeys.querycache.QueryCache): Query cache to add items
+            written to. Default None.
+
+    Returns:
+        num_items (int): Number of items written, not counting items skipped.
+
+    Raises:
+        botocore.exceptions.ClientError: batch_get_item or batch_write_item
+            failure.
+        RuntimeError: keys or items still unprocessed after retries.
+    """
+    workers = kwargs.setdefault("workers", CONSTANTS().DYNAMODB_WORKERS)
+    cache = kwargs.setdefault("cache", None)
+    client = get_dynamodb_client(site)
+    num_items = 0
+    in_flight = collections.deque()
+
+    def written(future):
+        # Items are cached only once written, so a failed batch or an item
+        # skipped as existing (which may differ from the table) is not.
+        items = future.result()
+        if cache:
+            cache.put_items(items)
+        return len(items)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers = workers,
+        thread_name_prefix = "dynamodb",
+    ) as pool:
+        for batch in get_batches(colorkeys):
+            if len(in_flight) >= 2 * workers:
+                num_items += written(in_flight.popleft())
+            in_flight.append(pool.submit(write_batch, client, table, batch))
+        while in_flight:
+            num_items += written(in_flight.popleft())
+    logger.debug(f"{num_items} items loaded into {table}")
+    return num_items
+
+
+def get_batches(colorkeys):
+    """Get batches of colorkeys for BatchWriteItem.
+
+    Each colorkey is given its "selector" range key. A colorkey with the key of
+    an earlier colorkey, in any batch, is dropped. The keys of all colorkeys are
+    kept for this.
+
+    Args:
+        colorkeys (iterable): Colorkeys to load into DynamoDB.
+
+    Yields:
+        batch (list): Colorkeys of a batch, at most
+            CONSTANTS().DYNAMODB_BATCH_SIZE.
+    """
+    keys = set()
+    batch = []
     for colorkey in colorkeys:
-        h = colorkey["histogram"]
-        selector = (
-            f'{h["algo"]}#{h["colorspace"]}#{h["n_clusters"]}#'
-            f'{colorkey["cpu"]}#{colorkey["memory"]}#{colorkey["timestamp"]}'
+        colorkey["selector"] = get_selector(colorkey)
+        key = (colorkey["filehash"], colorkey["selector"])
+        logger.debug(f"{colorkey['filehash']} {colorkey['selector']}")
+        if key in keys:
+            logger.debug(f"Duplicate key dropped: {key}")
+            continue
+        keys.add(key)
+        batch.append(colorkey)
+        if len(batch) == CONSTANTS().DYNAMODB_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_batch(client, table, batch):
+    """Write batch by BatchWriteItem, retrying unprocessed items.
+
+    Colorkeys whose key is already in the table are skipped (see
+    get_existing_keys()). Unprocessed items (e.g. throttled) are retried with
+    exponential backoff and full jitter, up to CONSTANTS().DYNAMODB_MAX_RETRIES
+    times.
+
+    Args:
+        client (botocore.client.DynamoDB): DynamoDB client.
+        table (str): Table in which to write.
+        batch (list): Colorkeys of batch.
+
+    Returns:
+        items (list): Colorkeys written, without those skipped.
+
+    Raises:
+        RuntimeError: keys or items still unprocessed after retries.
+    """
+    serializer = TypeSerializer()
+    existing = get_existing_keys(client, table, batch)
+    items = [i for i in batch if (i["filehash"], i["selector"]) not in existing]
+    requests = [
+        {"PutRequest": {"Item": {k: serializer.serialize(v) for k, v in i.items()}}}
+        for i in items
+    ]
+    if existing:
+        logger.debug(f"{len(existing)} items exist, skipped")
+    if not requests:
+        return items
+    for attempt in range(CONSTANTS().DYNAMODB_MAX_RETRIES + 1):
+        if attempt > 0:
+            backoff = CONSTANTS().DYNAMODB_BACKOFF * (2 ** attempt)
+            time.sleep(random.uniform(0, backoff))
+        response = client.batch_write_item(RequestItems={table: requests})
+        requests = response.get("UnprocessedItems", {}).get(table, [])
+        if not requests:
+            return items
+        logger.debug(f"{len(requests)} unprocessed items, attempt {attempt}")
+    raise RuntimeError(f"{len(requests)} items unprocessed after retries")
+
+
+def get_existing_keys(client, table, batch):
+    """Get keys of batch already in the table, by BatchGetItem.
+
+    Only the keys are read. Unprocessed keys are retried as by write_batch().
+
+    Args:
+        client (botocore.client.DynamoDB): DynamoDB client.
+        table (str): Table in which to look up keys.
+        batch (list): Colorkeys of batch, with "selector" range key.
+
+    Returns:
+        keys (set): (filehash, selector) of each colorkey already in the table.
+
+    Raises:
+        RuntimeError: keys still unprocessed after retries.
+    """
+    request = {
+        "Keys": [
+            {"filehash": {"S": i["filehash"]}, "selector": {"S": i["selector"]}}
+            for i in batch
+        ],
+        "ProjectionExpression": "#f, #s",
+        "ExpressionAttributeNames": {"#f": "filehash", "#s": "selector"},
+    }
+    keys = set()
+    for attempt in range(CONSTANTS().DYNAMODB_MAX_RETRIES + 1):
+        if attempt > 0:
+            backoff = CONSTANTS().DYNAMODB_BACKOFF * (2 ** attempt)
+            time.sleep(random.uniform(0, backoff))
+        response = client.batch_get_item(RequestItems={table: request})
+        keys.update(
+            (i["filehash"]["S"], i["selector"]["S"])
+            for i in response.get("Responses", {}).get(table, [])
         )
-        colorkey["selector"] = selector
-        logger.debug(f"{colorkey['filehash']} {selector}")
-
-        # put_item with "filehash" as partition key, "selector" as range key
-        try:
-            tbl.put_item(
-                Item=colorkey,
-                ConditionExpression=(
-                    Attr("filehash").not_exists() & Attr("selector").not_exists()
-                )
-            )
-        except botocore.exceptions.ClientError as e:
-            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
-                raise
-    return None
+        unprocessed = response.get("UnprocessedKeys", {}).get(table)
+        if not unprocessed:
+            return keys
+        request = unprocessed
+        logger.debug(f"{len(request['Keys'])} unprocessed keys, attempt {attempt}")
+    raise RuntimeError(f"{len(request['Keys'])} keys unprocessed after retries")
+
+
+def get_selector(colorkey):
+    """Get DynamoDB range key of colorkey."""
+    h = colorkey["histogram"]
+    selector = (
+        f'{h["algo"]}#{h["colorspace"]}#{h["n_clusters"]}#'
+        f'{colorkey["cpu"]}#{colorkey["memory"]}#{colorkey["timestamp"]}'
+    )
+    return selector
 
 
 def query_dynamodb(site, table, filehash, algo, colorspace, n_clusters, **kwargs):
     """Query colorkey from DynamoDB.
 
+    All pages of the query are read, following LastEvaluatedKey.
+
     Args:
         site (str): Local or cloud DynamoDB instance.
         table (str): Table from which to query.
+        filehash (str): Hash of image source of colorkey entry.
         algo (str): Clustering algorithm used to generate colorkey entry.
         colorspace (str): Colormap algorithm (e.g. HSV/RGB).
         n_clusters (int): Number of clusters used to generate colorkey entry.
 
+    kwargs:
+        cache (colorkeys.querycache.QueryCache): Query cache to read through.
+            Default None.
+
     Returns:
-        None
+        response (dict): "Items" queried and their "Count".
     """
-    if site == "cloud":
-        db = boto3.resource("dynamodb")
-    elif site == "local":
-        db = boto3.resource(
-            "dynamodb",
-            endpoint_url=CONSTANTS().DYNAMODB_URL_LOCAL
-        )
-    tbl = db.Table(table)
-    selector = f'{algo}#{colorspace}#{n_clusters}'
+    cache = kwargs.setdefault("cache", None)
+    client = get_dynamodb_client(site)
+    selector = get_selector_prefix(algo, colorspace, n_clusters)
+    items = cache.get(filehash, selector) if cache else None
+    if items is None:
+        items = list(iter_query(client, table, filehash, selector))
+        if cache:
+            cache.put(filehash, selector, items)
+    response = {"Items": items, "Count": len(items)}
+    return response
+
+
+def query_many_dynamodb(site, table, filehashes, algo, colorspace, n_clusters, **kwargs):
+    """Query colorkeys of many filehashes from DynamoDB, concurrently.
+
+    Filehashes are queried by a pool of threads over the shared client. Items
+    are yielded as they are queried, in order of filehashes. At most two queries
+    per thread are in flight, so memory does not grow with the number of
+    filehashes. With a cache, cached queries are answered in the calling thread,
+    which also caches the queries answered by DynamoDB.
+
+    Args:
+        site (str): Local or cloud DynamoDB instance.
+        table (str): Table from which to query.
+        filehashes (iterable): Hashes of image sources of colorkey entries.
+        algo (str): Clustering algorithm used to generate colorkey entry.
+        colorspace (str): Colormap algorithm (e.g. HSV/RGB).
+        n_clusters (int): Number of clusters used to generate colorkey entry.
+
+    kwargs:
+        workers (int): Number of query threads. Default
+            CONSTANTS().DYNAMODB_WORKERS.
+        cache (colorkeys.querycache.QueryCache): Query cache to read through.
+            Default None.
 
+    Yields:
+        item (dict): Colorkey queried, numbers as Decimal.
+    """
+    workers = kwargs.setdefault("workers", CONSTANTS().DYNAMODB_WORKERS)
+    cache = kwargs.setdefault("cache", None)
+    client = get_dynamodb_client(site)
+    selector = get_selector_prefix(algo, colorspace, n_clusters)
+
+    def query(filehash):
+        return list(iter_query(client, table, filehash, selector))
+
+    def queried(filehash, future, is_cached):
+        items = future.result()
+        if cache and not is_cached:
+            cache.put(filehash, selector, items)
+        return items
+
+    in_flight = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers = workers,
+        thread_name_prefix = "dynamodb",
+    ) as pool:
+        for filehash in filehashes:
+            if len(in_flight) >= 2 * workers:
+                yield from queried(*in_flight.popleft())
+            items = cache.get(filehash, selector) if cache else None
+            if items is None:
+                in_flight.append((filehash, pool.submit(query, filehash), False))
+            else:
+                future = concurrent.futures.Future()
+                future.set_result(items)
+                in_flight.append((filehash, future, True))
+        while in_flight:
+            yield from queried(*in_flight.popleft())
+
+
+def iter_query(client, table, filehash, selector):
+    """Query items of filehash by selector prefix, following pagination.
+
+    Args:
+        client (botocore.client.DynamoDB): DynamoDB client.
+        table (str): Table from which to query.
+        filehash (str): Partition key.
+        selector (str): Prefix of range key.
+
+    Yields:
+        item (dict): Item queried, numbers as Decimal.
+    """
+    deserializer = TypeDeserializer()
+    paginator = client.get_paginator("query")
     # query with "filehash" as primary key, "selector" as range key
-    response = tbl.query(
-        KeyConditionExpression=(
-            Key("filehash").eq(filehash) & Key("selector").begins_with(selector)
-        )
+    pages = paginator.paginate(
+        TableName = table,
+        KeyConditionExpression = "filehash = :filehash AND begins_with(selector, :selector)",
+        ExpressionAttributeValues = {
+            ":filehash": {"S": filehash},
+            ":selector": {"S": selector},
+        },
     )
-    return response
+    for page in pages:
+        for item in page["Items"]:
+            yield {k: deserializer.deserialize(v) for k, v in item.items()}
+
+
+def get_selector_prefix(algo, colorspace, n_clusters):
+    """Get prefix of DynamoDB range key to query.
+
+    The prefix ends with a separator, so (e.g.) 5 clusters do not match 50.
+    """
+    return f"{algo}#{colorspace}#{n_clusters}#"
 
 
 def replace_decimals(obj):
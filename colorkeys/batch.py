@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""
+This module runs the palette analysis of a batch of images.
+
+Images are analysed one after another in the calling process, or fanned out to a
+pool of worker processes. Pool results are returned in the order of the image
+sources, whatever order the workers finish in.
+
+When analysed in the calling process, reader threads can prefetch (download,
+decode, and hash) the next images while the current image is clustered.
+
+Palettes of an image can be reused for a similar image (e.g. a frame of the
+same shot), without clustering.
+
+    Typical Usage:
+
+    for imgsrc, objs in run_pool(imgsrcs, 8, analysis_kwargs):
+        ...
+
+    for imgsrc, artwork in prefetch(imgsrcs, 4, 2):
+        ...
+"""
+
+import collections
+import concurrent.futures
+import logging
+import math
+import os
+from pathlib import Path
+
+from threadpoolctl import threadpool_limits
+
+from colorkeys import codecjson
+from colorkeys.artwork import Artwork
+from colorkeys.colorkeys import ColorKey
+from colorkeys.constants import _const as CONSTANTS
+from colorkeys.planner import Planner
+
+logger = logging.getLogger(__name__)
+
+
+def analyse(imgsrc, algos, colorspaces, num_clusters, epoch_seconds, **kwargs):
+    """Analyse palettes of an image.
+
+    Args:
+        imgsrc (str): Image source location.
+        algos (list): Algorithms requested.
+        colorspaces (list): Colorspaces requested.
+        num_clusters (int): Number of clusters requested, or a list of numbers
+            of clusters to sweep.
+        epoch_seconds (str): Seconds used for non-AWS task_hash.
+
+    kwargs:
+        context (colorkeys.codecjson.RunContext): Run metadata.
+        Remaining kwargs are passed to colorkeys.planner.Planner.
+
+    Returns:
+        palettes (list): Palettes (colorkeys.ColorKey) of image.
+        objs (list): Palettes compiled for JSON encoding.
+    """
+    context = kwargs.pop("context", None)
+    planner = Planner(imgsrc, algos, colorspaces, num_clusters, **kwargs)
+    palettes = planner.run()
+    objs = [
+        codecjson.compile(
+            palette,
+            epoch_seconds,
+            context = context,
+        )
+        for palette in palettes
+    ]
+    return palettes, objs
+
+
+def reuse(imgsrc, palettes, epoch_seconds, **kwargs):
+    """Reuse palettes of another image for an image, without clustering.
+
+    Args:
+        imgsrc (str): Image source location.
+        palettes (list): Palettes (colorkeys.ColorKey) of the other image.
+        epoch_seconds (str): Seconds used for non-AWS task_hash.
+
+    kwargs:
+        artwork (colorkeys.artwork.Artwork): Decoded image. Default decoded
+            from imgsrc.
+        context (colorkeys.codecjson.RunContext): Run metadata.
+
+    Returns:
+        palettes (list): Palettes (colorkeys.ColorKey) of image.
+        objs (list): Palettes compiled for JSON encoding, with "reused_from"
+            the file name of the other image.
+    """
+    artwork = kwargs.setdefault("artwork", None)
+    context = kwargs.setdefault("context", None)
+    if artwork is None:
+        artwork = Artwork(imgsrc)
+    palettes_reused = [
+        ColorKey(
+            imgsrc,
+            palette.hist.algo,
+            palette.hist.num_clusters,
+            colorspace = palette.hist.colorspace,
+            artwork = artwork,
+            hist = palette.hist,
+        )
+        for palette in palettes
+    ]
+    objs = [
+        codecjson.compile(
+            palette,
+            epoch_seconds,
+            context = context,
+            reused_from = Path(palette_src.imgsrc).name,
+        )
+        for palette, palette_src in zip(palettes_reused, palettes)
+    ]
+    return palettes_reused, objs
+
+
+def prefetch(imgsrcs, depth, readers, **kwargs):
+    """Prefetch images in reader threads ahead of their analysis.
+
+    At most depth images are read ahead of the consumer, which bounds the memory
+    held by decoded images. Images are yielded in order of imgsrcs. A read error
+    is raised when its image is reached.
+
+    Args:
+        imgsrcs (list): Image source locations.
+        depth (int): Number of images read ahead.
+        readers (int): Number of reader threads.
+
+    kwargs:
+        max_side (int): Longest side of images decoded, larger images are
+            downscaled at decode. Default None.
+
+    Yields:
+        imgsrc (str): Image source location.
+        artwork (colorkeys.artwork.Artwork): Decoded and hashed image.
+    """
+    max_side = kwargs.setdefault("max_side", None)
+    itr = iter(imgsrcs)
+    queue = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers = readers,
+        thread_name_prefix = "prefetch",
+    ) as pool:
+        for imgsrc in itr:
+            queue.append((imgsrc, pool.submit(read, imgsrc, max_side)))
+            if len(queue) >= depth:
+                break
+        while queue:
+            imgsrc, future = queue.popleft()
+            artwork = future.result()
+            next_imgsrc = next(itr, None)
+            if next_imgsrc is not None:
+                queue.append((next_imgsrc, pool.submit(read, next_imgsrc, max_side)))
+            yield imgsrc, artwork
+
+
+def read(imgsrc, max_side=None):
+    """Read image source: decode image and hash source."""
+    return Artwork(imgsrc, max_side=max_side)
+
+
+def run_pool(imgsrcs, jobs, analysis_kwargs):
+    """Analyse images in a pool of worker processes.
+
+    Images are submitted biggest first so a large image does not start last and
+    hold up the end of the batch. Results are yielded in order of imgsrcs as soon
+    as the next one is ready, so only results finished out of order are held. A
+    failed image is logged and skipped.
+
+    If a worker process dies, every image the pool had not finished fails with
+    it. Those images are split in halves, each run in a fresh pool, until the
+    image whose worker dies is alone, so only that image is failed.
+
+    Args:
+        imgsrcs (list): Image source locations.
+        jobs (int): Number of worker processes.
+        analysis_kwargs (dict): Arguments of analyse(), by name.
+
+    Yields:
+        imgsrc (str): Image source location, in order of imgsrcs.
+        objs (list): Palettes compiled for JSON encoding, empty if failed.
+    """
+    imgsrcs = list(imgsrcs)
+    results = {}  # Finished out of order, by position.
+    next_pos = 0
+    groups = [sorted(range(len(imgsrcs)), key=lambda i: get_size(imgsrcs[i]), reverse=True)] if imgsrcs else []
+    while groups:
+        group = groups.pop()
+        broken = set()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers = min(jobs, len(group)),
+            initializer = init_worker,
+            initargs = (jobs,),
+        ) as pool:
+            futures = {
+                pool.submit(analyse_worker, imgsrcs[pos], analysis_kwargs): pos
+                for pos in group
+            }
+            for future in concurrent.futures.as_completed(futures):
+                pos = futures[future]
+                try:
+                    results[pos] = future.result()
+                except concurrent.futures.process.BrokenProcessPool:
+                    broken.add(pos)
+                except Exception:
+                    logger.exception(f"Analysis failed: {imgsrcs[pos]}")
+                    results[pos] = []
+                while next_pos in results:
+                    yield imgsrcs[next_pos], results.pop(next_pos)
+                    next_pos += 1
+        if len(broken) == 1:
+            # Futures finished before the worker died are unaffected, so the
+            # only broken one is that of the dead worker.
+            pos = broken.pop()
+            logger.error(f"Analysis failed, worker process died: {imgsrcs[pos]}")
+            results[pos] = []
+        elif broken:
+            logger.warning(f"Worker pool broken, {len(broken)} image(s) pending")
+            pending = [pos for pos in group if pos in broken]
+            half = len(pending) // 2
+            groups.extend([pending[half:], pending[:half]])
+        while next_pos in results:
+            yield imgsrcs[next_pos], results.pop(next_pos)
+            next_pos += 1
+
+
+def analyse_worker(imgsrc, analysis_kwargs):
+    """Analyse palettes of an image in a worker process.
+
+    Only the compiled palettes are returned, to keep image data out of the
+    result sent back to the parent process.
+    """
+    _, objs = analyse(imgsrc, **analysis_kwargs)
+    return objs
+
+
+def init_worker(jobs):
+    """Limit the threads of each worker process to its share of the CPUs."""
+    threadpool_limits(max(1, (os.cpu_count() or 1) // jobs))
+    return None
+
+
+def get_size(imgsrc):
+    """Get size of image source for scheduling.
+
+    The size of web sources is unknown without a request, so they are taken as
+    biggest. Missing files are taken as empty, and fail in analysis.
+
+    Args:
+        imgsrc (str): Image source location.
+
+    Returns:
+        size (float): Size in bytes.
+    """
+    if imgsrc.startswith(CONSTANTS().WEB_PREFIXES):
+        size = math.inf
+    elif os.path.exists(imgsrc):
+        size = os.path.getsize(imgsrc)
+    else:
+        size = 0
+    return size
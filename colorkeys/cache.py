@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+"""
+This module is a content-addressed on-disk cache of palette histograms.
+
+A palette is keyed by the hash of its image source, algorithm, colorspace,
+number of clusters, and pipeline parameters (including the clustering seed, so
+the palette of a key is deterministic). A cached palette skips clustering.
+
+Entries are small JSON files, two levels deep by key prefix. The cache is
+bounded in size: when full, the least recently used entries are evicted. Entry
+modification times record use, as access times are often not kept.
+
+    Typical Usage:
+
+    my_cache = Cache("/tmp/colorkeys-cache")
+    key = my_cache.get_key(filehash, "kmeans", "RGB", 5, random_state=0)
+    entry = my_cache.get(key)
+    if entry is None:
+        my_cache.put(key, get_entry(my_hist))
+"""
+
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import tempfile
+from pathlib import Path
+
+from colorkeys.constants import _const as CONSTANTS
+from colorkeys.histogram import get_hist_bar
+
+logger = logging.getLogger(__name__)
+
+
+class Cache:
+    """A class for a size-bounded LRU cache of palette histograms on disk.
+
+    Attributes:
+        cache_dir (pathlib.Path): Cache directory.
+        max_bytes (int): Size bound of cache.
+        refresh (bool): Ignore cached entries, replacing them as palettes are
+            generated again.
+        hits (int): Number of entries found.
+        misses (int): Number of entries not found.
+    """
+    def __init__(self, cache_dir, **kwargs):
+        """Init Cache.
+
+        Args:
+            cache_dir (str): Cache directory, created if missing.
+
+        kwargs:
+            max_bytes (int): Size bound of cache. Default CONSTANTS().CACHE_MAX_BYTES.
+            refresh (bool): Ignore cached entries. Default False.
+            version (str): Version of the palette generator, part of every key
+                so entries of other versions are not used. Default "".
+        """
+        self._cache_dir = Path(cache_dir)
+        self._max_bytes = kwargs.setdefault("max_bytes", CONSTANTS().CACHE_MAX_BYTES)
+        self._refresh = kwargs.setdefault("refresh", False)
+        self._version = kwargs.setdefault("version", "")
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        self._size = None
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def cache_dir(self):
+        """Cache directory."""
+        return self._cache_dir
+
+    @property
+    def max_bytes(self):
+        """Size bound of cache."""
+        return self._max_bytes
+
+    @property
+    def refresh(self):
+        """Ignore cached entries."""
+        return self._refresh
+
+    @property
+    def hits(self):
+        """Number of entries found."""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of entries not found."""
+        return self._misses
+
+    def get_key(self, filehash, algo, colorspace, num_clusters, **kwargs):
+        """Get cache key of a palette.
+
+        Args:
+            filehash (str): Hash of image source.
+            algo (str): Clustering algorithm.
+            colorspace (str): Histogram colorspace.
+            num_clusters (int): Number of clusters.
+
+        kwargs:
+            Pipeline parameters that change the palette (e.g. dtype,
+            sample_pixels, random_state).
+
+        Returns:
+            key (str): Cache key.
+        """
+        params = {
+            "version": self._version,
+            "filehash": filehash,
+            "algo": algo,
+            "colorspace": colorspace,
+            "n_clusters": num_clusters,
+            **kwargs,
+        }
+        str_ = json.dumps(params, sort_keys=True)
+        return hashlib.blake2b(str_.encode(), digest_size=16).hexdigest()
+
+    def get(self, key):
+        """Get cached entry, marking it used.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            entry (dict): Cached entry, None if not cached (or refreshing).
+        """
+        entry = None
+        if not self._refresh:
+            path = self._get_path(key)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+                os.utime(path)
+            except (FileNotFoundError, ValueError):
+                entry = None
+        if entry is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Cache entry, evicting least recently used entries if full.
+
+        The entry is written to a temporary file and renamed, so concurrent
+        readers (e.g. worker processes) never see a partial entry.
+
+        Args:
+            key (str): Cache key.
+            entry (dict): Entry to cache.
+
+        Returns:
+            None
+        """
+        path = self._get_path(key)
+        path.parent.mkdir(exist_ok=True)
+        str_ = json.dumps(entry)
+        try:  # An overwritten entry no longer counts.
+            size_old = path.stat().st_size
+        except FileNotFoundError:
+            size_old = 0
+        with tempfile.NamedTemporaryFile(
+            "w",
+            dir = path.parent,
+            suffix = ".tmp",
+            delete = False,
+        ) as f:
+            f.write(str_)
+        os.replace(f.name, path)
+        if self._size is None:
+            self._size = self._get_size()
+        else:
+            self._size += len(str_) - size_old
+        if self._size > self._max_bytes:
+            self.evict()
+        return None
+
+    def evict(self):
+        """Evict least recently used entries until the cache is within bound.
+
+        Entries are evicted to below the bound, so a full cache does not evict
+        on every put.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        target = int(self._max_bytes * CONSTANTS().CACHE_EVICT_RATIO)
+        entries = sorted(self._get_entries(), key=lambda i: i[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        num_evicted = 0
+        for path, stat in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:  # Evicted by another process.
+                pass
+            size -= stat.st_size
+            num_evicted += 1
+        self._size = size
+        logger.debug(f"Evicted {num_evicted} cache entries, {size} bytes cached")
+        return None
+
+    def _get_path(self, key):
+        """Get path of entry."""
+        return self._cache_dir / key[:2] / f"{key}.json"
+
+    def _get_entries(self):
+        """Get path and stat of each cached entry."""
+        entries = []
+        for path in self._cache_dir.glob("*/*.json"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                pass
+        return entries
+
+    def _get_size(self):
+        """Get size of cached entries."""
+        return sum(stat.st_size for _, stat in self._get_entries())
+
+
+class CachedHist:
+    """A class for histogram information of a cached palette.
+
+    Exposes the attributes of colorkeys.histogram.Hist used to compile and plot
+    palettes. Cluster data (centroids, labels) is not cached.
+
+    Attributes:
+        algo (str): Clustering algorithm.
+        colorspace (str): Histogram color space.
+        num_clusters (int): Number of clusters.
+        stopwatch (float): Cluster processing time when generated.
+        inertia (float): Inertia when generated, None if not measured.
+        silhouette (float): Silhouette score when generated, None if not
+            measured.
+        hist (numpy.ndarray): Normalized histogram, in descending order.
+        hist_centroids (list): RGB values ([R,G,B]) by normalised percentage.
+        hist_bar (numpy.ndarray): Normalized histogram bar scaled to image width.
+        hist_bar_height (int): Histogram bar height.
+    """
+    def __init__(self, entry, rescaled_width):
+        """Init CachedHist.
+
+        Args:
+            entry (dict): Cached entry, from get_entry().
+            rescaled_width (int): Width of image (defines width for histogram bar).
+        """
+        self._algo = entry["algo"]
+        self._colorspace = entry["colorspace"]
+        self._num_clusters = entry["n_clusters"]
+        self._stopwatch = entry["stopwatch"]
+        self._inertia = entry.get("inertia")
+        self._silhouette = entry.get("silhouette")
+        self._hist_centroids = entry["hist_centroids"]
+        self._hist = np.array([i["percent"] for i in self._hist_centroids])
+        self._hist_bar_height = CONSTANTS().HIST_BAR_HEIGHT
+        self._hist_bar = get_hist_bar(
+            self._hist_centroids,
+            height = self._hist_bar_height,
+            width = rescaled_width
+        )
+
+    @property
+    def algo(self):
+        return self._algo
+
+    @property
+    def colorspace(self):
+        return self._colorspace
+
+    @property
+    def num_clusters(self):
+        return self._num_clusters
+
+    @property
+    def stopwatch(self):
+        return self._stopwatch
+
+    @property
+    def inertia(self):
+        return self._inertia
+
+    @property
+    def silhouette(self):
+        return self._silhouette
+
+    @property
+    def hist(self):
+        return self._hist
+
+    @property
+    def hist_centroids(self):
+        return self._hist_centroids
+
+    @property
+    def hist_bar(self):
+        return self._hist_bar
+
+    @property
+    def hist_bar_height(self):
+        return self._hist_bar_height
+
+
+def get_entry(hist):
+    """Get cache entry of histogram information.
+
+    Args:
+        hist (colorkeys.histogram.Hist): Histogram information.
+
+    Returns:
+        entry (dict): Entry for Cache.put().
+    """
+    entry = {
+        "algo": hist.algo,
+        "colorspace": hist.colorspace,
+        "n_clusters": hist.num_clusters,
+        "stopwatch": hist.stopwatch,
+        "hist_centroids": [
+            {"percent": float(i["percent"]), "color": i["color"]}
+            for i in hist.hist_centroids
+        ],
+    }
+    for metric in ("inertia", "silhouette"):
+        value = getattr(hist, metric, None)
+        if value is not None:
+            entry[metric] = value
+    return entry
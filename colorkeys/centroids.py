@@ -6,13 +6,23 @@ This module facilitates cluster creation.
     Typical Usage:
 
     my_cluster = Clust(img_matrix, "kmeans", 5)
+    my_sampled_cluster = Clust(img_matrix, "kmeans", 5, sample_pixels=100000)
+    my_quantized_cluster = Clust(img_matrix, "kmeans", 5, quantize_bits=5)
+    my_next_cluster = Clust(
+        next_img_matrix, "kmeans", 5, init_centroids=my_cluster.centroids
+    )
 """
 
 import logging
+import numpy as np
 from time import time
 
 from sklearn import cluster
-from sklearn import neighbors
+from sklearn import metrics
+
+from colorkeys import kmeans
+from colorkeys import ward
+from colorkeys.constants import _const as CONSTANTS
 
 logger = logging.getLogger(__name__)
 
@@ -24,29 +34,165 @@ class Clust:
     https://en.wikipedia.org/wiki/K-means_clustering
     https://en.wikipedia.org/wiki/Hierarchical_clustering
 
+    With a pixel sampling budget, centroids are fitted on a bounded sample of
+    pixels, so fit time depends on the budget rather than image resolution.
+    Labels are then assigned to all pixels (or a larger second sample) by
+    nearest centroid, in chunks.
+
+    With color quantization, pixels are binned into a reduced-precision color
+    cube and centroids are fitted on the occupied bins, weighted by pixel count,
+    so fit time depends on the number of distinct colors rather than image
+    resolution. Labels are then per bin, weighted by the pixel count of the bin.
+    If fewer bins are occupied than clusters requested (e.g. a flat or low-color
+    image), one cluster is fitted per bin, and the centroids are padded to the
+    number of clusters requested with empty clusters.
+
+    Agglomerative clustering ("hac") is quadratic in the number of points, so it
+    is always fitted on a reduced set of at most CONSTANTS().HAC_MAX_COLORS
+    colors, weighted by pixel count: pixels are quantized (by default
+    CONSTANTS().HAC_QUANTIZE_BITS per channel), and quantized into coarser color
+    cubes while too many bins are occupied. As with quantization, a low-color
+    image (e.g. a black frame or title card) fits one cluster per bin.
+
+    With initial centroids (e.g. of the previous frame of a film), the fit is
+    warm-started from them: "kmeans" and "npkmeans" iterate from them instead of
+    k-means++ seeding, and "mbkmeans" updates them by a single incremental
+    partial_fit. If the centroids drift too far from the initial centroids (e.g.
+    on a shot change), the fit falls back to a cold start. Fewer initial
+    centroids than clusters (e.g. of a palette of fewer clusters) are completed
+    by k-means++ seeding.
+
+    Optionally, cheap quality metrics of the fit are measured: inertia, and the
+    silhouette score of a sample of the fit data.
+
+    Image data may be float ([0, 1] per channel) or uint8. Integer data is fitted
+    as float32 scaled to [0, 1], converted per sample or chunk where possible, so
+    centroids are always in [0, 1].
+
     Attributes:
-        clust (sklearn.cluster): Cluster generated.
+        clust (sklearn.cluster): Cluster generated (colorkeys.kmeans.KMeans for
+            "npkmeans", colorkeys.ward.Ward for "hac").
         centroids (numpy.ndarray): Centroids generated.
+        labels (numpy.ndarray): Cluster label of each pixel (or assigned sample,
+            or color bin).
+        label_weights (numpy.ndarray): Pixel count of each label, None if each
+            label is a single pixel.
         num_clusters (int): Number of clusters/centroids requested.
+        warm_start (bool): Centroids were fitted from the initial centroids,
+            without falling back to a cold start.
+        inertia (float): Mean squared distance of fit data to its nearest
+            centroid, weighted by pixel count. None if not measured.
+        silhouette (float): Silhouette score of a sample of fit data, None if
+            not measured (or fewer than 2 clusters found).
         stopwatch (time.time): Cluster processing time.
     """
-    def __init__(self, img, algo, num_clusters):
+    def __init__(self, img, algo, num_clusters, **kwargs):
         """Init Clust.
 
         Args:
             img (numpy.ndarray): Matrix of image data.
             algo (str): Algorithm requested for clusters/centroids generated.
             num_clusters (int): Number of clusters/centroids requested.
+
+        kwargs:
+            sample_pixels (int): Number of pixels sampled to fit centroids.
+                Default None fits all pixels.
+            sample_method (str): Pixel sampling method, one of
+                CONSTANTS().SAMPLE_METHODS. Default "uniform".
+            assign_pixels (int): Number of pixels sampled for label assignment
+                when sampling. Default None assigns all pixels.
+            random_state (int): Seed for sampling and cluster initialisation.
+                Default None.
+            quantize_bits (int): Bits per channel of the color cube in which pixels
+                are binned to fit centroids. Default None fits pixels.
+            init_centroids (numpy.ndarray): Centroids in [0, 1] to warm-start the
+                fit from, ignored unless at most num_clusters rows of the image
+                channels and algo is not "hac". Default None starts cold.
+            partial_fit (bool): Update the initial centroids by a single
+                partial_fit ("mbkmeans"), instead of a full fit from them.
+                Default True.
+            max_drift (float): Mean distance the centroids may move from the
+                initial centroids before the fit falls back to a cold start,
+                None never falls back. Default CONSTANTS().WARM_START_MAX_DRIFT.
+            metrics (bool): Measure inertia and silhouette score, after the
+                cluster processing time. Default False.
+
+        Raises:
+            ValueError: sampling and quantization both requested.
         """
-        # Convert 2D array to 1D for cluster generation.
         self._num_clusters = num_clusters
+        self._sample_pixels = kwargs.setdefault("sample_pixels", None)
+        self._sample_method = kwargs.setdefault("sample_method", "uniform")
+        self._assign_pixels = kwargs.setdefault("assign_pixels", None)
+        self._random_state = kwargs.setdefault("random_state", None)
+        self._rng = np.random.default_rng(self._random_state)
+        self._quantize_bits = kwargs.setdefault("quantize_bits", None)
+        if self._sample_pixels and self._quantize_bits:
+            raise ValueError("Pixel sampling and color quantization are exclusive")
+        init_centroids = kwargs.setdefault("init_centroids", None)
+        self._partial_fit = kwargs.setdefault("partial_fit", True)
+        self._max_drift = kwargs.setdefault("max_drift", CONSTANTS().WARM_START_MAX_DRIFT)
+        is_metrics = kwargs.setdefault("metrics", False)
+
+        # Convert 2D array to 1D for cluster generation.
         img_reshape = img.reshape(img.shape[0] * img.shape[1], img.shape[2])
+        self._scale = 1 / 255 if np.issubdtype(img.dtype, np.integer) else 1
 
         time_start = time()
-        self._clust = self._get_clust(img_reshape, algo, self._num_clusters)
-        self._centroids = self._get_centroids(img_reshape, algo)
+        self._label_weights = None
+        if self._quantize_bits:
+            img_fit, self._label_weights = quantize(img_reshape, self._quantize_bits)
+            img_fit = self._get_float(img_fit)
+        elif self._sample_pixels:
+            img_fit = self._get_sample(img, self._sample_pixels, self._sample_method)
+            img_fit = self._get_float(img_fit)
+        elif algo == "hac":
+            img_fit, self._label_weights = quantize(img_reshape, CONSTANTS().HAC_QUANTIZE_BITS)
+            img_fit = self._get_float(img_fit)
+        else:
+            img_fit = self._get_float(img_reshape)
+        fit_weights = self._label_weights
+        if algo == "hac":
+            img_fit, fit_weights = reduce_colors(img_fit, fit_weights, CONSTANTS().HAC_MAX_COLORS)
+            if not self._sample_pixels:  # Labels are per reduced color.
+                self._label_weights = fit_weights
+        # Samples of the whole image are views of it, not copies.
+        self._is_fit_copy = not np.shares_memory(img_fit, img)
+        num_fit = min(self._num_clusters, img_fit.shape[0])
+        init = self._get_init(init_centroids, img_fit, algo)
+        self._clust = self._get_clust(img_fit, algo, num_fit, init=init)
+        self._centroids = self._get_centroids(
+            img_fit,
+            algo,
+            sample_weight = fit_weights,
+            is_partial = init is not None and self._partial_fit,
+        )
+        self._warm_start = init is not None
+        if self._warm_start and self._max_drift is not None:
+            drift = get_drift(init, self._centroids)
+            if drift > self._max_drift:
+                logger.debug(f"Centroids drifted {drift:.3f}, cold start")
+                self._warm_start = False
+                self._clust = self._get_clust(img_fit, algo, num_fit)
+                self._centroids = self._get_centroids(
+                    img_fit,
+                    algo,
+                    sample_weight = fit_weights,
+                )
+        self._centroids = pad_centroids(self._centroids, self._num_clusters)
+        self._labels = self._get_labels(img, img_reshape)
         time_end = time()
         self._stopwatch = time_end - time_start
+        self._inertia = None
+        self._silhouette = None
+        if is_metrics:
+            self._inertia = get_inertia(img_fit, self._centroids, fit_weights)
+            self._silhouette = get_silhouette(
+                img_fit,
+                self._centroids,
+                fit_weights,
+                self._rng,
+            )
 
     @property
     def clust(self):
@@ -56,15 +202,91 @@ class Clust:
     def centroids(self):
         return self._centroids
 
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def label_weights(self):
+        return self._label_weights
+
     @property
     def num_clusters(self):
         return self._num_clusters
 
+    @property
+    def warm_start(self):
+        return self._warm_start
+
+    @property
+    def inertia(self):
+        return self._inertia
+
+    @property
+    def silhouette(self):
+        return self._silhouette
+
     @property
     def stopwatch(self):
         return self._stopwatch
 
-    def _get_clust(self, img, algo, n):
+    def _get_init(self, init_centroids, img, algo):
+        """Get initial centroids to warm-start the fit, None to start cold.
+
+        Args:
+            init_centroids (numpy.ndarray): Initial centroids requested.
+            img (numpy.ndarray): Image data to fit, one row per pixel.
+            algo (str): Algorithm requested.
+
+        Returns:
+            init (numpy.ndarray): Initial centroids in the dtype of the fit data.
+        """
+        if init_centroids is None or algo == "hac":
+            return None
+        if img.shape[0] < self._num_clusters:
+            logger.debug(f"{img.shape[0]} colors to fit, cold start")
+            return None
+        init = np.asarray(init_centroids, dtype=img.dtype)
+        if (
+            init.ndim != 2
+            or init.shape[0] > self._num_clusters
+            or init.shape[1] != img.shape[1]
+        ):
+            logger.debug(f"Initial centroids of shape {init.shape}, cold start")
+            return None
+        if init.shape[0] < self._num_clusters:
+            init = self._get_init_extended(init, img)
+        return init
+
+    def _get_init_extended(self, init, img):
+        """Complete initial centroids by k-means++ seeding on (a sample of) fit data.
+
+        Args:
+            init (numpy.ndarray): Initial centroids, fewer than num_clusters.
+            img (numpy.ndarray): Image data to fit, one row per pixel.
+
+        Returns:
+            init (numpy.ndarray): Initial centroids, num_clusters rows.
+        """
+        if self._label_weights is None:
+            w = np.ones(img.shape[0])
+        else:
+            w = self._label_weights.astype(np.float64)
+        init_size = CONSTANTS().KMEANS_INIT_SIZE
+        if img.shape[0] > init_size:
+            idx = kmeans.sample_weighted(w, init_size, self._rng)
+            img = img[idx]
+            w = np.ones(init_size)
+        centers = kmeans.init_kmeans_plusplus(
+            np.asarray(img, dtype=np.float32),
+            w,
+            self._num_clusters,
+            self._rng,
+            init = init,
+        )
+        return centers.astype(init.dtype)
+
+    def _get_clust(self, img, algo, n, **kwargs):
         """Get cluster.
 
         Args:
@@ -72,43 +294,509 @@ class Clust:
             algo (str): Algorithm requested for clusters generated.
             n (int): Number of clusters/centroids requested.
 
+        kwargs:
+            init (numpy.ndarray): Initial centroids. Default None uses
+                k-means++.
+
         Returns:
             clust (sklearn.cluster): Generated cluster.
 
         Raises:
             ValueError: algorithm not valid.
         """
+        init = kwargs.setdefault("init", None)
+        init_kwargs = {} if init is None else {"init": init, "n_init": 1}
         if algo == "kmeans":  # K-Means Clustering
-            clust = cluster.KMeans(n_clusters=n)
+            # Centering in place is safe on data this instance owns.
+            clust = cluster.KMeans(
+                n_clusters = n,
+                copy_x = not self._is_fit_copy,
+                random_state = self._random_state,
+                **init_kwargs,
+            )
         elif algo == "mbkmeans":  # MiniBatch K-Means Clustering
-            clust = cluster.MiniBatchKMeans(n_clusters=n)
-        elif algo == "hac":  # Heirarchical Agglomerative Clustering
-            clust = cluster.AgglomerativeClustering(n_clusters=n)
+            clust = cluster.MiniBatchKMeans(
+                n_clusters = n,
+                random_state = self._random_state,
+                **init_kwargs,
+            )
+        elif algo == "npkmeans":  # NumPy K-Means Clustering
+            clust = kmeans.KMeans(n_clusters=n, init=init, random_state=self._rng)
+        elif algo == "hac":  # Heirarchical Agglomerative Clustering (Ward)
+            clust = ward.Ward(n_clusters=n)
         else:
             raise ValueError(f"Invalid algorithm: {algo}")
         return clust
 
-    def _get_centroids(self, img, algo):
+    def _get_centroids(self, img, algo, **kwargs):
         """Get centroids from cluster.
 
         Args:
             img (numpy.ndarray): Matrix of image data.
             algo (str): Algorithm requested for centroids generated.
 
+        kwargs:
+            sample_weight (numpy.ndarray): Weight of each row of image data.
+                Default None weighs rows equally.
+            is_partial (bool): Update the initial centroids by a single
+                partial_fit, if supported ("mbkmeans"). Default False.
+
         Returns:
             centroids (numpy.ndarray): Array of centroids.
 
         Raises:
             ValueError: algorithm not valid.
         """
-        if algo in ["kmeans", "mbkmeans"]:
-            self._clust.fit(img)
+        sample_weight = kwargs.setdefault("sample_weight", None)
+        is_partial = kwargs.setdefault("is_partial", False)
+        if algo == "mbkmeans" and is_partial:
+            self._clust.partial_fit(img, sample_weight=sample_weight)
+            centroids = self._clust.cluster_centers_
+        elif algo in ["kmeans", "mbkmeans", "npkmeans", "hac"]:
+            self._clust.fit(img, sample_weight=sample_weight)
             centroids = self._clust.cluster_centers_
-        elif algo == "hac":
-            predict = self._clust.fit_predict(img)
-            clf = neighbors.NearestCentroid()
-            clf.fit(img, predict)
-            centroids = clf.centroids_
         else:
             raise ValueError(f"Invalid algorithm: {algo}")
         return centroids
+
+    def _get_float(self, img):
+        """Get image data as float in [0, 1] for fitting.
+
+        Float data is returned as is. Integer data is converted to float32.
+
+        Args:
+            img (numpy.ndarray): Image data, one row per pixel.
+
+        Returns:
+            img (numpy.ndarray): Float image data.
+        """
+        if self._scale != 1:
+            img = img.astype(np.float32)
+            img *= np.float32(self._scale)
+        return img
+
+    def _get_sample(self, img, n, method):
+        """Get pixel sample to fit centroids.
+
+        Args:
+            img (numpy.ndarray): Matrix of image data.
+            n (int): Number of pixels to sample.
+            method (str): Sampling method.
+
+        Returns:
+            sample (numpy.ndarray): Sampled pixels, one row per pixel.
+
+        Raises:
+            ValueError: sampling method not valid.
+        """
+        if method == "uniform":
+            sample = sample_uniform(img, n, self._rng)
+        elif method == "tile":
+            sample = sample_tile(img, n, self._rng)
+        elif method == "reservoir":
+            sample = sample_reservoir(iter_chunks(img), n, self._rng)
+        else:
+            raise ValueError(f"Invalid sampling method: {method}")
+        return sample
+
+    def _get_labels(self, img, img_reshape):
+        """Get cluster label of each pixel.
+
+        Without sampling, the labels are those of the fitted cluster (one per
+        color bin, if quantized). With sampling, each pixel (or pixel of a second, larger sample) is assigned
+        to its nearest centroid.
+
+        Args:
+            img (numpy.ndarray): Matrix of image data.
+            img_reshape (numpy.ndarray): Image data, one row per pixel.
+
+        Returns:
+            labels (numpy.ndarray): Cluster label of each pixel.
+        """
+        # Centroids in the scale of the image data, so pixels need no conversion.
+        centroids = self._centroids / self._scale
+        if not self._sample_pixels:
+            labels = self._clust.labels_
+        elif self._assign_pixels:
+            img_assign = sample_uniform(img, self._assign_pixels, self._rng)
+            labels = assign_labels(img_assign, centroids)
+        else:
+            labels = assign_labels(img_reshape, centroids)
+        return labels
+
+
+def iter_chunks(img, **kwargs):
+    """Iterate over image pixels in chunks.
+
+    Args:
+        img (numpy.ndarray): Matrix of image data.
+
+    kwargs:
+        chunk_pixels (int): Pixels per chunk. Default CONSTANTS().CHUNK_PIXELS.
+
+    Yields:
+        chunk (numpy.ndarray): Pixels, one row per pixel.
+    """
+    chunk_pixels = kwargs.setdefault("chunk_pixels", CONSTANTS().CHUNK_PIXELS)
+    img_reshape = img.reshape(-1, img.shape[-1])
+    for i in range(0, img_reshape.shape[0], chunk_pixels):
+        yield img_reshape[i:i + chunk_pixels]
+
+
+def sample_uniform(img, n, rng):
+    """Sample pixels uniformly without replacement.
+
+    Args:
+        img (numpy.ndarray): Matrix of image data.
+        n (int): Number of pixels to sample.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        sample (numpy.ndarray): Sampled pixels, one row per pixel.
+    """
+    img_reshape = img.reshape(-1, img.shape[-1])
+    num_pixels = img_reshape.shape[0]
+    if n >= num_pixels:
+        return img_reshape
+    idx = np.sort(rng.choice(num_pixels, size=n, replace=False))
+    return img_reshape[idx]
+
+
+def sample_tile(img, n, rng):
+    """Sample pixels stratified by tile.
+
+    The image is split into a grid of CONSTANTS().SAMPLE_TILES tiles and each
+    tile contributes an equal number of uniformly sampled pixels, so small
+    regions of distinct color are not missed by chance. The remainder of the
+    budget is spread one pixel each over randomly chosen tiles, so exactly n
+    pixels are sampled.
+
+    Args:
+        img (numpy.ndarray): Matrix of image data.
+        n (int): Number of pixels to sample.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        sample (numpy.ndarray): Sampled pixels, one row per pixel.
+    """
+    height, width = img.shape[:2]
+    if n >= height * width:
+        return img.reshape(-1, img.shape[-1])
+    rows, cols = (min(i, j) for i, j in zip(CONSTANTS().SAMPLE_TILES, (height, width)))
+    row_edges = np.linspace(0, height, rows + 1).astype(int)
+    col_edges = np.linspace(0, width, cols + 1).astype(int)
+    num_tiles = rows * cols
+    per_tile = np.full(num_tiles, n // num_tiles)
+    per_tile[rng.choice(num_tiles, size=n % num_tiles, replace=False)] += 1
+
+    # Offset a uniform [0, 1) draw into each tile's bounds.
+    tile_y0 = np.repeat(np.repeat(row_edges[:-1], cols), per_tile)
+    tile_x0 = np.repeat(np.tile(col_edges[:-1], rows), per_tile)
+    tile_h = np.repeat(np.repeat(np.diff(row_edges), cols), per_tile)
+    tile_w = np.repeat(np.tile(np.diff(col_edges), rows), per_tile)
+    draws = rng.random((2, n))
+    y = (tile_y0 + draws[0] * tile_h).astype(int)
+    x = (tile_x0 + draws[1] * tile_w).astype(int)
+    return img[y, x]
+
+
+def sample_reservoir(chunks, n, rng):
+    """Sample pixels from a stream of chunks by reservoir sampling (Algorithm R).
+
+    Every pixel of the stream has equal probability of being sampled, without
+    knowing the stream length in advance.
+
+    Args:
+        chunks (iterator): Chunks of pixels, one row per pixel.
+        n (int): Number of pixels to sample.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        sample (numpy.ndarray): Sampled pixels, one row per pixel.
+    """
+    reservoir = None
+    seen = 0
+    for chunk in chunks:
+        if reservoir is None:
+            reservoir = np.empty((n, chunk.shape[1]), dtype=chunk.dtype)
+        fill = min(max(n - seen, 0), chunk.shape[0])
+        reservoir[seen:seen + fill] = chunk[:fill]
+
+        # Pixel i of the stream replaces slot j < n with probability n / (i + 1).
+        stream_idx = np.arange(seen + fill, seen + chunk.shape[0])
+        slots = (rng.random(stream_idx.shape[0]) * (stream_idx + 1)).astype(np.int64)
+        keep = slots < n
+        reservoir[slots[keep]] = chunk[fill:][keep]
+        seen += chunk.shape[0]
+    return reservoir[:min(n, seen)]
+
+
+def quantize(img, bits, weights=None, **kwargs):
+    """Bin pixels into a reduced-precision color cube, in chunks.
+
+    Each channel is truncated to the requested number of bits and the pixels
+    are counted per occupied bin. The color of a bin is the mean color of its
+    pixels. Counts and color sums are accumulated per chunk, so bin indices and
+    float levels are never built for the whole image.
+
+    Args:
+        img (numpy.ndarray): Image data, one row per pixel. Integer data is
+            taken as 8 bits per channel, float data as [0, 1] per channel.
+        bits (int): Bits per channel of the color cube, 1 to 7.
+        weights (numpy.ndarray): Pixel count of each row (e.g. of bins of a
+            finer color cube). Default None counts each row as a pixel.
+
+    kwargs:
+        chunk_pixels (int): Pixels per chunk. Default CONSTANTS().CHUNK_PIXELS,
+            or the number of bins if more.
+
+    Returns:
+        colors (numpy.ndarray): Mean color of each occupied bin.
+        counts (numpy.ndarray): Pixel count of each occupied bin.
+
+    Raises:
+        ValueError: bits not valid.
+    """
+    if not 1 <= bits <= 7:
+        raise ValueError(f"Invalid quantization bits: {bits}")
+    num_channels = img.shape[1]
+    num_bins = 1 << (bits * num_channels)
+    # Each chunk is counted over all bins, so chunks are at least as large.
+    chunk_pixels = kwargs.setdefault("chunk_pixels", max(CONSTANTS().CHUNK_PIXELS, num_bins))
+    if weights is not None:
+        weights = np.asarray(weights)
+    counts = np.zeros(num_bins, dtype=np.int64 if weights is None else np.float64)
+    sums = np.zeros((num_channels, num_bins))
+    for i, chunk in enumerate(iter_chunks(img, chunk_pixels=chunk_pixels)):
+        idx = get_bins(chunk, bits)
+        if weights is None:
+            counts += np.bincount(idx, minlength=num_bins)
+        else:
+            chunk_weights = weights[i * chunk_pixels:(i + 1) * chunk_pixels]
+            counts += np.bincount(idx, weights=chunk_weights, minlength=num_bins)
+            chunk = chunk * chunk_weights[:, None]
+        for c in range(num_channels):
+            sums[c] += np.bincount(idx, weights=chunk[:, c], minlength=num_bins)
+    occupied = np.flatnonzero(counts)
+    counts = counts[occupied]
+    colors = sums[:, occupied].T / counts[:, None]
+    return colors, counts
+
+
+def get_bins(img, bits):
+    """Get color cube bin index of each pixel.
+
+    Args:
+        img (numpy.ndarray): Image data, one row per pixel. Integer data is
+            taken as 8 bits per channel, float data as [0, 1] per channel.
+        bits (int): Bits per channel of the color cube, 1 to 7.
+
+    Returns:
+        idx (numpy.ndarray): Bin index of each pixel, first channel most
+            significant.
+    """
+    if np.issubdtype(img.dtype, np.integer):
+        levels = (img >> (8 - bits)).astype(np.intp)
+    else:
+        levels = np.minimum((img * (1 << bits)).astype(np.intp), (1 << bits) - 1)
+    idx = np.zeros(img.shape[0], dtype=np.intp)
+    for c in range(img.shape[1]):
+        idx = (idx << bits) | levels[:, c]
+    return idx
+
+
+def reduce_colors(img, weights, max_colors):
+    """Reduce image data to at most max_colors colors, weighted by pixel count.
+
+    Colors are quantized into coarser color cubes until at most max_colors bins
+    are occupied. Bins of a color cube nest in the bins of coarser cubes, so
+    quantizing the bins again is the same as quantizing the pixels.
+
+    Args:
+        img (numpy.ndarray): Float image data in [0, 1], one row per pixel (or
+            color bin).
+        weights (numpy.ndarray): Pixel count of each row, None counts each row
+            as a pixel.
+        max_colors (int): Number of colors, at most.
+
+    Returns:
+        colors (numpy.ndarray): Colors, at most max_colors rows.
+        counts (numpy.ndarray): Pixel count of each color, None if not reduced
+            and each row a pixel.
+    """
+    colors, counts = img, weights
+    for bits in range(7, 0, -1):
+        if colors.shape[0] <= max_colors:
+            break
+        colors, counts = quantize(colors, bits, weights=counts)
+    logger.debug(f"{img.shape[0]} colors reduced to {colors.shape[0]}")
+    return colors, counts
+
+
+def pad_centroids(centroids, num_clusters):
+    """Pad centroids to num_clusters rows, repeating the last centroid.
+
+    Pixels are labelled by the first of equal nearest centroids, so the padded
+    clusters are empty.
+
+    Args:
+        centroids (numpy.ndarray): Array of centroids, at most num_clusters.
+        num_clusters (int): Number of clusters requested.
+
+    Returns:
+        centroids (numpy.ndarray): Array of num_clusters centroids.
+    """
+    num_pad = num_clusters - centroids.shape[0]
+    if num_pad <= 0:
+        return centroids
+    logger.debug(f"{centroids.shape[0]} clusters fitted, {num_pad} empty")
+    return np.concatenate([centroids, np.repeat(centroids[-1:], num_pad, axis=0)])
+
+
+def get_inertia(img, centroids, weights=None):
+    """Get mean squared distance of pixels to their nearest centroid, in chunks.
+
+    Args:
+        img (numpy.ndarray): Image data, one row per pixel (or color bin).
+        centroids (numpy.ndarray): Array of centroids.
+        weights (numpy.ndarray): Pixel count of each row. Default None weighs
+            rows equally.
+
+    Returns:
+        inertia (float): Weighted mean squared distance.
+    """
+    chunk_pixels = CONSTANTS().CHUNK_PIXELS
+    centroids = np.asarray(centroids, dtype=np.float64)
+    total = 0.0
+    for i, chunk in enumerate(iter_chunks(img, chunk_pixels=chunk_pixels)):
+        labels = assign_labels(chunk, centroids, chunk_pixels=chunk_pixels)
+        sq_dists = ((chunk - centroids[labels]) ** 2).sum(axis=1)
+        if weights is not None:
+            sq_dists = sq_dists * weights[i * chunk_pixels:(i + 1) * chunk_pixels]
+        total += float(sq_dists.sum())
+    count = img.shape[0] if weights is None else float(np.sum(weights))
+    return total / count
+
+
+def get_silhouette(img, centroids, weights, rng, **kwargs):
+    """Get silhouette score of a sample of pixels, labelled by nearest centroid.
+
+    The silhouette is quadratic in the number of points, so a fixed-size sample
+    bounds its cost. Weighted rows (e.g. color bins) are all scored, weighted by
+    pixel count, if within the sample size; otherwise they are sampled by weight
+    and each row sampled is scored once, weighted by the times it was drawn, so
+    the sample holds no duplicate points.
+
+    https://en.wikipedia.org/wiki/Silhouette_(clustering)
+
+    Args:
+        img (numpy.ndarray): Image data, one row per pixel (or color bin).
+        centroids (numpy.ndarray): Array of centroids.
+        weights (numpy.ndarray): Pixel count of each row, None weighs rows
+            equally.
+        rng (numpy.random.Generator): Random number generator.
+
+    kwargs:
+        sample_pixels (int): Number of pixels sampled. Default
+            CONSTANTS().SILHOUETTE_PIXELS.
+
+    Returns:
+        silhouette (float): Silhouette score in [-1, 1], None if fewer than 2
+            clusters in the sample.
+    """
+    sample_pixels = kwargs.setdefault("sample_pixels", CONSTANTS().SILHOUETTE_PIXELS)
+    if weights is None:
+        n = min(sample_pixels, img.shape[0])
+        idx = rng.choice(img.shape[0], size=n, replace=False)
+        counts = np.ones(n)
+    elif img.shape[0] <= sample_pixels:
+        idx = np.arange(img.shape[0])
+        counts = np.asarray(weights, dtype=np.float64)
+    else:
+        idx = kmeans.sample_weighted(np.asarray(weights, dtype=np.float64), sample_pixels, rng)
+        idx, counts = np.unique(idx, return_counts=True)
+    sample = np.asarray(img[idx], dtype=np.float64)
+    labels = assign_labels(sample, centroids)
+    return get_weighted_silhouette(sample, labels, counts)
+
+
+def get_weighted_silhouette(X, labels, weights):
+    """Get mean silhouette of points, each standing for weight copies of itself.
+
+    Equals sklearn.metrics.silhouette_score of the points repeated by weight,
+    without repeating them.
+
+    Args:
+        X (numpy.ndarray): Data, one row per point.
+        labels (numpy.ndarray): Cluster label of each point.
+        weights (numpy.ndarray): Number of copies of each point, at least 1.
+
+    Returns:
+        silhouette (float): Silhouette score in [-1, 1], None if fewer than 2
+            clusters, or as many clusters as copies.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    _, labels = np.unique(labels, return_inverse=True)
+    num_labels = labels.max() + 1 if labels.size else 0
+    if not 2 <= num_labels < weights.sum():
+        return None
+    onehot = np.zeros((X.shape[0], num_labels))
+    onehot[np.arange(X.shape[0]), labels] = weights
+    totals = onehot.sum(axis=0)
+    sums = metrics.pairwise_distances(X) @ onehot  # Weighted distance to each cluster.
+    rows = np.arange(X.shape[0])
+
+    # Mean distance to the other copies of the own cluster, and to the nearest
+    # other cluster. A copy alone in its cluster scores 0.
+    own = totals[labels] - 1
+    a = np.divide(sums[rows, labels], own, out=np.zeros(X.shape[0]), where=own > 0)
+    means = sums / totals
+    means[rows, labels] = np.inf
+    b = means.min(axis=1)
+    s = np.divide(b - a, np.maximum(a, b), out=np.zeros(X.shape[0]), where=np.maximum(a, b) > 0)
+    s[own == 0] = 0
+    return float(np.sum(weights * s) / weights.sum())
+
+
+def get_drift(init_centroids, centroids):
+    """Get mean distance of centroids from their initial centroids.
+
+    Args:
+        init_centroids (numpy.ndarray): Initial centroids.
+        centroids (numpy.ndarray): Centroids fitted, in order of
+            init_centroids.
+
+    Returns:
+        drift (float): Mean Euclidean distance.
+    """
+    diff = np.asarray(centroids, dtype=np.float64) - init_centroids
+    return float(np.sqrt((diff ** 2).sum(axis=1)).mean())
+
+
+def assign_labels(img, centroids, **kwargs):
+    """Assign each pixel to its nearest centroid, in chunks.
+
+    Chunking bounds the memory of the pixel to centroid distance matrix. Distances
+    are float64 for float64 image data, float32 otherwise.
+
+    Args:
+        img (numpy.ndarray): Image data, one row per pixel.
+        centroids (numpy.ndarray): Array of centroids.
+
+    kwargs:
+        chunk_pixels (int): Pixels per chunk. Default CONSTANTS().CHUNK_PIXELS.
+
+    Returns:
+        labels (numpy.ndarray): Label of nearest centroid of each pixel.
+    """
+    chunk_pixels = kwargs.setdefault("chunk_pixels", CONSTANTS().CHUNK_PIXELS)
+    float_dtype = np.float64 if img.dtype == np.float64 else np.float32
+    centroids = np.asarray(centroids, dtype=float_dtype)
+    dtype = np.uint8 if centroids.shape[0] <= 256 else np.int32
+    labels = np.empty(img.shape[0], dtype=dtype)
+    centroids_sq = (centroids ** 2).sum(axis=1)
+    for i, chunk in enumerate(iter_chunks(img, chunk_pixels=chunk_pixels)):
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, |x|^2 is constant per pixel.
+        dists = centroids_sq - 2 * (chunk @ centroids.T)
+        labels[i * chunk_pixels:(i + 1) * chunk_pixels] = dists.argmin(axis=1)
+    return labels
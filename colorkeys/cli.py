@@ -5,6 +5,7 @@ This module is the CLI front-end for the colorkeys analysis tool.
 """
 
 import argparse
+import itertools
 import logging
 import os
 import pkg_resources
@@ -12,12 +13,14 @@ import sys
 
 from pprint import pformat
 
-from colorkeys.colorkeys import ColorKey
+from colorkeys.cache import Cache
 from colorkeys.constants import _const as CONSTANTS
 from colorkeys.render import Layout
 from colorkeys import aws
+from colorkeys import batch
 from colorkeys import codecjson
 from colorkeys import filepath
+from colorkeys import filmstrip
 from engcommon import clihelper
 from engcommon import log
 from engcommon import testvar
@@ -40,7 +43,8 @@ def get_command(args):
         choices = [
             "kmeans",
             "mbkmeans",
-            # "hac",  # HAC is too slow in sklearn
+            "npkmeans",
+            "hac",
         ],
         default = [
             "mbkmeans",
@@ -49,12 +53,40 @@ def get_command(args):
         nargs = "+",
         type = str,
     )
+    parser.add_argument(
+        "--analysis-max-side",
+        action = "store",
+        help = "Longest side of images analysed in px, larger images downscaled at decode (default full resolution)",
+        required = False,
+        type = int,
+    )
+    parser.add_argument(
+        "--assign-pixels",
+        action = "store",
+        help = "Number of pixels sampled for cluster shares (default all pixels)",
+        required = False,
+        type = int,
+    )
     parser.add_argument(
         "--aws",
         action = "store_true",
         default = False,
         help = "Access AWS resources for CI/CD",
     )
+    parser.add_argument(
+        "--cache-dir",
+        action = "store",
+        help = "Directory of palette cache (default no cache)",
+        required = False,
+        type = str,
+    )
+    parser.add_argument(
+        "--cache-size",
+        action = "store",
+        default = CONSTANTS().CACHE_MAX_BYTES >> 20,
+        help = "Size bound of palette cache in MiB, least recently used evicted",
+        type = int,
+    )
     parser.add_argument(
         "-c", "--colorspaces",
         action = "store",
@@ -81,15 +113,38 @@ def get_command(args):
         required = False,
         type = clihelper.csv_str,
     )
+    parser.add_argument(
+        "--dtype",
+        action = "store",
+        choices = CONSTANTS().PIPELINE_DTYPES,
+        default = CONSTANTS().PIPELINE_DTYPE,
+        help = "Pixel pipeline dtype (uint8 fits in float32 per sample/chunk)",
+        type = str,
+    )
+    parser.add_argument(
+        "--end",
+        action = "store",
+        help = "Timecode to end sampling of video frames, HH:MM:SS (default end of video)",
+        required = False,
+        type = str,
+    )
     parser.add_argument(
         "-e", "--export",
         action = "store_true",
-        help = "Export JSON information to zip file",
+        help = "Export JSON information to archive, streamed as generated",
+    )
+    parser.add_argument(
+        "--export-format",
+        action = "store",
+        choices = CONSTANTS().EXPORT_COMPRESSIONS,
+        default = "gzip",
+        help = "Archive of --export NDJSON records (zip is not readable after a crash)",
+        type = str,
     )
     parser.add_argument(
         "-i", "--images",
         action = "append",
-        help = "Image(s) to process",
+        help = "Image(s) to process, and/or video(s) to sample frames of",
         nargs = "+",
         required = True,
         type = str,
@@ -99,6 +154,18 @@ def get_command(args):
         action = "store_true",
         help = "Print JSON information",
     )
+    parser.add_argument(
+        "--jobs",
+        action = "store",
+        default = 1,
+        help = "Number of worker processes to analyse images and video segments (disables plot)",
+        type = int,
+    )
+    parser.add_argument(
+        "-k", "--keyframes",
+        action = "store_true",
+        help = "Sample video keyframes only, at least --spf seconds apart (fast preview)",
+    )
     parser.add_argument(
         "-l", "--logid",
         action = "store",
@@ -106,11 +173,24 @@ def get_command(args):
         required = False,
         type = str,
     )
+    parser.add_argument(
+        "--no-cache",
+        action = "store_true",
+        help = "Do not use palette cache of --cache-dir",
+    )
     parser.add_argument(
         "-n", "--num-clusters",
         action = "store",
-        help = "Number of clusters to detect",
+        help = "Number(s) of clusters to detect, e.g. 5, 3,5,7 or a range 3-12[:step] (sweep, with metrics per number)",
+        nargs = "+",
         required = True,
+        type = get_num_clusters,
+    )
+    parser.add_argument(
+        "--prefetch",
+        action = "store",
+        default = 0,
+        help = "Number of images read ahead of analysis, without --jobs (default 0, no prefetch)",
         type = int,
     )
     parser.add_argument(
@@ -125,6 +205,76 @@ def get_command(args):
         action = "store_true",
         help = "Plot image and color key histogram bar",
     )
+    xor_fit_group = parser.add_mutually_exclusive_group()
+    xor_fit_group.add_argument(
+        "-q", "--quantize-bits",
+        action = "store",
+        choices = range(1, 8),
+        help = "Bits per channel of color cube to fit clusters on binned colors",
+        metavar = "{1-7}",
+        required = False,
+        type = int,
+    )
+    parser.add_argument(
+        "--readers",
+        action = "store",
+        default = 1,
+        help = "Number of reader threads for --prefetch",
+        type = int,
+    )
+    parser.add_argument(
+        "--refresh",
+        action = "store_true",
+        help = "Generate cached palettes again, replacing cache entries",
+    )
+    parser.add_argument(
+        "--sample-method",
+        action = "store",
+        choices = CONSTANTS().SAMPLE_METHODS,
+        default = "uniform",
+        help = "Pixel sampling method for --sample-pixels",
+        type = str,
+    )
+    xor_fit_group.add_argument(
+        "--sample-pixels",
+        action = "store",
+        help = "Number of pixels sampled to fit clusters (default all pixels)",
+        required = False,
+        type = int,
+    )
+    parser.add_argument(
+        "--seed",
+        action = "store",
+        help = f"Seed for sampling and clustering (default {CONSTANTS().CACHE_SEED} with cache)",
+        required = False,
+        type = int,
+    )
+    parser.add_argument(
+        "--shot-threshold",
+        action = "store",
+        help = "Color histogram distance (0-1) within which video frames reuse the palettes of the last analysed frame",
+        required = False,
+        type = float,
+    )
+    parser.add_argument(
+        "--spf",
+        action = "store",
+        default = 1,
+        help = "Seconds per video frame sampled",
+        type = int,
+    )
+    parser.add_argument(
+        "--start",
+        action = "store",
+        default = "00:00:00",
+        help = "Timecode to start sampling of video frames, HH:MM:SS",
+        type = str,
+    )
+    parser.add_argument(
+        "--warm-start",
+        action = "store_true",
+        help = "Initialise the clusters of each video frame from the previous frame",
+    )
     parser.add_argument(
         "-v", "--version",
         action = "version",
@@ -132,9 +282,37 @@ def get_command(args):
         help = "Show version number and exit",
     )
     args = vars(parser.parse_args(args))
+    args["num_clusters"] = sorted(set(itertools.chain.from_iterable(args["num_clusters"])))
     return args
 
 
+def get_num_clusters(value):
+    """Get numbers of clusters of a CLI argument.
+
+    Args:
+        value (str): Number (e.g. "5"), comma-separated numbers (e.g. "3,5,7")
+            or an inclusive range with an optional step (e.g. "3-12", "3-12:3").
+
+    Returns:
+        num_clusters (list): Numbers of clusters.
+
+    Raises:
+        argparse.ArgumentTypeError: Not numbers of clusters.
+    """
+    num_clusters = []
+    try:
+        for item in value.split(","):
+            item, _, step = item.partition(":")
+            first, _, last = item.partition("-")
+            last = last or first
+            num_clusters.extend(range(int(first), int(last) + 1, int(step or 1)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number(s) of clusters: {value!r}")
+    if not num_clusters or min(num_clusters) < 1:
+        raise argparse.ArgumentTypeError(f"invalid number(s) of clusters: {value!r}")
+    return num_clusters
+
+
 def run(args):
     """Run.
 
@@ -169,6 +347,19 @@ def run(args):
     showjson = args["json"]
     exportjson = args["export"]
     is_aws = args["aws"]
+    jobs = args["jobs"]
+    is_cache = args["cache_dir"] and not args["no_cache"]
+    seed = args["seed"]
+    if is_cache and seed is None:
+        # Cached palettes must be reproducible from their key.
+        seed = CONSTANTS().CACHE_SEED
+    clust_kwargs = {
+        "sample_pixels": args["sample_pixels"],
+        "sample_method": args["sample_method"],
+        "assign_pixels": args["assign_pixels"],
+        "quantize_bits": args["quantize_bits"],
+        "random_state": seed,
+    }
 
     # Get AWS info.
     if is_aws:
@@ -177,6 +368,13 @@ def run(args):
     else:
         my_aws = None
 
+    if jobs > 1 and showplot:
+        logger.warning("Plot is not available with --jobs, disabling plot")
+        showplot = False
+
+    if jobs > 1 and (args["prefetch"] > 0 or args["readers"] != 1):
+        logger.warning("Prefetch is not available with --jobs, workers read their own images, ignoring --prefetch and --readers")
+
     if showplot:
         import matplotlib
         matplotlib.use('Qt5Agg')
@@ -186,41 +384,132 @@ def run(args):
     objs = []
     epoch_seconds = codecjson.get_epoch_seconds()[-8:]
     imgsrcs = filepath.get_files(imgpaths, CONSTANTS().IMG_SUFFIXES)
-    for imgsrc in imgsrcs:
-        palettes = []
-        for algo in algos:
-            for colorspace in colorspaces:
-                palette = ColorKey(
-                    imgsrc,
-                    algo,
-                    num_clusters,
-                    colorspace = colorspace,
-                )
-                palettes.append(palette)
-                obj = codecjson.compile(palette, epoch_seconds, my_aws=my_aws)
+    videos = filepath.get_files(imgpaths, CONSTANTS().VIDEO_SUFFIXES)
+    context = codecjson.get_run_context(epoch_seconds, my_aws=my_aws)
+    if is_cache:
+        my_cache = Cache(
+            args["cache_dir"],
+            max_bytes = args["cache_size"] << 20,
+            refresh = args["refresh"],
+            version = f"{context.version}+{context.githash}",
+        )
+    else:
+        my_cache = None
+    analysis_kwargs = {
+        "algos": algos,
+        "colorspaces": colorspaces,
+        "num_clusters": num_clusters,
+        "epoch_seconds": epoch_seconds,
+        "context": context,
+        "clust_kwargs": clust_kwargs,
+        "dtype": args["dtype"],
+        "cache": my_cache,
+        "max_side": args["analysis_max_side"],
+    }
+    if jobs > 1:
+        results = (
+            (None, objs_img)
+            for _, objs_img in batch.run_pool(imgsrcs, jobs, analysis_kwargs)
+        )
+    else:
+        if args["prefetch"] > 0:
+            reads = batch.prefetch(
+                imgsrcs,
+                args["prefetch"],
+                args["readers"],
+                max_side = args["analysis_max_side"],
+            )
+        else:
+            reads = ((imgsrc, None) for imgsrc in imgsrcs)
+        results = (
+            batch.analyse(imgsrc, artwork=artwork, **analysis_kwargs)
+            for imgsrc, artwork in reads
+        )
+
+    # Video frames are decoded and analysed by segment in worker processes, or
+    # in this process.
+    if jobs > 1:
+        frames = (
+            (None, objs_img)
+            for video in videos
+            for _, objs_img in filmstrip.run_segments(
+                video,
+                args["start"],
+                args["end"],
+                args["spf"],
+                jobs,
+                analysis_kwargs,
+                keyframes = args["keyframes"],
+                warm_start = args["warm_start"],
+                shot_threshold = args["shot_threshold"],
+            )
+        )
+    else:
+        frames = (
+            (palettes, objs_img)
+            for video in videos
+            for _, palettes, objs_img in filmstrip.analyse_frames(
+                video,
+                args["start"],
+                args["end"],
+                args["spf"],
+                keyframes = args["keyframes"],
+                warm_start = args["warm_start"],
+                shot_threshold = args["shot_threshold"],
+                **analysis_kwargs,
+            )
+        )
+    results = itertools.chain(results, frames)
+
+    # Records are streamed to the export archive as each image is analysed, and
+    # only kept in memory to print.
+    if exportjson or is_aws:
+        my_ark = filepath.ArkWriter(
+            dest_dir = my_cli.logdir,
+            basename = epoch_seconds,
+            compression = args["export_format"],
+        )
+    else:
+        my_ark = None
+    try:
+        for palettes, objs_img in results:
+            for obj in objs_img:
                 logger.debug(testvar.get_debug(obj))
-                objs.append(obj)
-        if showplot:
-            layout = Layout(palettes)
-            layout.draw_palettes()
-            plt.pause(0.001)
+                if len(num_clusters) > 1:
+                    hist = obj["histogram"]
+                    logger.info(
+                        f"{obj['filename']}: {hist['algo']}, {hist['colorspace']}, "
+                        f"n_clusters = {hist['n_clusters']}, "
+                        f"inertia = {hist.get('inertia')}, "
+                        f"silhouette = {hist.get('silhouette')}"
+                    )
+                if my_ark:
+                    my_ark.write(obj)
+            if my_ark:
+                my_ark.flush()
+            if showjson:
+                objs.extend(objs_img)
+            if showplot:
+                layout = Layout(palettes)
+                layout.draw_palettes()
+                plt.pause(0.001)
+    finally:
+        if my_ark:
+            my_ark.close()
+
+    if my_cache and jobs == 1:  # Workers count their own.
+        logger.info(f"Palette cache: {my_cache.hits} hits, {my_cache.misses} misses")
 
     if showplot:
         input("\nPress [Return] to exit.")
 
-    if showjson or exportjson or is_aws:
-        objs_json = codecjson.encode(objs)
-        if showjson:
-            logger_noformat.info(pformat(objs))
+    if showjson:
+        logger_noformat.info(pformat(objs))
+    if my_ark:
         if exportjson:
-            export_file = filepath.ark(
-                objs_json,
-                dest_dir=my_cli.logdir,
-                basename=epoch_seconds,
-            )
-            logger_noformat.info(f"JSON export: {export_file}")
+            logger_noformat.info(f"JSON export: {my_ark.path}")
         if is_aws:
-            my_aws.upload_S3("stage-colorkeys-tmp", objs_json)
+            my_aws.upload_file_S3("stage-colorkeys-tmp", my_ark.path)
 
     return None
 
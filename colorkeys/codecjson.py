@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 
+import codecs
 import hashlib
 import json
 import logging
+import math
+import os
 import pkg_resources
 import psutil
 import re
 import sys
+import time
 from datetime import datetime
 from datetime import timezone
 from decimal import Decimal
@@ -16,9 +20,142 @@ from urllib import request
 from engcommon import command
 from engcommon import testvar
 
+from colorkeys.constants import _const as CONSTANTS
+
 logger = logging.getLogger(__name__)
 
 
+class RunContext:
+    """A class for the metadata of the run generating palettes.
+
+    Version, githash, and task info are the same for every palette of a run, and
+    some are expensive to get (githash shells out to pip). They are collected
+    once per process and reused by compile().
+
+    Refresh rules:
+        * version, githash, cpu, and task_hash are fixed for the life of the
+          process (and its workers, which run the same installed package).
+        * memory of a non-AWS task is available memory, which changes over the
+          run. It is refreshed when older than CONSTANTS().RUN_CONTEXT_TTL.
+        * refresh() collects everything again, e.g. after the package is
+          reinstalled in a long-lived process.
+
+    Attributes:
+        pkg_name (str): Package name.
+        epoch_seconds (str): Seconds used for non-AWS task_hash.
+        version (str): Package version.
+        githash (str): Git commit hash of package.
+        task_info (dict): "cpu", "memory", and "task_hash" of task.
+    """
+    def __init__(self, epoch_seconds, **kwargs):
+        """Init RunContext.
+
+        Args:
+            epoch_seconds (str): Seconds used for non-AWS task_hash.
+
+        kwargs:
+            my_aws (aws.AWS): Instance including AWS container task info.
+            pkg_name (str): Package name. Default this package.
+        """
+        self._epoch_seconds = epoch_seconds
+        self._task_aws = get_task_aws(kwargs.setdefault("my_aws", None))
+        self._pkg_name = kwargs.setdefault(
+            "pkg_name",
+            vars(sys.modules[__name__])["__package__"]
+        )
+        self.refresh()
+
+    @property
+    def pkg_name(self):
+        """Package name."""
+        return self._pkg_name
+
+    @property
+    def epoch_seconds(self):
+        """Seconds used for non-AWS task_hash."""
+        return self._epoch_seconds
+
+    @property
+    def version(self):
+        """Package version."""
+        return self._version
+
+    @property
+    def githash(self):
+        """Git commit hash of package."""
+        return self._githash
+
+    @property
+    def task_info(self):
+        """Task info, with memory refreshed if stale."""
+        if not self._task_aws:
+            age = time.monotonic() - self._memory_time
+            if age > CONSTANTS().RUN_CONTEXT_TTL:
+                self._task_info["memory"] = get_memory_available()
+                self._memory_time = time.monotonic()
+        return dict(self._task_info)
+
+    def refresh(self):
+        """Collect all run metadata again."""
+        self._version = get_version(self._pkg_name)
+        self._githash = get_githash(self._pkg_name)
+        self._task_info = self._get_task_info()
+        self._memory_time = time.monotonic()
+        return None
+
+    def _get_task_info(self):
+        """Get info of the task generating palettes.
+
+        Args:
+            None
+
+        Returns:
+            task_info (dict): "cpu", "memory", and "task_hash" of task.
+        """
+        if self._task_aws:
+            task_info = dict(self._task_aws)
+        else:
+            task_info = {
+                "cpu": int(psutil.cpu_count(logical=False)) * 1024,
+                "memory": get_memory_available(),
+                "task_hash": self._epoch_seconds,
+            }
+        return task_info
+
+    def __getstate__(self):
+        """Pickle for worker processes, which keep the parent's metadata."""
+        state = self.__dict__.copy()
+        state["_memory_time"] = -math.inf  # Monotonic clock is per process.
+        return state
+
+
+def get_run_context(epoch_seconds, **kwargs):
+    """Get the run context of this process, collecting it on first use.
+
+    A context is kept per process and task: a forked worker collects its own
+    rather than inheriting a stale memory timestamp.
+
+    Args:
+        epoch_seconds (str): Seconds used for non-AWS task_hash.
+
+    kwargs:
+        my_aws (aws.AWS): Instance including AWS container task info.
+
+    Returns:
+        context (colorkeys.codecjson.RunContext): Run context.
+    """
+    my_aws = kwargs.setdefault("my_aws", None)
+    task_hash = my_aws.task_hash if my_aws else None
+    key = (os.getpid(), epoch_seconds, task_hash)
+    if key not in _run_contexts:
+        _run_contexts.clear()
+        _run_contexts[key] = RunContext(epoch_seconds, my_aws=my_aws)
+    return _run_contexts[key]
+
+
+_run_contexts = {}
+
+
 def compile(palette, epoch_seconds, **kwargs):
     """Prepare a ColorKey object for JSON encoding.
 
@@ -31,12 +168,25 @@ def compile(palette, epoch_seconds, **kwargs):
 
     kwargs:
         my_aws (aws.AWS): Instance including AWS container task info.
+        context (colorkeys.codecjson.RunContext): Run metadata. Default the
+            run context of this process, from get_run_context().
+        filehash (str): Hash of palette image source. Default the hash of the
+            bytes the palette image was decoded from.
+        reused_from (str): File name of the image the palette was generated
+            for, if reused for this image (e.g. a frame of the same shot).
+            Default None.
 
     Retuns:
         obj (dict): Palette ready for JSON encoding.
     """
     my_aws = kwargs.setdefault("my_aws", None)
-    pkg_name = vars(sys.modules[__name__])["__package__"]
+    context = kwargs.setdefault("context", None)
+    filehash = kwargs.setdefault("filehash", None)
+    reused_from = kwargs.setdefault("reused_from", None)
+    if not filehash:
+        filehash = palette.filehash
+    if not context:
+        context = get_run_context(epoch_seconds, my_aws=my_aws)
     histogram = {
         "algo": palette.hist.algo,
         "colorspace": palette.hist.colorspace,
@@ -44,26 +194,43 @@ def compile(palette, epoch_seconds, **kwargs):
         "stopwatch": palette.hist.stopwatch,
         "hist_centroids": palette.hist.hist_centroids,
     }
+    # Quality metrics, if measured (e.g. by a sweep of numbers of clusters).
+    for metric in ("inertia", "silhouette"):
+        value = getattr(palette.hist, metric, None)
+        if value is not None:
+            histogram[metric] = value
     obj = {
         "filename": Path(palette.imgsrc).name,
-        "filehash": get_filehash(palette.imgsrc),
+        "filehash": filehash,
         "shape": palette.img.shape,
         "timestamp": get_timestamp(),
-        "version": get_version(pkg_name),
-        "githash": get_githash(pkg_name),
+        "version": context.version,
+        "githash": context.githash,
         "histogram": histogram,
     }
-    if my_aws:
-        obj["cpu"] = my_aws.task_desc["cpu"]
-        obj["memory"] = my_aws.task_desc["memory"]
-        obj["task_hash"] = my_aws.task_hash
-    else:
-        obj["cpu"] = int(psutil.cpu_count(logical=False)) * 1024
-        obj["memory"] = int(psutil.virtual_memory().available / 1024 / 1024)
-        obj["task_hash"] = epoch_seconds
+    if reused_from:
+        obj["reused_from"] = reused_from
+    obj.update(context.task_info)
     return obj
 
 
+def get_task_aws(my_aws):
+    """Get task info of an AWS container task, None if not on AWS."""
+    if not my_aws:
+        return None
+    task_aws = {
+        "cpu": my_aws.task_desc["cpu"],
+        "memory": my_aws.task_desc["memory"],
+        "task_hash": my_aws.task_hash,
+    }
+    return task_aws
+
+
+def get_memory_available():
+    """Get available memory in MiB."""
+    return int(psutil.virtual_memory().available / 1024 / 1024)
+
+
 def encode(obj):
     """Encode Python object to JSON."""
     return json.dumps(obj)
@@ -74,9 +241,68 @@ def decode(str_):
     return json.loads(str_, parse_float=Decimal, parse_int=int)
 
 
+def iter_decode(f, **kwargs):
+    """Iterate Python objects decoded from a stream of JSON records.
+
+    Records are decoded as they are read, so memory is bounded by the size of a
+    record, not of the stream. The stream may be a JSON array of records, NDJSON
+    (one record per line), or a single record.
+
+    A record that fails to decode is only read further if it may just be
+    incomplete: JSON strings and literals do not span lines, so a record that
+    fails to decode before the end of a line is malformed, and raises at once.
+
+    Args:
+        f (file object): Binary stream, read by f.read1(size) if available, else
+            f.read(size). A buffered f.read(size) drops the data it has read if
+            a later read of the same call fails (e.g. a truncated gzip stream),
+            f.read1(size) reads at most once.
+
+    kwargs:
+        chunk_size (int): Bytes read at a time. Default
+            CONSTANTS().READ_CHUNK_SIZE.
+
+    Yields:
+        obj (object): Record decoded, as by decode().
+
+    Raises:
+        json.JSONDecodeError: stream not valid.
+    """
+    chunk_size = kwargs.setdefault("chunk_size", CONSTANTS().READ_CHUNK_SIZE)
+    read = getattr(f, "read1", f.read)
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    while True:
+        # Skip whitespace and the brackets and commas of an array of records.
+        while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos < len(buf):
+            try:
+                obj, pos = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if eof or buf.find("\n", e.pos) != -1:
+                    raise
+            else:
+                yield obj
+                continue
+        if eof:
+            return
+        chunk = read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+
+
+_decoder = json.JSONDecoder(parse_float=Decimal, parse_int=int)
+
+
 def get_obj_from_file(filename):
-    """Get Python object from JSON file."""
+    """Get Python object from JSON file, a list of records from NDJSON file."""
     with open(filename) as f:
+        if filename.endswith(CONSTANTS().NDJSON_SUFFIXES):
+            return [decode(line) for line in f if line.strip()]
         str_ = f.read()
     return decode(str_)
 
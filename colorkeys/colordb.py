@@ -14,6 +14,7 @@ from colorkeys import codecjson
 from colorkeys import filepath
 from colorkeys import statistics as colorstats
 from colorkeys.constants import _const as CONSTANTS
+from colorkeys.querycache import QueryCache
 from engcommon import clihelper
 from engcommon import log
 
@@ -69,16 +70,37 @@ def get_command(args):
     # subcommand "load"
     parser_load = subparsers.add_parser(
         "load",
-        help = "Load JSON files",
+        help = "Load JSON files (plain, or export archives)",
+    )
+    parser_load.add_argument(
+        "--cache-file",
+        action = "store",
+        help = "SQLite query cache to add loaded colorkeys to",
+        required = False,
+        type = str,
     )
     parser_load.add_argument(
         "-f", "--files",
         action = "append",
-        help = "JSON file(s) to load",
+        help = "JSON/NDJSON file(s) to load, plain or zip/tar/gzip, local or S3",
         nargs = "+",
         required = True,
         type = str,
     )
+    parser_load.add_argument(
+        "-r", "--readers",
+        action = "store",
+        default = CONSTANTS().LOAD_READERS,
+        help = "Number of files read in parallel",
+        type = int,
+    )
+    parser_load.add_argument(
+        "-w", "--workers",
+        action = "store",
+        default = CONSTANTS().DYNAMODB_WORKERS,
+        help = "Number of threads writing to DynamoDB",
+        type = int,
+    )
     parser_load.set_defaults(func=load)
 
     # subcommand "query"
@@ -92,12 +114,27 @@ def get_command(args):
         choices = [
             "kmeans",
             "mbkmeans",
-            # "hac",  # HAC is too slow in sklearn
+            "npkmeans",
+            "hac",
         ],
         help = "Clustering algorithm(s) for color detection",
         required = True,
         type = str,
     )
+    parser_query.add_argument(
+        "--cache-file",
+        action = "store",
+        help = "SQLite query cache to read through (default no cache)",
+        required = False,
+        type = str,
+    )
+    parser_query.add_argument(
+        "--cache-ttl",
+        action = "store",
+        default = CONSTANTS().QUERY_CACHE_TTL,
+        help = "Seconds a query is answered from cache",
+        type = float,
+    )
     parser_query.add_argument(
         "-c", "--colorspace",
         action = "store",
@@ -122,6 +159,11 @@ def get_command(args):
         nargs = "+",
         type = str,
     )
+    parser_query.add_argument(
+        "--invalidate",
+        action = "store_true",
+        help = "Remove cached queries of filehashes before querying",
+    )
     parser_query.add_argument(
         "-n", "--num-clusters",
         action = "store",
@@ -129,10 +171,25 @@ def get_command(args):
         required = True,
         type = int,
     )
+    parser_query.add_argument(
+        "--percentiles",
+        action = "store",
+        help = "Percentiles to generate with statistics (holds query in memory)",
+        nargs = "+",
+        required = False,
+        type = float,
+    )
     parser_query.add_argument(
         "--stats",
         action = "store_true",
-        help = "Generate statistics for query",
+        help = "Generate statistics (mean, std) for query, streamed",
+    )
+    parser_query.add_argument(
+        "-w", "--workers",
+        action = "store",
+        default = CONSTANTS().DYNAMODB_WORKERS,
+        help = "Number of threads querying DynamoDB",
+        type = int,
     )
     parser_query.set_defaults(func=query)
 
@@ -183,42 +240,85 @@ def query(args, logger, logger_noformat):
             filehashes.append(codecjson.get_filehash(filename))
     elif args["hash"]:
         filehashes = args["hash"]
-    colorkeys = []
-    for filehash in filehashes:
-        response = aws.query_dynamodb(
-            site,
-            "stage-colorkeys",
-            filehash,
-            algo,
-            colorspace,
-            num_clusters
+    cache = get_cache(args)
+    if cache and args["invalidate"]:
+        cache.invalidate(filehashes)
+    items = aws.query_many_dynamodb(
+        site,
+        "stage-colorkeys",
+        filehashes,
+        algo,
+        colorspace,
+        num_clusters,
+        workers = args["workers"],
+        cache = cache,
+    )
+    colorkeys = (aws.replace_decimals(item) for item in items)
+    np.set_printoptions(precision=3, suppress=True)
+    if args["percentiles"]:
+        # Percentiles are not streamable: stack all colorkeys in memory.
+        tensor = colorstats.get_tensor(list(colorkeys), num_clusters)
+        num_colorkeys = tensor.shape[0]
+        cluster_means = colorstats.get_cluster_means(tensor)
+        cluster_stds = colorstats.get_cluster_stds(tensor)
+        cluster_percentiles = colorstats.get_cluster_percentiles(
+            tensor,
+            args["percentiles"],
         )
-        colorkeys.extend(response["Items"])
-    colorkeys = aws.replace_decimals(colorkeys)
-    if stats:
-        np.set_printoptions(precision=3, suppress=True)
-        centroids = colorstats.get_centroids(colorkeys)
-        clusters = colorstats.get_centroids_by_cluster(centroids)
-        cluster_means = colorstats.get_cluster_means(clusters)
-        cluster_stds = colorstats.get_cluster_stds(clusters)
-
-        logger_noformat.debug(f"centroids:\n{pformat(centroids)}")
-        logger_noformat.debug(f"clusters:\n{pformat(clusters)}")
+        logger_noformat.debug(f"centroids:\n{pformat(tensor)}")
+    elif stats:
+        my_welford = colorstats.Welford(num_clusters)
+        for tensor in colorstats.iter_tensors(colorkeys, num_clusters):
+            my_welford.update(tensor)
+        num_colorkeys = my_welford.count
+        cluster_means = my_welford.mean
+        cluster_stds = my_welford.std
+    else:
+        num_colorkeys = sum(1 for _ in colorkeys)
+    logger.info(f"Queried {num_colorkeys} colorkeys of {len(filehashes)} hash(es)")
+    if cache:
+        logger.info(f"Query cache: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+    if stats or args["percentiles"]:
         logger_noformat.info(f"means:\n{pformat(cluster_means)}")
         logger_noformat.info(f"stds:\n{pformat(cluster_stds)}")
+    if args["percentiles"]:
+        for q, percentiles in zip(args["percentiles"], cluster_percentiles):
+            logger_noformat.info(f"p{q:g}:\n{pformat(percentiles)}")
     return None
 
 
 def load(args, logger, logger_noformat):
     filepaths = args["files"]
     site = args["site"]
-    jsonfiles = filepath.get_files(filepaths, CONSTANTS().JSON_SUFFIXES)
-    for filename in jsonfiles:
-        colorkeys = codecjson.get_obj_from_file(filename)
-        aws.load_dynamodb(site, "stage-colorkeys", colorkeys)
+    workers = args["workers"]
+    cache = get_cache(args)
+    jsonfiles = filepath.get_record_files(filepaths)
+    colorkeys = filepath.stream_records(jsonfiles, readers=args["readers"])
+    num_items = aws.load_dynamodb(
+        site,
+        "stage-colorkeys",
+        colorkeys,
+        workers = workers,
+        cache = cache,
+    )
+    logger.info(f"Loaded {num_items} colorkeys from {len(jsonfiles)} file(s)")
+    if cache:
+        cache.close()
     return None
 
 
+def get_cache(args):
+    """Get query cache of --cache-file, None if not requested."""
+    if not args["cache_file"]:
+        return None
+    cache = QueryCache(
+        args["cache_file"],
+        ttl = args.get("cache_ttl", CONSTANTS().QUERY_CACHE_TTL),
+    )
+    return cache
+
+
 def main():
     args = sys.argv[1:]
     d = get_command(args)
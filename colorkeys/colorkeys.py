@@ -11,6 +11,7 @@ This module creates and displays color keys (palettes) from a requested image.
 import logging
 
 from colorkeys.artwork import Artwork
+from colorkeys.constants import _const as CONSTANTS
 from colorkeys.histogram import Hist
 
 logger = logging.getLogger(__name__)
@@ -40,9 +41,22 @@ class ColorKey(Artwork):
 
         kwargs:
             colorspace (str): Colorspace for which to generate histogram information.
+            artwork (colorkeys.artwork.Artwork): Loaded artwork to share image data.
+            img_preprocessed (numpy.ndarray): Image already converted to the
+                pipeline dtype in the histogram colorspace.
+            dtype (str): Pipeline dtype (e.g. "float32").
+            clust_kwargs (dict): kwargs for colorkeys.centroids.Clust
+                (e.g. sample_pixels).
+            hist (colorkeys.cache.CachedHist): Histogram information already
+                generated (e.g. cached). Skips clustering.
         """
         self._hist_colorspace = kwargs["colorspace"]
-        self._hist = self._get_hist(algo, num_clusters)
+        self._img_preprocessed = kwargs.setdefault("img_preprocessed", None)
+        self._dtype = kwargs.setdefault("dtype", CONSTANTS().PIPELINE_DTYPE)
+        self._clust_kwargs = kwargs.setdefault("clust_kwargs", {})
+        self._hist = kwargs.setdefault("hist", None)
+        if self._hist is None:
+            self._hist = self._get_hist(algo, num_clusters)
 
     @property
     def hist(self):
@@ -58,11 +72,18 @@ class ColorKey(Artwork):
         Returns:
             hist (colorkeys.histogram.Hist): Histogram information.
         """
+        if self._img_preprocessed is not None:
+            img = self._img_preprocessed
+        else:
+            img = self.img
         hist = Hist(
-            self.img,
+            img,
             algo,
             num_clusters,
             self._hist_colorspace,
             self.rescaled_width,
+            is_preprocessed = self._img_preprocessed is not None,
+            dtype = self._dtype,
+            **self._clust_kwargs,
         )
         return hist
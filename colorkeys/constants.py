@@ -4,6 +4,8 @@
 Package constants.
 """
 
+import os
+
 
 def constant(f):
     def fset(self, value):
@@ -18,7 +20,31 @@ class _const(object):
 
     @constant
     def DYNAMODB_URL_LOCAL():
-        return "http://localhost:8000"
+        return os.environ.get("DYNAMODB_URL_LOCAL", "http://localhost:8000")
+
+    @constant
+    def DYNAMODB_BATCH_SIZE():
+        return 25  # items per BatchWriteItem, the DynamoDB limit
+
+    @constant
+    def DYNAMODB_WORKERS():
+        return 8  # threads writing batches
+
+    @constant
+    def DYNAMODB_MAX_WORKERS():
+        return 32  # connections of the shared client
+
+    @constant
+    def DYNAMODB_MAX_RETRIES():
+        return 8  # retries of unprocessed items
+
+    @constant
+    def DYNAMODB_BACKOFF():
+        return 0.05  # seconds, doubled each retry
+
+    @constant
+    def QUERY_CACHE_TTL():
+        return 24 * 3600  # seconds a DynamoDB query is answered from cache
 
     @constant
     def S3_PREFIXES():
@@ -32,6 +58,30 @@ class _const(object):
     def IMG_SUFFIXES():
         return (".jpg", ".png")
 
+    @constant
+    def VIDEO_SUFFIXES():
+        return (".mkv", ".mov", ".mp4")
+
+    @constant
+    def SHOT_SIGNATURE_BITS():
+        return 3  # bits per channel of frame color signature
+
+    @constant
+    def SHOT_SIGNATURE_SIDE():
+        return 64  # px per side of frame downsampled for color signature
+
+    @constant
+    def SEGMENT_FRAMES():
+        return 64  # most frames of a video segment analysed by a worker
+
+    @constant
+    def KEYFRAME_TOLERANCE():
+        return 0.001  # seconds, rounding of keyframe timestamps by ffprobe
+
+    @constant
+    def DRAFT_MODES():
+        return ("1", "L", "P", "RGB", "RGBA", "CMYK", "YCbCr")  # PIL modes decoded by PIL when downscaled
+
     @constant
     def TAR_SUFFIXES():
         return (".tar.bz2", ".tar.gz")
@@ -40,9 +90,37 @@ class _const(object):
     def ZIP_SUFFIXES():
         return (".zip", )
 
+    @constant
+    def GZIP_SUFFIXES():
+        return (".gz", )
+
     @constant
     def JSON_SUFFIXES():
-        return (".json", )
+        return (".json", ".ndjson")
+
+    @constant
+    def NDJSON_SUFFIXES():
+        return (".ndjson", )
+
+    @constant
+    def EXPORT_COMPRESSIONS():
+        return ("zip", "gzip")
+
+    @constant
+    def READ_CHUNK_SIZE():
+        return 1 << 16  # bytes read at a time from streams
+
+    @constant
+    def LOAD_READERS():
+        return 4  # files read in parallel by colordb load
+
+    @constant
+    def LOAD_QUEUE_SIZE():
+        return 1024  # records read ahead of DynamoDB writes
+
+    @constant
+    def LOAD_CHUNK_SIZE():
+        return 64  # records per queue item
 
     @constant
     def DEFAULT_COLORSPACE():
@@ -56,6 +134,62 @@ class _const(object):
     def HIST_BAR_HEIGHT():
         return 30  # px
 
+    @constant
+    def PIPELINE_DTYPES():
+        return ("float32", "float64", "uint8")
+
+    @constant
+    def PIPELINE_DTYPE():
+        return "float32"
+
+    @constant
+    def SAMPLE_METHODS():
+        return ("uniform", "tile", "reservoir")
+
+    @constant
+    def SAMPLE_TILES():
+        return (16, 16)  # (rows, cols)
+
+    @constant
+    def CHUNK_PIXELS():
+        return 1 << 18  # pixels per chunk for label assignment
+
+    @constant
+    def WARM_START_MAX_DRIFT():
+        return 0.1  # mean centroid shift in [0, 1] color units before a cold start
+
+    @constant
+    def HAC_QUANTIZE_BITS():
+        return 5  # bits per channel of the color cube "hac" is fitted on
+
+    @constant
+    def HAC_MAX_COLORS():
+        return 4096  # representative colors "hac" is fitted on, at most
+
+    @constant
+    def SILHOUETTE_PIXELS():
+        return 2000  # pixels sampled for silhouette score
+
+    @constant
+    def KMEANS_INIT_SIZE():
+        return 1 << 16  # points sampled for k-means++ seeding
+
+    @constant
+    def CACHE_MAX_BYTES():
+        return 256 << 20  # bytes of palette cache entries
+
+    @constant
+    def CACHE_EVICT_RATIO():
+        return 0.9  # fraction of CACHE_MAX_BYTES kept on eviction
+
+    @constant
+    def CACHE_SEED():
+        return 0  # clustering seed when caching without --seed
+
+    @constant
+    def RUN_CONTEXT_TTL():
+        return 60  # seconds before available memory is collected again
+
     @constant
     def FIGURE_SIZE():
         return (8.00, 4.50)  # (x100) px
@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
 import boto3
+import concurrent.futures
+import contextlib
+import functools
+import gzip
 import io
 import itertools
 import logging
+import queue
+import shutil
 import tarfile
+import tempfile
+import threading
 import urllib
 import zipfile
 
@@ -13,12 +21,112 @@ from pathlib import Path
 from random import random
 
 from colorkeys.constants import _const as CONSTANTS
+from colorkeys.codecjson import encode
 from colorkeys.codecjson import get_timestamp
+from colorkeys.codecjson import iter_decode
 from engcommon import testvar
 
 logger = logging.getLogger(__name__)
 
 
+class ArkWriter:
+    """A class for streaming JSON records into a compressed archive.
+
+    Records are written as newline-delimited JSON (NDJSON), one record per line,
+    as they are produced, so memory does not grow with the number of records.
+    A "gzip" archive is flushed on request, so the records written before a
+    crash can be read. A "zip" archive holds a single deflated NDJSON member,
+    which is only readable once the archive is closed.
+
+        Typical Usage:
+
+        with ArkWriter(dest_dir="/tmp") as my_ark:
+            for obj in objs:
+                my_ark.write(obj)
+
+    Attributes:
+        path (str): Path of archive file.
+        num_records (int): Number of records written.
+    """
+    def __init__(self, **kwargs):
+        """Init ArkWriter.
+
+        Kwargs:
+            dest_dir (str): Destination directory.
+            basename (str): Basename of archive file path.
+            compression (str): Archive format, one of
+                CONSTANTS().EXPORT_COMPRESSIONS. Default "gzip".
+
+        Raises:
+            ValueError: compression not valid.
+        """
+        dest_dir = kwargs.setdefault(
+            "dest_dir",
+            f"/tmp/colorkeys-json-{get_timestamp()}"
+        )
+        basename = kwargs.setdefault(
+            "basename",
+            blake2b(str(random()).encode('utf-8'), digest_size=4).hexdigest()
+        )
+        self._compression = kwargs.setdefault("compression", "gzip")
+        jsonfile = f"{basename}.colorkeys{CONSTANTS().NDJSON_SUFFIXES[0]}"
+        if self._compression == "zip":
+            self._path = f"{dest_dir}/{jsonfile}.zip"
+            self._zf = zipfile.ZipFile(
+                self._path,
+                mode = "w",
+                compression = zipfile.ZIP_DEFLATED,
+            )
+            self._f = self._zf.open(jsonfile, mode="w", force_zip64=True)
+        elif self._compression == "gzip":
+            self._path = f"{dest_dir}/{jsonfile}.gz"
+            self._zf = None
+            self._f = gzip.open(self._path, mode="wb")
+        else:
+            raise ValueError(f"Invalid compression, {self._compression}")
+        self._num_records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return None
+
+    @property
+    def path(self):
+        """Path of archive file."""
+        return self._path
+
+    @property
+    def num_records(self):
+        """Number of records written."""
+        return self._num_records
+
+    def write(self, obj):
+        """Write JSON record of object."""
+        self._f.write(f"{encode(obj)}\n".encode("utf-8"))
+        self._num_records += 1
+        return None
+
+    def flush(self):
+        """Flush records written to a gzip archive to disk.
+
+        A zip member cannot be flushed: its size and checksum are only written
+        when the archive is closed.
+        """
+        if self._compression == "gzip":
+            self._f.flush()
+        return None
+
+    def close(self):
+        """Close archive."""
+        self._f.close()
+        if self._zf:
+            self._zf.close()
+        return None
+
+
 def get_files(filepaths, suffixes):
     """Get file resource paths from CLI arguments.
 
@@ -60,6 +168,179 @@ def get_files(filepaths, suffixes):
     return sorted(files)
 
 
+def get_record_files(filepaths):
+    """Get JSON record file paths from CLI arguments, without extracting archives.
+
+    Handles globbing of files / directories as get_files(). Web URLs and S3
+    endpoints are passed through.
+
+    Args:
+        filepaths (list): Web URLs, S3 endpoints, wildcards, dirs, and/or lists
+            of JSON, NDJSON, zip, tar, or gzip files.
+
+    Returns:
+        files (list): Sorted and expanded file list.
+    """
+    suffixes = get_record_suffixes()
+    files = set()
+    for i in itertools.chain.from_iterable(filepaths):
+        if i.startswith(CONSTANTS().WEB_PREFIXES + CONSTANTS().S3_PREFIXES):
+            files.add(i)
+        else:
+            files.update(
+                f"{p.parent}/{p.name}" for p in unglob(i)
+                if p.name.endswith(suffixes)
+            )
+    logger.debug(files)
+    return sorted(files)
+
+
+def get_record_suffixes():
+    """Get suffixes of files of JSON records, plain or archived."""
+    return (
+        CONSTANTS().JSON_SUFFIXES
+        + CONSTANTS().ZIP_SUFFIXES
+        + CONSTANTS().TAR_SUFFIXES
+        + CONSTANTS().GZIP_SUFFIXES
+    )
+
+
+def stream_records(filenames, **kwargs):
+    """Stream JSON records of files, read in parallel.
+
+    Reader threads feed a bounded queue, so memory does not grow with the size
+    of the files. Records are queued in chunks, to keep queue overhead small.
+    Records of different files are interleaved.
+
+    Args:
+        filenames (list): Record files, as from get_record_files().
+
+    kwargs:
+        readers (int): Number of files read in parallel. Default
+            CONSTANTS().LOAD_READERS.
+        queue_size (int): Number of records read ahead. Default
+            CONSTANTS().LOAD_QUEUE_SIZE.
+
+    Yields:
+        record (dict): Record decoded, as by codecjson.decode().
+
+    Raises:
+        Exception: a read failure of any file.
+    """
+    readers = kwargs.setdefault("readers", CONSTANTS().LOAD_READERS)
+    queue_size = kwargs.setdefault("queue_size", CONSTANTS().LOAD_QUEUE_SIZE)
+    chunk_size = CONSTANTS().LOAD_CHUNK_SIZE
+    records = queue.Queue(maxsize=max(1, queue_size // chunk_size))
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has stopped, rather than block on a full queue.
+        while not stop.is_set():
+            try:
+                records.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read(filename):
+        try:
+            itr = iter_records(filename)
+            while chunk := list(itertools.islice(itr, chunk_size)):
+                if not put(("records", chunk)):
+                    return
+            put(("done", filename))
+        except Exception as e:
+            put(("error", e))
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers = readers,
+        thread_name_prefix = "reader",
+    ) as pool:
+        for filename in filenames:
+            pool.submit(read, filename)
+        try:
+            num_done = 0
+            while num_done < len(filenames):
+                kind, value = records.get()
+                if kind == "records":
+                    yield from value
+                elif kind == "done":
+                    num_done += 1
+                    logger.debug(f"Read {value}")
+                else:
+                    raise value
+        finally:
+            stop.set()
+
+
+def iter_records(filename):
+    """Iterate JSON records of a local, web, or S3 file, plain or archived.
+
+    Records are decoded as they are read from the file. Archive members are read
+    without extracting them to disk, except that a zip archive not on local disk
+    is first spooled to a temporary file, as zip members are indexed at its end.
+    A truncated gzip file (e.g. an export cut short by a crash) is read up to
+    its last complete record, with a warning.
+
+    Args:
+        filename (str): File name, includes HTTP(S) and S3 endpoints.
+
+    Yields:
+        record (dict): Record decoded, as by codecjson.decode().
+    """
+    with contextlib.closing(open_stream(filename)) as f:
+        if filename.endswith(CONSTANTS().ZIP_SUFFIXES):
+            if not (hasattr(f, "seekable") and f.seekable()):
+                spool = tempfile.TemporaryFile()
+                shutil.copyfileobj(f, spool)
+                spool.seek(0)
+                f = spool
+            with zipfile.ZipFile(f) as zf:
+                for info in zf.infolist():
+                    if info.filename.endswith(CONSTANTS().JSON_SUFFIXES):
+                        with zf.open(info) as member:
+                            yield from iter_decode(member)
+        elif filename.endswith(CONSTANTS().TAR_SUFFIXES):
+            with tarfile.open(fileobj=f, mode="r|*") as tf:
+                for info in tf:
+                    if info.isfile() and info.name.endswith(CONSTANTS().JSON_SUFFIXES):
+                        yield from iter_decode(tf.extractfile(info))
+        elif filename.endswith(CONSTANTS().GZIP_SUFFIXES):
+            with gzip.GzipFile(fileobj=f) as gf:
+                try:
+                    yield from iter_decode(gf)
+                except EOFError:
+                    logger.warning(f"Truncated file, records read up to its end: {filename}")
+        else:
+            yield from iter_decode(f)
+
+
+def open_stream(filename):
+    """Open binary stream of a local, web, or S3 file.
+
+    Args:
+        filename (str): File name, includes HTTP(S) and S3 endpoints.
+
+    Returns:
+        f (file object): Binary stream, read by f.read(size).
+    """
+    if filename.startswith(CONSTANTS().WEB_PREFIXES):
+        f = urllib.request.urlopen(filename)
+    elif filename.startswith(CONSTANTS().S3_PREFIXES):
+        my_bucket, my_key = filename.split("://", 1)[1].split("/", 1)
+        f = get_s3_client().get_object(Bucket=my_bucket, Key=my_key)["Body"]
+    else:
+        f = open(filename, "rb")
+    return f
+
+
+@functools.lru_cache(maxsize=None)
+def get_s3_client():
+    """Get S3 client, shared by all calls and threads."""
+    return boto3.client("s3")
+
+
 def unark(filename, suffixes, **kwargs):
     """Extract archive and return paths of included target files.
 
@@ -116,37 +397,6 @@ def unark(filename, suffixes, **kwargs):
     return extracted_paths
 
 
-def ark(obj_json, **kwargs):
-    """Compress to archive and return file path.
-
-    Args:
-        obj_json (str): JSON-encoded object.
-
-    Kwargs:
-        dest_dir (str): Destination directory.
-        basename (str): Basename of archive file path.
-
-    Returns:
-        archive_path (str): Path of archive file.
-    """
-    dest_dir = kwargs.setdefault(
-        "dest_dir",
-        f"/tmp/colorkeys-json-{get_timestamp()}"
-    )
-    basename = kwargs.setdefault(
-        "basename",
-        blake2b(str(random()).encode('utf-8'), digest_size=4).hexdigest()
-    )
-    jsonfile = f"{basename}.colorkeys.json"
-    jsonzip = f"{dest_dir}/{jsonfile}.zip"
-    ramfile = io.BytesIO()
-    with zipfile.ZipFile(ramfile, mode='w') as zf:
-        zf.writestr(jsonfile, obj_json)
-    with open(jsonzip, "wb") as f:
-        f.write(ramfile.getvalue())
-    return jsonzip
-
-
 def unglob(filepath):
     """Unglobs files and directories to an iterator containing filenames.
 
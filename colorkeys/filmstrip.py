@@ -1,11 +1,48 @@
 #!/usr/bin/env python3
 
+"""
+This module samples frames of films for palette analysis.
+
+Frames are sampled every spf (seconds per frame) seconds between start and end
+timecodes. A single ffmpeg process decodes the video once, selects the sampled
+frames by fps filter, and pipes them as raw RGB to NumPy arrays, which are
+analysed directly. For throughput on many cores, the range is split into
+segments decoded and analysed by worker processes (run_segments()).
+
+For a quick preview of a whole film, keyframes only are decoded, optionally
+thinned to at least spf seconds apart, at their actual positions.
+
+Frames are analysed in sequence, so the fit of each frame can be warm-started
+from the centroids of the previous frame, and frames of the same shot can reuse
+the palettes of its first frame.
+
+    Typical Usage:
+
+    for pos, palettes, objs in analyse_frames(
+        "my_film.mp4", "00:10:00", "00:20:00", 10,
+        algos=["kmeans"], colorspaces=["RGB"], num_clusters=5,
+        epoch_seconds=epoch_seconds,
+    ):
+        ...
+
+    for pos, objs in run_segments(
+        "my_film.mp4", "00:10:00", "00:20:00", 10, 8, analysis_kwargs
+    ):
+        ...
+"""
+
+import collections
+import concurrent.futures
 import datetime
 import ffmpeg
 import logging
 import numpy as np
 import os
+import skimage.io as skiio
 
+from colorkeys import batch
+from colorkeys.artwork import Artwork
+from colorkeys.constants import _const as CONSTANTS
 from engcommon import command
 
 logger = logging.getLogger(__name__)
@@ -18,11 +55,258 @@ def check_ffmpeg():
     return None
 
 
+def analyse_frames(video_file, start, end, spf, **kwargs):
+    """Analyse palettes of frames sampled from video file.
+
+    Args:
+        video_file (str): Input video file name.
+        start (str): Timecode to start the sampling in HH:MM:SS.
+        end (str): Timecode to end the sampling in HH:MM:SS, None for the end of
+            the video.
+        spf (int): Seconds per frame; seconds between each frame sampled, or
+            least seconds between keyframes sampled.
+
+    kwargs:
+        keyframes (bool): Sample keyframes only (see iter_keyframes()).
+            Default False.
+        Remaining kwargs are arguments of analyse_sequence(), by name.
+
+    Yields:
+        pos (float): Position of frame in seconds.
+        palettes (list): Palettes (colorkeys.ColorKey) of frame.
+        objs (list): Palettes compiled for JSON encoding.
+    """
+    if kwargs.pop("keyframes", False):
+        frames = iter_keyframes(video_file, start, end, spf)
+    else:
+        frames = iter_frames(video_file, start, end, spf)
+    yield from analyse_sequence(video_file, frames, **kwargs)
+
+
+def analyse_sequence(video_file, frames, **kwargs):
+    """Analyse palettes of a sequence of frames of video file.
+
+    Consecutive frames have similar palettes, so with warm start, the fit of
+    each palette is initialised from the centroids of the same palette of the
+    previous frame (see colorkeys.centroids.Clust).
+
+    With a shot threshold, frames are gated by a tiny color histogram
+    (get_signature()): a frame within the threshold of the last analysed frame
+    is of the same shot, and reuses its palettes (see colorkeys.batch.reuse()).
+    Only frames of a shot change are clustered.
+
+    Args:
+        video_file (str): Input video file name.
+        frames (iterator): Position (float) and RGB image matrix
+            (numpy.ndarray) of each frame.
+
+    kwargs:
+        warm_start (bool): Warm-start fits from the previous frame. Default
+            False.
+        shot_threshold (float): Histogram distance (see get_distance()) within
+            which a frame reuses the palettes of the last analysed frame.
+            Default None analyses every frame.
+        Remaining kwargs are arguments of colorkeys.batch.analyse(), by name.
+
+    Yields:
+        pos (float): Position of frame in seconds.
+        palettes (list): Palettes (colorkeys.ColorKey) of frame.
+        objs (list): Palettes compiled for JSON encoding.
+    """
+    warm_start = kwargs.pop("warm_start", False)
+    shot_threshold = kwargs.pop("shot_threshold", None)
+    filmtitle = os.path.splitext(os.path.basename(video_file))[0]
+    init_centroids = {}
+    shot_signature = None
+    shot_palettes = None
+    for pos, frame in frames:
+        label = get_frame_label(filmtitle, pos)
+        artwork = Artwork(label, img=frame, max_side=kwargs.get("max_side"))
+        if shot_threshold is not None:
+            signature = get_signature(frame)
+            if (
+                shot_signature is not None
+                and get_distance(signature, shot_signature) <= shot_threshold
+            ):
+                palettes, objs = batch.reuse(
+                    label,
+                    shot_palettes,
+                    kwargs["epoch_seconds"],
+                    artwork = artwork,
+                    context = kwargs.get("context"),
+                )
+                yield pos, palettes, objs
+                continue
+            shot_signature = signature
+        palettes, objs = batch.analyse(
+            label,
+            artwork = artwork,
+            init_centroids = init_centroids,
+            **kwargs,
+        )
+        shot_palettes = palettes
+        if warm_start:
+            init_centroids = get_centroids(palettes)
+        yield pos, palettes, objs
+
+
+def run_segments(video_file, start, end, spf, jobs, analysis_kwargs, **kwargs):
+    """Analyse palettes of frames sampled from video file, in worker processes.
+
+    The sampled range is split into segments of at most CONSTANTS().SEGMENT_FRAMES
+    frames, at least one per worker, on the spf grid of the whole range (or
+    between sampled keyframes), so the same frames are sampled as by
+    analyse_frames(). Each worker decodes its segment by its own ffmpeg process
+    and analyses its frames as they are decoded. Warm starts and shot reuse do
+    not cross segments.
+
+    Results are yielded in order of position, a segment at a time, and at most
+    two segments per worker are in flight, so memory does not grow with the
+    length of the video. A failed segment is logged, and its frames yielded
+    without palettes. If a worker process dies, the pool is restarted, and the
+    next segment is run alone first, so only the segment whose worker dies is
+    failed.
+
+    Args:
+        video_file (str): Input video file name.
+        start (str): Timecode to start the sampling in HH:MM:SS.
+        end (str): Timecode to end the sampling in HH:MM:SS, None for the end of
+            the video.
+        spf (int): Seconds per frame; seconds between each frame sampled, or
+            least seconds between keyframes sampled.
+        jobs (int): Number of worker processes.
+        analysis_kwargs (dict): Arguments of colorkeys.batch.analyse(), by name.
+
+    kwargs:
+        keyframes (bool): Sample keyframes only (see iter_keyframes()).
+            Default False.
+        warm_start (bool): Warm-start fits from the previous frame of the
+            segment (see analyse_sequence()). Default False.
+        shot_threshold (float): Histogram distance within which a frame reuses
+            the palettes of the last analysed frame of the segment (see
+            analyse_sequence()). Default None.
+
+    Yields:
+        pos (float): Position of frame in seconds.
+        objs (list): Palettes compiled for JSON encoding, empty if failed.
+    """
+    keyframes = kwargs.setdefault("keyframes", False)
+    warm_start = kwargs.setdefault("warm_start", False)
+    shot_threshold = kwargs.setdefault("shot_threshold", None)
+    secs_start, secs_end = get_range(video_file, start, end)
+    if keyframes:
+        video_keyframes = get_keyframes(video_file, secs_start, secs_end)
+        num_frames = len(thin_keyframes(video_keyframes, spf))
+        segments = collections.deque(
+            (iter_keyframe_segment, (segment_keyframes, positions), positions)
+            for segment_keyframes, positions in get_keyframe_segments(
+                video_keyframes,
+                spf,
+                get_num_segments(num_frames, jobs),
+            )
+        )
+    else:
+        num_frames = len(get_seek_positions(secs_start, secs_end, spf))
+        segments = collections.deque(
+            (iter_segment, (seg_start, seg_end, spf), get_seek_positions(seg_start, seg_end, spf))
+            for seg_start, seg_end in get_segments(
+                secs_start,
+                secs_end,
+                spf,
+                get_num_segments(num_frames, jobs),
+            )
+        )
+    segment_kwargs = {
+        **analysis_kwargs,
+        "warm_start": warm_start,
+        "shot_threshold": shot_threshold,
+    }
+
+    def get_pool(max_workers):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers = max_workers,
+            initializer = batch.init_worker,
+            initargs = (jobs,),
+        )
+
+    def submit(pool, segment):
+        iter_func, iter_args, _ = segment
+        try:
+            future = pool.submit(analyse_segment, video_file, iter_func, iter_args, segment_kwargs)
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # Broken before its result is read, handled as by that of a future.
+            future = concurrent.futures.Future()
+            future.set_exception(e)
+        return future
+
+    pool = get_pool(jobs)
+    in_flight = collections.deque()
+    try:
+        while segments or in_flight:
+            while segments and len(in_flight) < 2 * jobs:
+                segment = segments.popleft()
+                in_flight.append((submit(pool, segment), segment))
+            future, segment = in_flight.popleft()
+            positions = segment[2]
+            results = None
+            try:
+                results = future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                # Any segment in flight may have killed the worker, so the first
+                # is run alone, then the rest are submitted to a new pool.
+                logger.warning(f"Worker pool broken, {len(in_flight) + 1} segment(s) pending")
+                pool.shutdown()
+                try:
+                    with get_pool(1) as alone:
+                        results = submit(alone, segment).result()
+                except concurrent.futures.process.BrokenProcessPool:
+                    logger.error(f"Analysis failed, worker process died: {video_file} at {positions[0]:.2f}s")
+                except Exception:
+                    logger.exception(f"Analysis failed: {video_file} at {positions[0]:.2f}s")
+                pool = get_pool(jobs)
+                in_flight = collections.deque((submit(pool, i), i) for _, i in in_flight)
+            except Exception:
+                logger.exception(f"Analysis failed: {video_file} at {positions[0]:.2f}s")
+            if results is None:
+                results = [(pos, []) for pos in positions]
+            yield from results
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def get_num_segments(num_frames, jobs):
+    """Get number of video segments of at most CONSTANTS().SEGMENT_FRAMES frames, at least jobs."""
+    return max(jobs, -(-num_frames // CONSTANTS().SEGMENT_FRAMES))
+
+
+def analyse_segment(video_file, iter_func, iter_args, analysis_kwargs):
+    """Analyse palettes of frames of a segment of video file, in a worker process.
+
+    Only the compiled palettes are returned, to keep image data out of the
+    result sent back to the parent process.
+
+    Args:
+        video_file (str): Input video file name.
+        iter_func (function): Iterator of frames of segment, iter_segment() or
+            iter_keyframe_segment().
+        iter_args (tuple): Arguments of iter_func after video_file.
+        analysis_kwargs (dict): Arguments of analyse_sequence(), by name.
+
+    Returns:
+        results (list): Position (float) and palettes compiled for JSON
+            encoding (list) of each frame.
+    """
+    frames = iter_func(video_file, *iter_args)
+    return [
+        (pos, objs)
+        for pos, _, objs in analyse_sequence(video_file, frames, **analysis_kwargs)
+    ]
+
+
 def extract_frames(video_file, start, end, out_dir, spf=1):
     """Extract frames from video file to output directory.
 
-    Extract frames using start and end timecodes. Uses ffmpeg to extract
-    frames to PNG format.
+    Extract frames using start and end timecodes, to PNG format.
 
     Args:
         video_file (str): Input video file name.
@@ -34,38 +318,381 @@ def extract_frames(video_file, start, end, out_dir, spf=1):
     Returns:
         None
     """
-    check_ffmpeg()
-    # Get seek positions based on start/end and seconds per frame
     dt = datetime.datetime.now()
     timestamp = (
         f"{dt.year}.{dt.month:02d}.{dt.day:02d}-"
         f"{dt.hour:02d}{dt.minute:02d}{dt.second:02d}"
     )
-    secs_start = get_seconds(start)
-    secs_end = get_seconds(end)
-    secs_duration = secs_end - secs_start
-    num_frames = secs_duration // spf
-    seek_positions = np.around(
-        np.linspace(secs_start, secs_end, num_frames, endpoint=False),
-        decimals = 3
-    ).tolist()
 
     # Extract frames to directory
     filmtitle = os.path.splitext(os.path.basename(video_file))[0]
     extract_dir = f"{out_dir}/{filmtitle}/{timestamp}"
     os.makedirs(extract_dir)
     logger.debug(f"Extracting {video_file} to {extract_dir}")
-    for pos in seek_positions:
-        _, _ = (
-            ffmpeg
-            .input(video_file, ss=pos)
-            .output(f"{extract_dir}/{filmtitle}-{pos:.2f}.png", vframes=1)
-            .run(quiet=True)
-        )
+    for pos, frame in iter_frames(video_file, start, end, spf):
+        label = get_frame_label(filmtitle, pos)
+        skiio.imsave(f"{extract_dir}/{label}.png", frame, check_contrast=False)
     logger.debug(f"Extracted {video_file} to {extract_dir}")
     return None
 
 
+def iter_frames(video_file, start, end, spf):
+    """Iterate frames sampled from video file, decoded by one ffmpeg process.
+
+    Args:
+        video_file (str): Input video file name.
+        start (str): Timecode to start the sampling in HH:MM:SS.
+        end (str): Timecode to end the sampling in HH:MM:SS, None for the end of
+            the video.
+        spf (int): Seconds per frame; seconds between each frame sampled.
+
+    Yields:
+        pos (float): Position of frame in seconds.
+        frame (numpy.ndarray): RGB image matrix of frame (uint8).
+    """
+    secs_start, secs_end = get_range(video_file, start, end)
+    yield from iter_segment(video_file, secs_start, secs_end, spf)
+
+
+def iter_segment(video_file, secs_start, secs_end, spf):
+    """Iterate frames sampled from a segment of video file.
+
+    The segment is decoded once from its start (seeking to the keyframe before
+    it). The fps filter selects the first frame at or after each sample
+    position, as an accurate seek to it would, which is piped as raw RGB.
+
+    Args:
+        video_file (str): Input video file name.
+        secs_start (float): Start of segment in seconds.
+        secs_end (float): End of segment in seconds.
+        spf (int): Seconds per frame; seconds between each frame sampled.
+
+    Yields:
+        pos (float): Position of frame in seconds.
+        frame (numpy.ndarray): RGB image matrix of frame (uint8).
+    """
+    check_ffmpeg()
+    seek_positions = get_seek_positions(secs_start, secs_end, spf)
+    if not seek_positions:
+        return
+    width, height = get_dimensions(video_file)
+    process = (
+        ffmpeg
+        .input(video_file, ss=secs_start, t=secs_end - secs_start)
+        .filter("fps", fps=f"1/{spf}", round="up")
+        .output(
+            "pipe:",
+            format = "rawvideo",
+            pix_fmt = "rgb24",
+            vframes = len(seek_positions),
+        )
+        .global_args("-loglevel", "error", "-nostdin")
+        .run_async(pipe_stdout=True)
+    )
+    try:
+        for pos in seek_positions:
+            frame = read_frame(process.stdout, height, width)
+            if frame is None:
+                logger.warning(f"{video_file}: no frame at {pos:.2f}s")
+                break
+            yield pos, frame
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def iter_keyframes(video_file, start, end, spf=None):
+    """Iterate keyframes of video file, decoding keyframes only.
+
+    Decoding only keyframes (skip_frame nokey) skips the frames between them,
+    most of the cost of decoding, so a palette preview of a whole film is much
+    faster than sampling every spf seconds. Keyframes are not evenly spaced:
+    their actual positions are yielded, from ffprobe.
+
+    Args:
+        video_file (str): Input video file name.
+        start (str): Timecode to start the sampling in HH:MM:SS.
+        end (str): Timecode to end the sampling in HH:MM:SS, None for the end of
+            the video.
+        spf (int): Least seconds between keyframes sampled, thinning keyframes
+            closer together. None for every keyframe.
+
+    Yields:
+        pos (float): Position of keyframe in seconds.
+        frame (numpy.ndarray): RGB image matrix of keyframe (uint8).
+    """
+    secs_start, secs_end = get_range(video_file, start, end)
+    keyframes = get_keyframes(video_file, secs_start, secs_end)
+    positions = thin_keyframes(keyframes, spf)
+    yield from iter_keyframe_segment(video_file, keyframes, positions)
+
+
+def iter_keyframe_segment(video_file, keyframes, positions):
+    """Iterate sampled keyframes of a segment of video file.
+
+    Every keyframe of the segment is decoded (in order of keyframes), and those
+    not sampled are skipped.
+
+    Args:
+        video_file (str): Input video file name.
+        keyframes (list): Positions of consecutive keyframes of segment, in
+            seconds.
+        positions (list): Positions of keyframes sampled, in keyframes.
+
+    Yields:
+        pos (float): Position of keyframe in seconds.
+        frame (numpy.ndarray): RGB image matrix of keyframe (uint8).
+    """
+    check_ffmpeg()
+    if not positions:
+        return
+    sampled = set(positions)
+    keyframes = keyframes[:keyframes.index(positions[-1]) + 1]
+    width, height = get_dimensions(video_file)
+    scratch = np.empty((height, width, 3), dtype=np.uint8)
+    process = (
+        ffmpeg
+        .input(
+            video_file,
+            # Before the first keyframe, for timestamps rounded by ffprobe.
+            ss = max(0, keyframes[0] - CONSTANTS().KEYFRAME_TOLERANCE),
+            skip_frame = "nokey",
+        )
+        .output(
+            "pipe:",
+            format = "rawvideo",
+            pix_fmt = "rgb24",
+            vsync = "passthrough",
+            vframes = len(keyframes),
+        )
+        .global_args("-loglevel", "error", "-nostdin")
+        .run_async(pipe_stdout=True)
+    )
+    try:
+        for pos in keyframes:
+            if pos in sampled:
+                frame = read_frame(process.stdout, height, width)
+            else:
+                frame = read_frame(process.stdout, height, width, out=scratch)
+            if frame is None:
+                logger.warning(f"{video_file}: no keyframe at {pos:.3f}s")
+                break
+            if pos in sampled:
+                yield pos, frame
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def read_frame(stream, height, width, out=None):
+    """Read raw RGB frame from stream.
+
+    Args:
+        stream (file object): Stream of raw RGB frames.
+        height (int): Height of frame.
+        width (int): Width of frame.
+        out (numpy.ndarray): Matrix to read frame into, shape (height, width, 3)
+            (uint8). Default a new matrix.
+
+    Returns:
+        frame (numpy.ndarray): RGB image matrix of frame (uint8), None at end of
+            stream.
+    """
+    frame = np.empty((height, width, 3), dtype=np.uint8) if out is None else out
+    buf = memoryview(frame).cast("B")
+    num_read = 0
+    while num_read < len(buf):
+        n = stream.readinto(buf[num_read:])
+        if not n:
+            return None
+        num_read += n
+    return frame
+
+
+def get_seek_positions(secs_start, secs_end, spf):
+    """Get positions of frames sampled every spf seconds, in seconds."""
+    secs_duration = secs_end - secs_start
+    num_frames = int(secs_duration // spf)
+    seek_positions = np.around(
+        secs_start + spf * np.arange(num_frames),
+        decimals = 3
+    ).tolist()
+    return seek_positions
+
+
+def get_range(video_file, start, end):
+    """Get start and end of sampling in seconds, end of video if end is None."""
+    secs_start = get_seconds(start)
+    secs_end = get_seconds(end) if end else int(get_duration(video_file))
+    return secs_start, secs_end
+
+
+def get_segments(secs_start, secs_end, spf, num_segments):
+    """Split sampling range into segments on its spf grid.
+
+    Segments hold (nearly) equal numbers of sample positions, and each starts
+    at its first position, so segments sample the same frames as the range.
+
+    Args:
+        secs_start (int): Start of sampling in seconds.
+        secs_end (int): End of sampling in seconds.
+        spf (int): Seconds per frame; seconds between each frame sampled.
+        num_segments (int): Number of segments, fewer if fewer positions.
+
+    Returns:
+        segments (list): Start and end (in seconds) of each segment.
+    """
+    num_frames = len(get_seek_positions(secs_start, secs_end, spf))
+    num_segments = max(1, min(num_segments, num_frames))
+    bounds = np.linspace(0, num_frames, num_segments + 1).astype(int)
+    segments = [
+        (secs_start + i * spf, min(secs_start + j * spf, secs_end))
+        for i, j in zip(bounds[:-1], bounds[1:])
+        if j > i
+    ]
+    return segments
+
+
+def get_keyframes(video_file, secs_start, secs_end):
+    """Get positions of keyframes of video file, from ffprobe.
+
+    Args:
+        video_file (str): Input video file name.
+        secs_start (float): Start of range in seconds.
+        secs_end (float): End of range in seconds.
+
+    Returns:
+        keyframes (list): Positions of keyframes in [secs_start, secs_end), in
+            seconds.
+    """
+    check_ffmpeg()
+    p = ffmpeg.probe(
+        video_file,
+        select_streams = "v:0",
+        skip_frame = "nokey",
+        show_entries = "frame=pts_time,best_effort_timestamp_time",
+        read_intervals = f"{secs_start}%+{secs_end - secs_start}",
+    )
+    keyframes = []
+    for frame in p.get("frames", []):
+        pts_time = frame.get("pts_time", frame.get("best_effort_timestamp_time"))
+        if pts_time is None:
+            continue
+        pos = float(pts_time)
+        if secs_start <= pos < secs_end:
+            keyframes.append(pos)
+    return keyframes
+
+
+def thin_keyframes(keyframes, spf=None):
+    """Thin keyframes to at least spf seconds apart.
+
+    Args:
+        keyframes (list): Positions of keyframes in seconds, ascending.
+        spf (int): Least seconds between keyframes kept. None to keep all.
+
+    Returns:
+        positions (list): Positions of keyframes kept.
+    """
+    if not spf:
+        return list(keyframes)
+    positions = []
+    for pos in keyframes:
+        if not positions or pos - positions[-1] >= spf:
+            positions.append(pos)
+    return positions
+
+
+def get_keyframe_segments(keyframes, spf, num_segments):
+    """Split keyframes, thinned to spf, into segments of sampled keyframes.
+
+    Args:
+        keyframes (list): Positions of keyframes in seconds, ascending.
+        spf (int): Least seconds between keyframes sampled. None for every
+            keyframe.
+        num_segments (int): Number of segments, fewer if fewer keyframes
+            sampled.
+
+    Returns:
+        segments (list): Keyframes (list) from the first to the last sampled
+            keyframe of each segment, and its sampled keyframes (list).
+    """
+    positions = thin_keyframes(keyframes, spf)
+    num_segments = max(1, min(num_segments, len(positions)))
+    index = {pos: i for i, pos in enumerate(keyframes)}
+    segments = []
+    for chunk in np.array_split(np.arange(len(positions)), num_segments):
+        if not len(chunk):
+            continue
+        sampled = positions[chunk[0]:chunk[-1] + 1]
+        segments.append((
+            keyframes[index[sampled[0]]:index[sampled[-1]] + 1],
+            sampled,
+        ))
+    return segments
+
+
+def get_centroids(palettes):
+    """Get fitted centroids of palettes, keyed by (algo, colorspace, num_clusters).
+
+    Palettes without centroids (e.g. cached) are left out.
+    """
+    centroids = {}
+    for palette in palettes:
+        hist = palette.hist
+        if getattr(hist, "centroids", None) is not None:
+            centroids[(hist.algo, hist.colorspace, hist.num_clusters)] = hist.centroids
+    return centroids
+
+
+def get_signature(frame):
+    """Get color signature of frame, to compare frames for shot changes.
+
+    The signature is a normalized histogram of colors binned into a coarse
+    color cube (CONSTANTS().SHOT_SIGNATURE_BITS per channel), of the frame
+    downsampled by stride to about CONSTANTS().SHOT_SIGNATURE_SIDE pixels per
+    side. It costs a small fraction of a palette fit.
+
+    Args:
+        frame (numpy.ndarray): RGB image matrix of frame (uint8).
+
+    Returns:
+        signature (numpy.ndarray): Share of pixels of each color bin.
+    """
+    bits = CONSTANTS().SHOT_SIGNATURE_BITS
+    step = max(1, max(frame.shape[:2]) // CONSTANTS().SHOT_SIGNATURE_SIDE)
+    levels = frame[::step, ::step, :3].reshape(-1, 3) >> (8 - bits)
+    idx = (
+        (levels[:, 0].astype(np.int64) << (2 * bits))
+        | (levels[:, 1].astype(np.int64) << bits)
+        | levels[:, 2]
+    )
+    counts = np.bincount(idx, minlength=1 << (3 * bits))
+    return counts / counts.sum()
+
+
+def get_distance(signature, other):
+    """Get distance of color signatures, the share of pixels of different color.
+
+    Args:
+        signature (numpy.ndarray): Color signature, from get_signature().
+        other (numpy.ndarray): Color signature, from get_signature().
+
+    Returns:
+        distance (float): Total variation distance, in [0, 1].
+    """
+    return float(np.abs(signature - other).sum() / 2)
+
+
+def get_frame_label(filmtitle, pos):
+    """Get label of frame, named as extracted frame files."""
+    return f"{filmtitle}-{pos:.2f}"
+
+
 def get_seconds(timecode):
     """Convert timecode to seconds.
 
@@ -84,12 +711,31 @@ def get_seconds(timecode):
     return secs
 
 
-def get_framerate(filename):
-    """Get framerate from file information."""
+def get_video_stream(filename):
+    """Get video stream information from file information."""
     check_ffmpeg()
     p = ffmpeg.probe(filename)
     v = next(
         (stream for stream in p['streams'] if stream['codec_type'] == 'video'),
         None
     )
+    return v
+
+
+def get_framerate(filename):
+    """Get framerate from file information."""
+    v = get_video_stream(filename)
     return eval(v["r_frame_rate"])
+
+
+def get_dimensions(filename):
+    """Get width and height of video from file information."""
+    v = get_video_stream(filename)
+    return int(v["width"]), int(v["height"])
+
+
+def get_duration(filename):
+    """Get duration of video in seconds from file information."""
+    check_ffmpeg()
+    p = ffmpeg.probe(filename)
+    return float(p["format"]["duration"])
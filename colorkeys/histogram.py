@@ -33,7 +33,7 @@ class Hist(Clust):
         hist_bar (numpy.ndarray): Normalized histogram bar scaled to image width.
         hist_bar_height (int): Histogram bar height.
     """
-    def __init__(self, img, algo, num_clusters, colorspace, rescaled_width):
+    def __init__(self, img, algo, num_clusters, colorspace, rescaled_width, **kwargs):
         """Init Hist.
 
         Args:
@@ -42,11 +42,21 @@ class Hist(Clust):
             num_clusters (int): Requested Number of clusters/centroids.
             colorspace (str): Requested color space of histogram.
             rescaled_width (int): Width of image (defines width for histogram bar).
+
+        kwargs:
+            is_preprocessed (bool): Image array is already in the pipeline dtype and
+                the histogram color space (e.g. shared by colorkeys.planner.Planner).
+            dtype (str): Pipeline dtype of image array, one of
+                CONSTANTS().PIPELINE_DTYPES. Default CONSTANTS().PIPELINE_DTYPE.
+            Remaining kwargs are passed to colorkeys.centroids.Clust.
         """
+        is_preprocessed = kwargs.pop("is_preprocessed", False)
+        self._dtype = kwargs.pop("dtype", CONSTANTS().PIPELINE_DTYPE)
         self._algo = self._get_algo(algo)
         self._colorspace = self._get_colorspace(colorspace)
-        img = self._preprocess(img)
-        super().__init__(img, algo, num_clusters)
+        if not is_preprocessed:
+            img = self._preprocess(img)
+        super().__init__(img, algo, num_clusters, **kwargs)
 
         self._hist_bar_height = CONSTANTS().HIST_BAR_HEIGHT
         self._hist = self._get_hist()
@@ -89,7 +99,7 @@ class Hist(Clust):
 
     def _get_algo(self, algo):
         """Get algorithm."""
-        if algo not in ("kmeans", "mbkmeans", "hac"):
+        if algo not in ("kmeans", "mbkmeans", "npkmeans", "hac"):
             raise ValueError(f"Invalid algorithm, {algo}")
         return algo
 
@@ -102,7 +112,8 @@ class Hist(Clust):
     def _preprocess(self, img):
         """Prepare image array for processing.
 
-        Convert to float for better precision, convert to the color space of histogram.
+        Convert to the pipeline dtype (float32 by default, for precision at half
+        the memory of float64), convert to the color space of histogram.
 
         Args:
             img (np.ndarray): Image array.
@@ -113,21 +124,17 @@ class Hist(Clust):
         Raises:
             ValueError: colorspace not valid.
         """
-        img = skiutil.img_as_float(img)
-        if self._colorspace == "HSV":
-            img = skicolor.rgb2hsv(img)
-        elif self._colorspace == "RGB":
-            pass  # default
-        else:
-            raise ValueError(f"Invalid colorspace, {self._colorspace}")
+        img = convert_dtype(img, self._dtype)
+        img = convert_colorspace(img, self._colorspace)
         return img
 
     def _get_hist(self):
         """Get histogram from generated cluster.
 
-        The sklearn.cluster is an array of labels. The clustering algorithm assigns
-        a cluster label to each point. A histogram is generated by separating
-        these labels into bins. The resulting histogram is then normalised to 1.
+        The clustering algorithm assigns a cluster label to each point. A
+        histogram is generated by counting these labels into one bin per cluster,
+        weighted by the pixel count of each label if the cluster was fitted on
+        quantized colors. The resulting histogram is then normalised to 1.
 
         Args:
             None
@@ -135,9 +142,12 @@ class Hist(Clust):
         Returns:
             hist (numpy.ndarray): Normalized histogram.
         """
-        num_labels = np.arange(0, len(np.unique(self.clust.labels_)) + 1)
-        (hist, _) = np.histogram(self.clust.labels_, bins=num_labels)
-        hist = skiutil.img_as_float(hist)
+        hist = np.bincount(
+            self.labels,
+            weights = self.label_weights,
+            minlength = self.num_clusters,
+        )
+        hist = hist.astype(np.float64)
         hist /= hist.sum()
         return hist
 
@@ -160,6 +170,8 @@ class Hist(Clust):
             cents = self.centroids
         else:
             raise ValueError(f"Invalid colorspace, {self._colorspace}")
+        # Means of float32 pixels at 0 or 1 can round just outside [0, 1].
+        cents = np.clip(cents, 0, 1)
 
         # Sort centroids descending by percentage.
         listcomp = [
@@ -172,6 +184,68 @@ class Hist(Clust):
         return hist_cents
 
 
+def convert_dtype(img, dtype):
+    """Convert image array to pipeline dtype.
+
+    Float dtypes scale to [0, 1] per channel, uint8 to [0, 255].
+
+    Args:
+        img (np.ndarray): Image array.
+        dtype (str): Pipeline dtype, one of CONSTANTS().PIPELINE_DTYPES.
+
+    Returns:
+        img (np.ndarray): Image array in pipeline dtype.
+
+    Raises:
+        ValueError: dtype not valid.
+    """
+    if dtype == "float32":
+        img = skiutil.img_as_float32(img)
+    elif dtype == "float64":
+        img = skiutil.img_as_float64(img)
+    elif dtype == "uint8":
+        img = skiutil.img_as_ubyte(img)
+    else:
+        raise ValueError(f"Invalid dtype, {dtype}")
+    return img
+
+
+def convert_colorspace(img, colorspace):
+    """Convert RGB image array to the color space of histogram.
+
+    The image array keeps its dtype. HSV is converted in bands of rows into a
+    preallocated array, which bounds the temporaries of skimage.color.rgb2hsv.
+
+    Args:
+        img (np.ndarray): Image array in RGB.
+        colorspace (str): Requested color space of histogram.
+
+    Returns:
+        img (np.ndarray): Image array in requested color space.
+
+    Raises:
+        ValueError: colorspace not valid.
+    """
+    if colorspace == "HSV":
+        img_hsv = np.empty_like(img)
+        rows = max(1, CONSTANTS().CHUNK_PIXELS // img.shape[1])
+        for i in range(0, img.shape[0], rows):
+            band = img[i:i + rows]
+            if img.dtype == np.uint8:
+                band = skiutil.img_as_ubyte(
+                    skicolor.rgb2hsv(skiutil.img_as_float32(band))
+                )
+            else:
+                band = skicolor.rgb2hsv(band)
+            img_hsv[i:i + rows] = band
+        img = img_hsv
+    elif colorspace == "RGB":
+        pass  # default
+    else:
+        raise ValueError(f"Invalid colorspace, {colorspace}")
+    return img
+
+
 def get_hist_bar(hist_centroids, height, width):
     """Get histogram bar from histogram.
 
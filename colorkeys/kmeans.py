@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+"""
+This module is a vectorized NumPy k-means engine for low-dimensional color data.
+
+Colors have three dimensions and palettes a small number of clusters, for which
+the generic sklearn estimators carry avoidable overhead. This engine works in
+float32 and uses Hamerly's triangle-inequality bounds to skip the distance
+computation of points whose assigned centroid cannot have changed. Remaining
+distances are computed in batches.
+
+https://en.wikipedia.org/wiki/K-means_clustering
+G. Hamerly, "Making k-means even faster", SIAM SDM 2010.
+
+    Typical Usage:
+
+    my_kmeans = KMeans(n_clusters=5).fit(pixels)
+"""
+
+import logging
+import numpy as np
+from time import time
+
+from colorkeys.constants import _const as CONSTANTS
+
+logger = logging.getLogger(__name__)
+
+
+class KMeans:
+    """A class for k-means clustering with an sklearn.cluster-like interface.
+
+    Attributes:
+        n_clusters (int): Number of clusters requested.
+        cluster_centers_ (numpy.ndarray): Centroids generated.
+        labels_ (numpy.ndarray): Cluster label of each point.
+        inertia_ (float): Weighted sum of squared distances to centroids.
+        n_iter_ (int): Number of iterations run.
+        iter_times_ (list): Seconds taken by each iteration.
+    """
+    def __init__(self, n_clusters, **kwargs):
+        """Init KMeans.
+
+        Args:
+            n_clusters (int): Number of clusters requested.
+
+        kwargs:
+            init (numpy.ndarray): Initial centroids. Default None uses k-means++.
+            max_iter (int): Maximum number of iterations. Default 300.
+            tol (float): Convergence tolerance on centroid movement, relative to
+                data variance. Default 1e-4.
+            random_state (int): Seed for k-means++ initialisation. Default None.
+        """
+        self.n_clusters = n_clusters
+        self._init = kwargs.setdefault("init", None)
+        self._max_iter = kwargs.setdefault("max_iter", 300)
+        self._tol = kwargs.setdefault("tol", 1e-4)
+        self._rng = np.random.default_rng(kwargs.setdefault("random_state", None))
+        self.cluster_centers_ = None
+        self.labels_ = None
+        self.inertia_ = None
+        self.n_iter_ = 0
+        self.iter_times_ = []
+
+    def fit(self, X, sample_weight=None):
+        """Fit centroids.
+
+        Args:
+            X (numpy.ndarray): Data, one row per point.
+            sample_weight (numpy.ndarray): Weight of each point. Default None
+                weighs points equally.
+
+        Returns:
+            self (colorkeys.kmeans.KMeans): Fitted instance.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if sample_weight is None:
+            w = np.ones(X.shape[0], dtype=np.float32)
+        else:
+            w = np.asarray(sample_weight, dtype=np.float32)
+        if self._init is not None:
+            centers = np.array(self._init, dtype=np.float32)
+        else:
+            centers = self._get_init(X, w)
+        tol = self._tol * float(np.mean(np.var(X, axis=0)))
+
+        # Exact labels and bounds to start: upper is distance to assigned
+        # centroid, lower is distance to second closest centroid. Cluster sums
+        # are kept up to date incrementally from the points that change cluster.
+        labels, upper, lower = assign_bounds(X, centers)
+        sums, totals = get_sums(X, w, labels, self.n_clusters)
+        self.iter_times_ = []
+        for i in range(self._max_iter):
+            time_start = time()
+            centers_new = centers.copy()
+            nonempty = totals > 0
+            centers_new[nonempty] = sums[nonempty] / totals[nonempty, None]
+            shift = np.sqrt(((centers_new - centers) ** 2).sum(axis=1))
+            centers = centers_new
+
+            # Moving centroids loosen the bounds.
+            upper += shift[labels]
+            lower -= shift.max()
+            idx, labels_old = self._update_labels(X, centers, labels, upper, lower)
+            if idx.size > 0:
+                sums_old, totals_old = get_sums(X[idx], w[idx], labels_old, self.n_clusters)
+                sums_new, totals_new = get_sums(X[idx], w[idx], labels[idx], self.n_clusters)
+                sums += sums_new - sums_old
+                totals += totals_new - totals_old
+            self.iter_times_.append(time() - time_start)
+            if idx.size == 0 or (shift ** 2).sum() <= tol:
+                break
+        self.n_iter_ = len(self.iter_times_)
+        self.cluster_centers_ = centers
+        self.labels_ = labels
+        self.inertia_ = float((w * get_dists(X, centers, labels) ** 2).sum())
+        logger.debug(
+            f"{self.n_iter_} iterations, "
+            f"{np.mean(self.iter_times_) * 1000:.2f} ms/iteration, "
+            f"inertia {self.inertia_:.4f}"
+        )
+        return self
+
+    def fit_predict(self, X, sample_weight=None):
+        """Fit centroids and return cluster label of each point."""
+        return self.fit(X, sample_weight=sample_weight).labels_
+
+    def predict(self, X):
+        """Get label of nearest centroid of each point."""
+        labels, _, _ = assign_bounds(
+            np.asarray(X, dtype=np.float32),
+            self.cluster_centers_
+        )
+        return labels
+
+    def _get_init(self, X, w):
+        """Get initial centroids by k-means++ on a weighted subsample.
+
+        Seeding on all points costs several passes per centroid, which outweighs
+        the iterations saved. A subsample drawn by weight preserves the seeding
+        distribution.
+
+        Args:
+            X (numpy.ndarray): Data, one row per point.
+            w (numpy.ndarray): Weight of each point.
+
+        Returns:
+            centers (numpy.ndarray): Initial centroids.
+        """
+        init_size = CONSTANTS().KMEANS_INIT_SIZE
+        if X.shape[0] > init_size:
+            idx = sample_weighted(w.astype(np.float64), init_size, self._rng)
+            X = X[idx]
+            w = np.ones(init_size, dtype=np.float32)
+        return init_kmeans_plusplus(X, w, self.n_clusters, self._rng)
+
+    def _update_labels(self, X, centers, labels, upper, lower):
+        """Update labels and bounds of points whose centroid may have changed.
+
+        A point keeps its centroid while its upper bound is within half the
+        distance from its centroid to the nearest other centroid, or within its
+        lower bound. Labels and bounds are updated in place.
+
+        Args:
+            X (numpy.ndarray): Data, one row per point.
+            centers (numpy.ndarray): Centroids.
+            labels (numpy.ndarray): Cluster label of each point.
+            upper (numpy.ndarray): Upper bound of distance to assigned centroid.
+            lower (numpy.ndarray): Lower bound of distance to other centroids.
+
+        Returns:
+            idx (numpy.ndarray): Indices of points that changed centroid.
+            labels_old (numpy.ndarray): Previous labels of those points.
+        """
+        center_dists = np.sqrt(
+            ((centers[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        )
+        np.fill_diagonal(center_dists, np.inf)
+        half_nearest = center_dists.min(axis=1) / 2
+        bound = np.maximum(half_nearest[labels], lower)
+        idx = np.flatnonzero(upper > bound)
+
+        # Tighten the upper bound before computing all distances.
+        upper[idx] = get_dists(X[idx], centers, labels[idx])
+        idx = idx[upper[idx] > bound[idx]]
+        labels_new, upper[idx], lower[idx] = assign_bounds(X[idx], centers)
+        changed = labels_new != labels[idx]
+        idx = idx[changed]
+        labels_old = labels[idx]
+        labels[idx] = labels_new[changed]
+        return idx, labels_old
+
+
+def init_kmeans_plusplus(X, w, n_clusters, rng, init=None):
+    """Get initial centroids by weighted greedy k-means++ seeding.
+
+    Each centroid is the best of several candidates sampled with probability
+    proportional to weighted squared distance from the centroids so far, as in
+    sklearn.cluster.kmeans_plusplus.
+
+    Args:
+        X (numpy.ndarray): Data, one row per point.
+        w (numpy.ndarray): Weight of each point.
+        n_clusters (int): Number of centroids.
+        rng (numpy.random.Generator): Random number generator.
+        init (numpy.ndarray): Centroids so far (e.g. of fewer clusters), kept as
+            the first centroids. Default None seeds all centroids.
+
+    Returns:
+        centers (numpy.ndarray): Initial centroids.
+    """
+    num_trials = 2 + int(np.log(n_clusters))
+    w = w.astype(np.float64)
+    centers = np.empty((n_clusters, X.shape[1]), dtype=np.float32)
+    if init is None or len(init) == 0:
+        num_init = 1
+        centers[0] = X[sample_weighted(w, 1, rng)[0]]
+    else:
+        num_init = len(init)
+        centers[:num_init] = init
+    closest = get_sq_dists(X, centers[:num_init]).min(axis=1).astype(np.float64)
+    for i in range(num_init, n_clusters):
+        p = w * closest
+        if p.sum() <= 0:  # Fewer distinct points than clusters.
+            p = w
+        candidates = sample_weighted(p, num_trials, rng)
+        trials = np.minimum(closest[:, None], get_sq_dists(X, X[candidates]))
+        best = (w @ trials).argmin()
+        centers[i] = X[candidates[best]]
+        closest = trials[:, best]
+    return centers
+
+
+def sample_weighted(p, n, rng):
+    """Sample n indices with replacement, with probability proportional to p."""
+    cumulative = np.cumsum(p)
+    idx = np.searchsorted(cumulative, rng.random(n) * cumulative[-1], side="right")
+    return np.minimum(idx, p.shape[0] - 1)
+
+
+def get_sums(X, w, labels, n_clusters):
+    """Get weighted sum and total weight of the points of each cluster.
+
+    Args:
+        X (numpy.ndarray): Data, one row per point.
+        w (numpy.ndarray): Weight of each point.
+        labels (numpy.ndarray): Cluster label of each point.
+        n_clusters (int): Number of clusters.
+
+    Returns:
+        sums (numpy.ndarray): Weighted sum of points, one row per cluster.
+        totals (numpy.ndarray): Total weight of each cluster.
+    """
+    totals = np.bincount(labels, weights=w, minlength=n_clusters)
+    sums = np.stack(
+        [
+            np.bincount(labels, weights=w * X[:, d], minlength=n_clusters)
+            for d in range(X.shape[1])
+        ],
+        axis = 1,
+    )
+    return sums, totals
+
+
+def get_sq_dists(X, centers):
+    """Get squared distance of each point to each centroid.
+
+    Args:
+        X (numpy.ndarray): Data, one row per point.
+        centers (numpy.ndarray): Centroids.
+
+    Returns:
+        sq_dists (numpy.ndarray): Squared distances, one row per point.
+    """
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2
+    sq_dists = get_partial_sq_dists(X, centers)
+    sq_dists += get_sq_norms(X)[:, None]
+    return np.maximum(sq_dists, 0, out=sq_dists)
+
+
+def get_partial_sq_dists(X, centers):
+    """Get squared distance of each point to each centroid, less |x|^2.
+
+    The |x|^2 term is constant per point, so it does not change which centroid
+    is nearest.
+    """
+    return get_sq_norms(centers)[None, :] - 2 * (X @ centers.T)
+
+
+def get_sq_norms(X):
+    """Get squared norm of each row."""
+    return np.einsum("ij,ij->i", X, X)
+
+
+def get_dists(X, centers, labels):
+    """Get distance of each point to its assigned centroid."""
+    diff = X - centers[labels]
+    return np.sqrt(get_sq_norms(diff))
+
+
+def assign_bounds(X, centers, **kwargs):
+    """Get nearest centroid of each point with exact distance bounds, in batches.
+
+    Args:
+        X (numpy.ndarray): Data, one row per point.
+        centers (numpy.ndarray): Centroids.
+
+    kwargs:
+        chunk_pixels (int): Points per batch. Default CONSTANTS().CHUNK_PIXELS.
+
+    Returns:
+        labels (numpy.ndarray): Label of nearest centroid of each point.
+        upper (numpy.ndarray): Distance to nearest centroid.
+        lower (numpy.ndarray): Distance to second nearest centroid.
+    """
+    chunk_pixels = kwargs.setdefault("chunk_pixels", CONSTANTS().CHUNK_PIXELS)
+    n = X.shape[0]
+    labels = np.empty(n, dtype=np.int64)
+    upper = np.empty(n, dtype=np.float32)
+    lower = np.full(n, np.inf, dtype=np.float32)
+    for i in range(0, n, chunk_pixels):
+        chunk = X[i:i + chunk_pixels]
+        sq_norms = get_sq_norms(chunk)
+        sq_dists = get_partial_sq_dists(chunk, centers)
+        nearest = sq_dists.argmin(axis=1)
+        rows = np.arange(nearest.shape[0])
+        labels[i:i + chunk_pixels] = nearest
+        upper[i:i + chunk_pixels] = np.sqrt(
+            np.maximum(sq_dists[rows, nearest] + sq_norms, 0)
+        )
+        if centers.shape[0] > 1:
+            sq_dists[rows, nearest] = np.inf
+            lower[i:i + chunk_pixels] = np.sqrt(
+                np.maximum(sq_dists.min(axis=1) + sq_norms, 0)
+            )
+    return labels, upper, lower
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+"""
+This module plans and runs the analysis stages shared by the palettes of an image.
+
+Every algorithm + colorspace combination of an image needs the same decoded image,
+and every algorithm of a colorspace needs the same converted image. The planner
+builds these stages as a DAG and runs each stage once.
+
+    decode -> dtype -> colorspace (RGB) -> palette (kmeans, RGB)
+                    |                   -> palette (mbkmeans, RGB)
+                    -> colorspace (HSV) -> palette (kmeans, HSV)
+                                        -> palette (mbkmeans, HSV)
+
+The decode stage also strips the alpha channel. The dtype stage converts to the
+pipeline dtype (e.g. float32). The palette stage fits the cluster and generates
+the histogram.
+
+A sweep of numbers of clusters (e.g. 3 to 12) shares the same stages. Each
+palette of a sweep also depends on the palette of the next fewer clusters of its
+algorithm and colorspace, and is seeded from its centroids (completed by
+k-means++ seeding), so it converges in few iterations. Palettes of a sweep
+measure their inertia and silhouette score, to compare numbers of clusters.
+
+    colorspace (RGB) -> palette (kmeans, RGB, 3) -> palette (kmeans, RGB, 4) -> ...
+
+With a cache, palettes found in the cache are looked up after the decode stage
+(which hashes the image source) and their stages are not run. A colorspace stage
+only runs if a palette of its colorspace is not cached.
+
+    Typical Usage:
+
+    my_planner = Planner("my_image_file.png", ["kmeans"], ["RGB", "HSV"], 5)
+    palettes = my_planner.run()
+
+    my_planner = Planner("my_image_file.png", ["kmeans"], ["RGB"], range(3, 13))
+    palettes = my_planner.run()
+"""
+
+import collections
+import functools
+import logging
+
+from colorkeys.artwork import Artwork
+from colorkeys.cache import CachedHist
+from colorkeys.cache import get_entry
+from colorkeys.colorkeys import ColorKey
+from colorkeys.constants import _const as CONSTANTS
+from colorkeys.histogram import convert_colorspace
+from colorkeys.histogram import convert_dtype
+
+logger = logging.getLogger(__name__)
+
+Stage = collections.namedtuple("Stage", ["func", "deps"])
+
+
+class Planner:
+    """A class for planning and running the shared stages of an image analysis.
+
+    Stages are keyed by tuple, e.g. ("colorspace", "HSV") or
+    ("palette", "kmeans", "HSV", 5). Each stage is a function of the results of
+    the stages it depends on.
+
+    Attributes:
+        imgsrc (str): Image source location.
+        stages (dict): Stages keyed by stage key.
+        palette_keys (list): Keys of the palette stages, in output order.
+    """
+    def __init__(self, imgsrc, algos, colorspaces, num_clusters, **kwargs):
+        """Init Planner.
+
+        Args:
+            imgsrc (str): Image source location.
+            algos (list): Algorithms requested.
+            colorspaces (list): Colorspaces requested.
+            num_clusters (int): Number of clusters requested, or a list of
+                numbers of clusters to sweep.
+
+        kwargs:
+            clust_kwargs (dict): kwargs for colorkeys.centroids.Clust.
+            dtype (str): Pipeline dtype. Default CONSTANTS().PIPELINE_DTYPE.
+            artwork (colorkeys.artwork.Artwork): Decoded image, if already
+                decoded (e.g. prefetched). Replaces the decode stage.
+            cache (colorkeys.cache.Cache): Palette cache. Default None.
+            max_side (int): Longest side of image analysed, larger images are
+                downscaled at decode. Default None.
+            init_centroids (dict): Centroids to warm-start the fit of each palette
+                from (e.g. of the previous frame), keyed by (algo, colorspace,
+                num_clusters).
+                Warm-started palettes depend on them, so are not cached.
+                Default {}.
+        """
+        self._imgsrc = imgsrc
+        self._algos = algos
+        self._colorspaces = colorspaces
+        if isinstance(num_clusters, int):
+            num_clusters = [num_clusters]
+        self._num_clusters = sorted(set(num_clusters))
+        self._is_sweep = len(self._num_clusters) > 1
+        self._clust_kwargs = kwargs.setdefault("clust_kwargs", {})
+        self._dtype = kwargs.setdefault("dtype", CONSTANTS().PIPELINE_DTYPE)
+        self._artwork = kwargs.setdefault("artwork", None)
+        self._cache = kwargs.setdefault("cache", None)
+        self._max_side = kwargs.setdefault("max_side", None)
+        self._init_centroids = kwargs.setdefault("init_centroids", None) or {}
+        self._palette_keys = [
+            ("palette", algo, colorspace, n)
+            for algo in self._algos
+            for colorspace in self._colorspaces
+            for n in self._num_clusters
+        ]
+        self._stages = self._get_stages()
+
+    @property
+    def imgsrc(self):
+        """Image source location."""
+        return self._imgsrc
+
+    @property
+    def stages(self):
+        """Stages keyed by stage key."""
+        return self._stages
+
+    @property
+    def palette_keys(self):
+        """Keys of the palette stages."""
+        return self._palette_keys
+
+    def run(self):
+        """Run the planned stages and return palettes."""
+        return self._run()
+
+    def _get_stages(self):
+        """Get the stage DAG for the requested palettes.
+
+        Args:
+            None
+
+        Returns:
+            stages (dict): Stages keyed by stage key.
+        """
+        stages = {
+            ("decode",): Stage(self._decode, ()),
+            ("dtype",): Stage(self._convert_dtype, (("decode",),)),
+        }
+        for colorspace in self._colorspaces:
+            stages[("colorspace", colorspace)] = Stage(
+                functools.partial(convert_colorspace, colorspace=colorspace),
+                (("dtype",),),
+            )
+        for key in self._palette_keys:
+            _, algo, colorspace, n = key
+            deps = (("decode",), ("colorspace", colorspace))
+            i = self._num_clusters.index(n)
+            if i > 0:
+                deps += (("palette", algo, colorspace, self._num_clusters[i - 1]),)
+            stages[key] = Stage(
+                functools.partial(self._palette, algo, colorspace, n),
+                deps,
+            )
+        return stages
+
+    def _run(self):
+        """Run each stage once, in dependency order.
+
+        Results of the intermediate stages are released after the run.
+
+        Args:
+            None
+
+        Returns:
+            palettes (list): Palettes (colorkeys.ColorKey), ordered by algorithm,
+                colorspace then number of clusters.
+        """
+        results = {}
+        if self._cache:
+            self._lookup(results)
+        palettes = [self._run_stage(key, results) for key in self._palette_keys]
+        logger.debug(f"{self._imgsrc}: ran {len(results)} stages")
+        return palettes
+
+    def _run_stage(self, key, results):
+        """Run stage, running its dependencies first if not yet run.
+
+        Args:
+            key (tuple): Stage key.
+            results (dict): Results of stages already run, keyed by stage key.
+
+        Returns:
+            result (object): Result of stage.
+        """
+        if key not in results:
+            stage = self._stages[key]
+            inputs = [self._run_stage(dep, results) for dep in stage.deps]
+            results[key] = stage.func(*inputs)
+        return results[key]
+
+    def _lookup(self, results):
+        """Look up palettes in the cache, adding those found to the results.
+
+        Palettes of a sweep are seeded from each other, so those of an algorithm
+        and colorspace are only added if all are found.
+
+        Args:
+            results (dict): Results of stages already run, keyed by stage key.
+
+        Returns:
+            None
+        """
+        artwork = self._run_stage(("decode",), results)
+        for algo in self._algos:
+            for colorspace in self._colorspaces:
+                entries = {}
+                for n in self._num_clusters:
+                    entry = self._cache.get(self._get_cache_key(artwork, algo, colorspace, n))
+                    if entry is None:
+                        break
+                    entries[n] = entry
+                else:
+                    for n, entry in entries.items():
+                        logger.debug(f"{self._imgsrc}: cached {algo}, {colorspace}, {n}")
+                        results[("palette", algo, colorspace, n)] = ColorKey(
+                            self._imgsrc,
+                            algo,
+                            n,
+                            colorspace = colorspace,
+                            artwork = artwork,
+                            hist = CachedHist(entry, artwork.rescaled_width),
+                        )
+        return None
+
+    def _get_cache_key(self, artwork, algo, colorspace, num_clusters):
+        """Get cache key of palette, from its image hash and pipeline parameters."""
+        params = {"dtype": self._dtype, **self._clust_kwargs}
+        if self._max_side:  # Keys of full resolution palettes unchanged.
+            params["max_side"] = self._max_side
+        if self._is_sweep:  # Keys of single palettes unchanged.
+            params["sweep"] = self._num_clusters
+        return self._cache.get_key(
+            artwork.filehash,
+            algo,
+            colorspace,
+            num_clusters,
+            **params,
+        )
+
+    def _decode(self):
+        """Decode image, disregarding alpha channel."""
+        if self._artwork:
+            return self._artwork
+        return Artwork(self._imgsrc, max_side=self._max_side)
+
+    def _convert_dtype(self, artwork):
+        """Convert decoded image to pipeline dtype."""
+        return convert_dtype(artwork.img, self._dtype)
+
+    def _palette(self, algo, colorspace, num_clusters, artwork, img, fewer=None):
+        """Fit cluster and generate histogram from converted image.
+
+        A palette of a sweep is seeded from the palette of fewer clusters, unless
+        warm-started (e.g. from the previous frame).
+        """
+        clust_kwargs = {**self._clust_kwargs, "metrics": self._is_sweep}
+        init_centroids = self._init_centroids.get((algo, colorspace, num_clusters))
+        if init_centroids is None and fewer is not None:
+            # Cached palettes have no centroids, and fit cold.
+            init_centroids = getattr(fewer.hist, "centroids", None)
+            clust_kwargs["partial_fit"] = False
+            clust_kwargs["max_drift"] = None
+        if init_centroids is not None:
+            clust_kwargs["init_centroids"] = init_centroids
+        palette = ColorKey(
+            self._imgsrc,
+            algo,
+            num_clusters,
+            colorspace = colorspace,
+            artwork = artwork,
+            img_preprocessed = img,
+            dtype = self._dtype,
+            clust_kwargs = clust_kwargs,
+        )
+        # Palettes warm-started from the previous frame (or seeded from them)
+        # are not reproducible from their key.
+        if self._cache and not (self._init_centroids and palette.hist.warm_start):
+            self._cache.put(
+                self._get_cache_key(artwork, algo, colorspace, num_clusters),
+                get_entry(palette.hist),
+            )
+        return palette
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+This module is a local read-through cache of DynamoDB colorkey queries.
+
+Items are kept in a SQLite file by key ("filehash", "selector"). A query of a
+filehash by selector prefix is answered locally if the same query was answered
+by DynamoDB within the TTL: the query is recorded as complete, so the cached
+items are all of its items. Items loaded into DynamoDB are added to the cache,
+and keep the queries they match complete.
+
+    Typical Usage:
+
+    my_cache = QueryCache("/tmp/colorkeys-query.sqlite")
+    items = my_cache.get(filehash, "kmeans#RGB#5#")
+    if items is None:
+        items = query(...)
+        my_cache.put(filehash, "kmeans#RGB#5#", items)
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from colorkeys import codecjson
+from colorkeys.constants import _const as CONSTANTS
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """A class for a SQLite cache of DynamoDB colorkey queries.
+
+    Not thread-safe: use from the thread that created it.
+
+    Attributes:
+        path (pathlib.Path): Path of SQLite file.
+        ttl (float): Seconds a query is answered from cache.
+        hits (int): Number of queries answered from cache.
+        misses (int): Number of queries not answered from cache.
+    """
+    def __init__(self, path, **kwargs):
+        """Init QueryCache.
+
+        Args:
+            path (str): Path of SQLite file, created if missing.
+
+        kwargs:
+            ttl (float): Seconds a query is answered from cache. Default
+                CONSTANTS().QUERY_CACHE_TTL.
+        """
+        self._path = Path(path)
+        self._ttl = kwargs.setdefault("ttl", CONSTANTS().QUERY_CACHE_TTL)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self._path)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                filehash TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                item TEXT NOT NULL,
+                PRIMARY KEY (filehash, selector)
+            );
+            CREATE TABLE IF NOT EXISTS queries (
+                filehash TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                queried REAL NOT NULL,
+                PRIMARY KEY (filehash, prefix)
+            );
+            """
+        )
+        self._hits = 0
+        self._misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return None
+
+    @property
+    def path(self):
+        """Path of SQLite file."""
+        return self._path
+
+    @property
+    def ttl(self):
+        """Seconds a query is answered from cache."""
+        return self._ttl
+
+    @property
+    def hits(self):
+        """Number of queries answered from cache."""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Number of queries not answered from cache."""
+        return self._misses
+
+    def get(self, filehash, prefix):
+        """Get cached items of query.
+
+        Args:
+            filehash (str): Partition key.
+            prefix (str): Prefix of range key.
+
+        Returns:
+            items (list): Items of query, numbers as Decimal. None if the query
+                is not cached or older than TTL.
+        """
+        row = self._db.execute(
+            "SELECT queried FROM queries WHERE filehash = ? AND prefix = ?",
+            (filehash, prefix),
+        ).fetchone()
+        if row is None or time.time() - row[0] > self._ttl:
+            self._misses += 1
+            return None
+        rows = self._db.execute(
+            "SELECT item FROM items WHERE filehash = ? "
+            "AND substr(selector, 1, length(?)) = ? ORDER BY selector",
+            (filehash, prefix, prefix),
+        )
+        self._hits += 1
+        return [codecjson.decode(item) for item, in rows]
+
+    def put(self, filehash, prefix, items):
+        """Cache items of query, answered by DynamoDB.
+
+        Args:
+            filehash (str): Partition key.
+            prefix (str): Prefix of range key.
+            items (list): All items of query.
+
+        Returns:
+            None
+        """
+        with self._db:
+            self._insert(items)
+            self._db.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?)",
+                (filehash, prefix, time.time()),
+            )
+        return None
+
+    def put_items(self, items):
+        """Cache items loaded into DynamoDB.
+
+        Cached queries stay complete, as their new items are added. Queries not
+        cached are not recorded: DynamoDB may hold other items of them.
+
+        Args:
+            items (list): Items, including "filehash" and "selector" keys.
+
+        Returns:
+            None
+        """
+        with self._db:
+            self._insert(items)
+        return None
+
+    def invalidate(self, filehashes=None):
+        """Remove cached queries and items of filehashes, or all if None."""
+        with self._db:
+            if filehashes is None:
+                self._db.execute("DELETE FROM queries")
+                self._db.execute("DELETE FROM items")
+            else:
+                params = [(i, ) for i in filehashes]
+                self._db.executemany("DELETE FROM queries WHERE filehash = ?", params)
+                self._db.executemany("DELETE FROM items WHERE filehash = ?", params)
+        return None
+
+    def close(self):
+        """Close SQLite file."""
+        self._db.close()
+        return None
+
+    def _insert(self, items):
+        """Insert or replace items."""
+        self._db.executemany(
+            "INSERT OR REPLACE INTO items VALUES (?, ?, ?)",
+            (
+                (i["filehash"], i["selector"], json.dumps(i, default=encode_decimal))
+                for i in items
+            ),
+        )
+        return None
+
+
+def encode_decimal(obj):
+    """Encode Decimal for JSON, as decoded again by codecjson.decode."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""
+This module reads image sources for hashing and decoding.
+
+An image source is read once. Local files are memory mapped to be hashed, then
+decoded from their path (from the page cache), so their bytes are never copied.
+Web sources are downloaded into a buffer, and the same bytes are hashed and
+decoded.
+
+An image can be decoded at a reduced analysis resolution. JPEG images are
+decoded straight to 1/2, 1/4, or 1/8 scale by the decoder (DCT scaling, PIL draft
+mode), which cuts decode time and memory by up to 64x. Images are then area
+downsampled to fit the longest side.
+
+    Typical Usage:
+
+    with ImageSource("my_image_file.png") as my_source:
+        filehash = my_source.filehash
+        img = my_source.decode()
+        img_small = my_source.decode(max_side=1024)
+"""
+
+import hashlib
+import io
+import logging
+import mmap
+import numpy as np
+import skimage.io as skiio
+from PIL import Image
+from urllib import request
+
+from colorkeys.constants import _const as CONSTANTS
+
+logger = logging.getLogger(__name__)
+
+
+class ImageSource:
+    """A class for the bytes of an image source.
+
+    Attributes:
+        imgsrc (str): Image source location.
+        buf (bytes): Bytes of image source, memory mapped for local files.
+        filehash (str): Hash of image source.
+    """
+    def __init__(self, imgsrc):
+        """Init ImageSource.
+
+        Args:
+            imgsrc (str): Image source location.
+        """
+        self._imgsrc = imgsrc
+        self._buf = read(imgsrc)
+        self._filehash = get_hash(self._buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return None
+
+    @property
+    def imgsrc(self):
+        """Image source location."""
+        return self._imgsrc
+
+    @property
+    def buf(self):
+        """Bytes of image source."""
+        return self._buf
+
+    @property
+    def filehash(self):
+        """Hash of image source."""
+        return self._filehash
+
+    def decode(self, **kwargs):
+        """Decode image matrix from the bytes of image source.
+
+        kwargs:
+            max_side (int): Longest side of image matrix, larger images are
+                downscaled by an integer factor as they are decoded. Default
+                None decodes at full resolution.
+
+        Returns:
+            img (numpy.ndarray): Image matrix.
+        """
+        max_side = kwargs.setdefault("max_side", None)
+        if not max_side:
+            return skiio.imread(self._get_file())
+        with Image.open(self._get_file()) as pil_img:
+            if pil_img.mode not in CONSTANTS().DRAFT_MODES:
+                # Decoded by skimage as any image, e.g. 16-bit PNG.
+                return downscale(skiio.imread(self._get_file()), max_side)
+            size = get_size(*pil_img.size, max_side)
+            if size != pil_img.size:
+                # JPEG only, scales to at least size, a no-op for other formats.
+                pil_img.draft(None, size)
+            if pil_img.mode not in ("RGB", "RGBA"):
+                pil_img = pil_img.convert("RGB")
+            if pil_img.size != size:
+                pil_img = pil_img.resize(size, Image.Resampling.BOX)
+            img = np.asarray(pil_img)
+        return img
+
+    def _get_file(self):
+        """Get image source for a decoder.
+
+        A memory map would be copied whole into an io.BytesIO, so local files
+        are decoded from their path (the pages just hashed are in the page
+        cache). A bytes buffer is not copied by io.BytesIO.
+
+        Args:
+            None
+
+        Returns:
+            file (str, io.BytesIO): Path of local file, or file object over the
+                bytes of a web source.
+        """
+        if isinstance(self._buf, mmap.mmap):
+            file = self._imgsrc
+        else:
+            file = io.BytesIO(self._buf)
+        return file
+
+    def close(self):
+        """Release the memory map of a local file."""
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        return None
+
+
+def read(imgsrc):
+    """Read bytes of image source.
+
+    Args:
+        imgsrc (str): Image source location.
+
+    Returns:
+        buf (bytes): Bytes of image source, an mmap.mmap for non-empty local
+            files.
+    """
+    if imgsrc.startswith(CONSTANTS().WEB_PREFIXES):
+        with request.urlopen(imgsrc) as f:
+            buf = f.read()
+    else:
+        with open(imgsrc, "rb") as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty file, cannot be mapped.
+                buf = b""
+    return buf
+
+
+def get_size(width, height, max_side):
+    """Get size of image downscaled by an integer factor to fit max_side.
+
+    Args:
+        width (int): Width of image.
+        height (int): Height of image.
+        max_side (int): Longest side of downscaled image.
+
+    Returns:
+        size (tuple): Width and height of downscaled image.
+    """
+    factor = get_factor(width, height, max_side)
+    return max(1, width // factor), max(1, height // factor)
+
+
+def get_factor(width, height, max_side):
+    """Get least integer downscale factor to fit max_side, 1 if it fits."""
+    return max(1, -(-max(width, height) // max_side))
+
+
+def downscale(img, max_side):
+    """Area downsample image matrix by an integer factor to fit max_side.
+
+    Each pixel is the mean of a block of factor x factor pixels. Edge pixels
+    that do not fill a block are dropped, as by get_size().
+
+    Args:
+        img (numpy.ndarray): Image matrix.
+        max_side (int): Longest side of downscaled image.
+
+    Returns:
+        img (numpy.ndarray): Image matrix downscaled, of the dtype of img.
+    """
+    height, width = img.shape[:2]
+    factor = get_factor(width, height, max_side)
+    if factor == 1:
+        return img
+    width_new, height_new = get_size(width, height, max_side)
+    blocks = img[:height_new * factor, :width_new * factor].reshape(
+        height_new, factor, width_new, factor, *img.shape[2:]
+    )
+    img_new = blocks.mean(axis=(1, 3), dtype=np.float32)
+    if np.issubdtype(img.dtype, np.integer):
+        img_new = np.rint(img_new)
+    return img_new.astype(img.dtype)
+
+
+def get_hash(buf):
+    """Get hash of bytes, as codecjson.get_filehash() of their file."""
+    filehash = hashlib.blake2b(buf, digest_size=8)
+    return filehash.hexdigest()
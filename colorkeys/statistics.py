@@ -4,143 +4,207 @@
 This module facilitates numerical analysis of color information across
 clusters and samples.
 
-Cluster centroid matrices are extracted from colorkeys object and translated
-into a format for analysis.
-
-sample #0                               sample #1
-cluster 0: [ R00, G00, G00, percent00]  [ R01, G01, B01, percent01]
-cluster 1: [ R10, G10, B10, percent10]  [ R11, G11, B11, percent11]
-
-...translated to...
-
-cluster 0: [ R00, G00, B00, percent00]  |       |
-           [ R01, G01, B01, percent01]  |       |
-                                        v       v
-                                        mean    std
-cluster 1: [ R10, G10, B10, percent10]
-           [ R11, G11, B11, percent11]
-
-The mean and std for each cluster can then be computed for each element of
-the row vector ([R, G, B, percent]) along the Y axis.
+Cluster centroids of colorkey objects are stacked into a single preallocated
+(samples, clusters, 4) tensor, one [R, G, B, percent] row vector per cluster of
+each sample.
+
+sample #0    cluster 0: [ R00, G00, B00, percent00]
+             cluster 1: [ R01, G01, B01, percent01]
+sample #1    cluster 0: [ R10, G10, B10, percent10]
+             cluster 1: [ R11, G11, B11, percent11]
+                           |                 |
+                           v                 v
+                           mean, std, percentiles along axis 0 (samples)
+
+Colorkeys too many for memory are stacked in chunks and accumulated by a
+streaming (Welford) accumulator of mean and std.
+
+    Typical Usage:
+
+    tensor = get_tensor(colorkeys)
+    means = get_cluster_means(tensor)
+
+    my_welford = Welford(5)
+    for tensor in iter_tensors(colorkeys, 5):
+        my_welford.update(tensor)
+    means = my_welford.mean
 """
 
+import itertools
 import numpy as np
 
+NUM_ELEMENTS = 4  # [R, G, B, percent]
 
-def get_cluster_means(clusters):
-    """Get the arithmetic mean of each cluster.
 
-    Args:
-        clusters (dict): Color & percent values, key is cluster number
-            value is 2D array of n samples with row vector ([R, G, B, percent]).
+class Welford:
+    """A class for streaming mean and std of clusters, by Welford's algorithm.
 
-    Returns:
-        means (dict): key is cluster number (0, num_clusters)
-            value is mean of each cluster as vector ([R, G, B, percent]).
-    """
-    means = {}
-    for i, cluster in clusters.items():
-        means[i] = np.mean(cluster, axis=0)
-    return means
+    Chunks of samples are merged by the parallel form of the algorithm (Chan et
+    al.), so the accumulator is numerically stable and vectorized per chunk.
 
+    https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance
 
-def get_cluster_stds(clusters):
-    """Get the standard deviation of each cluster.
+    Attributes:
+        count (int): Number of samples accumulated.
+        mean (numpy.ndarray): Mean of each cluster, shape (clusters, 4).
+        var (numpy.ndarray): Variance of each cluster, shape (clusters, 4).
+        std (numpy.ndarray): Standard deviation of each cluster, shape
+            (clusters, 4).
+    """
+    def __init__(self, num_clusters):
+        """Init Welford.
+
+        Args:
+            num_clusters (int): Number of clusters of each sample.
+        """
+        self._count = 0
+        self._mean = np.zeros((num_clusters, NUM_ELEMENTS))
+        self._m2 = np.zeros((num_clusters, NUM_ELEMENTS))
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def var(self):
+        """Population variance (ddof=0), as numpy.var."""
+        if self._count == 0:
+            return np.full_like(self._m2, np.nan)
+        return self._m2 / self._count
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def update(self, tensor):
+        """Accumulate a chunk of samples.
+
+        Args:
+            tensor (numpy.ndarray): Samples, shape (samples, clusters, 4).
+
+        Returns:
+            None
+        """
+        count = tensor.shape[0]
+        if count == 0:
+            return None
+        mean = tensor.mean(axis=0)
+        m2 = ((tensor - mean) ** 2).sum(axis=0)
+        total = self._count + count
+        delta = mean - self._mean
+        self._mean += delta * (count / total)
+        self._m2 += m2 + delta ** 2 * (self._count * count / total)
+        self._count = total
+        return None
+
+
+def get_tensor(colorkeys, num_clusters=None):
+    """Get centroids of colorkey objects, stacked into a tensor.
 
     Args:
-        clusters (dict): Color & percent values, key is cluster number
-            value is 2D array of n samples with row vector ([R, G, B, percent]).
+        colorkeys (list): colorkey objects.
+        num_clusters (int): Number of clusters of each colorkey. Default the
+            number of clusters of the first colorkey.
 
     Returns:
-        stds (dict): key is cluster number (0, num_clusters)
-            value is std of each cluster as vector ([R, G, B, percent]).
+        tensor (numpy.ndarray): Centroids, shape (samples, clusters, 4).
+
+    Raises:
+        ValueError: colorkeys with different numbers of clusters.
     """
-    stds = {}
-    for i, cluster in clusters.items():
-        stds[i] = np.std(cluster, axis=0)
-    return stds
+    if num_clusters is None:
+        num_clusters = len(colorkeys[0]["histogram"]["hist_centroids"]) if colorkeys else 0
+    tensor = np.empty((len(colorkeys), num_clusters, NUM_ELEMENTS))
+    for i, colorkey in enumerate(colorkeys):
+        create_matrix(colorkey, out=tensor[i])
+    return tensor
 
 
-def get_centroids(colorkeys):
-    """Get centroid matrices of colorkey objects.
+def iter_tensors(colorkeys, num_clusters, chunk_size=4096):
+    """Iterate centroids of colorkey objects, stacked into tensors by chunk.
 
     Args:
-        colorkeys (list): colorkey objects.
+        colorkeys (iterable): colorkey objects.
+        num_clusters (int): Number of clusters of each colorkey.
+        chunk_size (int): Number of colorkeys per tensor.
 
-    Returns:
-        centroids (dict): Cluster centroids, key is cluster number (0, num_clusters)
-            value is 2D array with row vector ([R, G, B, percent]).
+    Yields:
+        tensor (numpy.ndarray): Centroids, shape (samples, clusters, 4).
+
+    Raises:
+        ValueError: colorkeys with different numbers of clusters.
     """
-    centroids = {}
-    for i, colorkey in enumerate(colorkeys):
-        centroids[i] = create_matrix(colorkey)
-    return centroids
+    itr = iter(colorkeys)
+    while chunk := list(itertools.islice(itr, chunk_size)):
+        yield get_tensor(chunk, num_clusters)
 
 
-def create_matrix(colorkey):
+def create_matrix(colorkey, out=None):
     """Create centroid matrix from colorkey object.
 
     Extract the centroid information from colorkey object.
 
     Args:
-        colorkey (colorkeys.ColorKey): colorkey information.
+        colorkey (dict): colorkey information.
+        out (numpy.ndarray): Matrix to fill, shape (clusters, 4). Default a
+            new matrix.
 
     Returns:
-        matrix (numpy.ndarray): row vector ([R, G, B, percent]).
+        matrix (numpy.ndarray): row vector ([R, G, B, percent]) per cluster.
+
+    Raises:
+        ValueError: colorkey with a different number of clusters than out.
     """
     centroids = colorkey["histogram"]["hist_centroids"]
-    m = []
-    for i in centroids:
-        row = i["color"] + [i["percent"]]
-        m.append(row)
-    matrix = np.array(m)
-    return matrix
+    if out is None:
+        out = np.empty((len(centroids), NUM_ELEMENTS))
+    elif len(centroids) != out.shape[0]:
+        raise ValueError(
+            f"Colorkey has {len(centroids)} clusters, expected {out.shape[0]}"
+        )
+    out[:] = [[*i["color"], i["percent"]] for i in centroids]
+    return out
 
 
-def get_centroids_by_cluster(centroids):
-    """Get matrix of centroids stacked by cluster row.
-
-    Stack i^th row of each sample into 2D array. This allows easy calculation
-    of mean and std of the i^th cluster for all samples
+def get_cluster_means(tensor):
+    """Get the arithmetic mean of each cluster.
 
     Args:
-        centroids (dict): Centroid info, key is cluster number,
-            value is row vector ([R, G, B, percent).
+        tensor (numpy.ndarray): Centroids, shape (samples, clusters, 4).
 
     Returns:
-        clusters (dict): 2D array of row vectors, key is cluster number,
-            value is 2D array of vector ([R, G, B]), one row per sample.
+        means (numpy.ndarray): Mean of each cluster as row vector
+            ([R, G, B, percent]), shape (clusters, 4).
     """
-    if is_same_shape(centroids):
-        clusters = {}
-        for centroid in centroids.values():
-            for j in range(0, centroid.shape[0]):
-                row = centroid[j:j + 1]
-                if j not in clusters.keys():
-                    clusters[j] = row
-                else:
-                    clusters[j] = np.vstack((clusters[j], row))
-    return clusters
+    return tensor.mean(axis=0)
+
 
+def get_cluster_stds(tensor):
+    """Get the standard deviation of each cluster.
+
+    Args:
+        tensor (numpy.ndarray): Centroids, shape (samples, clusters, 4).
+
+    Returns:
+        stds (numpy.ndarray): Std of each cluster as row vector
+            ([R, G, B, percent]), shape (clusters, 4).
+    """
+    return tensor.std(axis=0)
 
-def is_same_shape(centroids):
-    """Check if centroid matrices have the same shape.
 
-    Identical matrix shape is required for some matrix operations.
+def get_cluster_percentiles(tensor, q):
+    """Get percentiles of each cluster.
 
     Args:
-        centroids (dict): Centroid info, key is cluster number,
-            value is row vector ([R, G, B, percent).
+        tensor (numpy.ndarray): Centroids, shape (samples, clusters, 4).
+        q (list): Percentiles to compute, in [0, 100].
 
     Returns:
-        same_shape (bool): True if all centroids in dict are same shape.
+        percentiles (numpy.ndarray): Percentiles of each cluster as row vector
+            ([R, G, B, percent]), shape (len(q), clusters, 4).
     """
-    same_shape = True
-    shape = ()
-    for m in centroids.values():
-        if not shape:
-            shape = m.shape
-        elif shape != m.shape:
-            same_shape = False
-            break
-    return same_shape
+    return np.percentile(tensor, q, axis=0)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+This module is a weighted Ward agglomerative clustering engine for reduced color
+sets.
+
+sklearn.cluster.AgglomerativeClustering takes no sample weights, so it can only
+cluster pixels one by one, which is quadratic in the number of pixels. Here each
+point is a representative color (e.g. a quantized color bin) weighted by its
+pixel count, so a few thousand points stand for a whole image.
+
+Clusters are merged by the nearest-neighbor chain algorithm, which finds the
+same merges as the greedy algorithm for a reducible linkage such as Ward, in
+O(n^2) time and O(n) memory. The Ward distance of two clusters is computed from
+their weighted centroids and total weights,
+
+    d(A, B) = w_A * w_B / (w_A + w_B) * ||c_A - c_B||^2
+
+the increase of the within-cluster sum of squares by merging them.
+
+https://en.wikipedia.org/wiki/Ward%27s_method
+https://en.wikipedia.org/wiki/Nearest-neighbor_chain_algorithm
+
+    Typical Usage:
+
+    my_ward = Ward(n_clusters=5).fit(colors, sample_weight=counts)
+"""
+
+import logging
+import numpy as np
+
+from colorkeys import kmeans
+
+logger = logging.getLogger(__name__)
+
+
+class Ward:
+    """A class for weighted Ward clustering with an sklearn.cluster-like interface.
+
+    Attributes:
+        n_clusters (int): Number of clusters requested.
+        cluster_centers_ (numpy.ndarray): Weighted centroids of the clusters.
+        labels_ (numpy.ndarray): Cluster label of each point.
+        merges_ (numpy.ndarray): Merges of the full hierarchy, one row
+            [a, b, distance] per merge of cluster b into cluster a (each named by
+            a point), in ascending order of distance.
+    """
+    def __init__(self, n_clusters):
+        """Init Ward.
+
+        Args:
+            n_clusters (int): Number of clusters requested.
+        """
+        self.n_clusters = n_clusters
+        self.cluster_centers_ = None
+        self.labels_ = None
+        self.merges_ = None
+
+    def fit(self, X, sample_weight=None):
+        """Fit clusters.
+
+        Args:
+            X (numpy.ndarray): Data, one row per point.
+            sample_weight (numpy.ndarray): Weight of each point. Default None
+                weighs points equally.
+
+        Returns:
+            self (colorkeys.ward.Ward): Fitted instance.
+
+        Raises:
+            ValueError: fewer points than clusters.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[0] < self.n_clusters:
+            raise ValueError(f"{X.shape[0]} points, fewer than {self.n_clusters} clusters")
+        if sample_weight is None:
+            w = np.ones(X.shape[0])
+        else:
+            w = np.asarray(sample_weight, dtype=np.float64)
+        self.merges_ = get_merges(X, w)
+        self.labels_ = get_labels(self.merges_, X.shape[0], self.n_clusters)
+        sums, totals = kmeans.get_sums(X, w, self.labels_, self.n_clusters)
+        self.cluster_centers_ = sums / totals[:, None]
+        logger.debug(f"{X.shape[0]} points, {self.n_clusters} clusters")
+        return self
+
+    def fit_predict(self, X, sample_weight=None):
+        """Fit clusters and return cluster label of each point."""
+        return self.fit(X, sample_weight=sample_weight).labels_
+
+
+def get_merges(X, w):
+    """Get merges of the full Ward hierarchy, by nearest-neighbor chain.
+
+    Args:
+        X (numpy.ndarray): Data, one row per point.
+        w (numpy.ndarray): Weight of each point.
+
+    Returns:
+        merges (numpy.ndarray): One row [a, b, distance] per merge of cluster b
+            into cluster a, in ascending order of distance.
+    """
+    n = X.shape[0]
+    centers = X.copy()
+    weights = w.copy()
+    active = np.ones(n, dtype=bool)
+    merges = np.empty((n - 1, 3))
+    chain = []
+    for i in range(n - 1):
+        if not chain:
+            chain.append(int(np.argmax(active)))
+        # Grow the chain by nearest neighbors until two clusters are mutual
+        # nearest neighbors, preferring the previous cluster of the chain on ties.
+        while True:
+            a = chain[-1]
+            dists = get_ward_dists(centers, weights, a)
+            dists[~active] = np.inf
+            dists[a] = np.inf
+            b = int(np.argmin(dists))
+            if len(chain) > 1 and dists[chain[-2]] <= dists[b]:
+                b = chain[-2]
+                break
+            chain.append(b)
+        del chain[-2:]
+        total = weights[a] + weights[b]
+        centers[a] = (weights[a] * centers[a] + weights[b] * centers[b]) / total
+        weights[a] = total
+        active[b] = False
+        merges[i] = a, b, dists[b]
+    # Merges of a reducible linkage sorted by distance form the same hierarchy.
+    return merges[np.argsort(merges[:, 2], kind="stable")]
+
+
+def get_ward_dists(centers, weights, i):
+    """Get Ward distance of cluster i to each cluster.
+
+    Args:
+        centers (numpy.ndarray): Weighted centroid of each cluster.
+        weights (numpy.ndarray): Total weight of each cluster.
+        i (int): Index of cluster.
+
+    Returns:
+        dists (numpy.ndarray): Increase of the within-cluster sum of squares by
+            merging cluster i with each cluster.
+    """
+    sq_dists = ((centers - centers[i]) ** 2).sum(axis=1)
+    return weights[i] * weights / (weights[i] + weights) * sq_dists
+
+
+def get_labels(merges, n, n_clusters):
+    """Get cluster label of each point, cutting the hierarchy at n_clusters.
+
+    Args:
+        merges (numpy.ndarray): Merges in ascending order of distance, from
+            get_merges().
+        n (int): Number of points.
+        n_clusters (int): Number of clusters.
+
+    Returns:
+        labels (numpy.ndarray): Cluster label of each point, 0 to n_clusters - 1.
+    """
+    parent = np.arange(n)
+    for a, b, _ in merges[:n - n_clusters]:
+        parent[int(b)] = int(a)
+
+    # Merged clusters keep the name of a point, so follow names to the roots by
+    # pointer jumping.
+    roots = parent
+    while True:
+        roots_new = roots[roots]
+        if np.array_equal(roots_new, roots):
+            break
+        roots = roots_new
+    _, labels = np.unique(roots, return_inverse=True)
+    return labels
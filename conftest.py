@@ -8,6 +8,7 @@ from colorkeys.centroids import Clust
 from colorkeys import cli
 from colorkeys.histogram import Hist
 from colorkeys.colorkeys import ColorKey
+from colorkeys.planner import Planner
 
 collect_ignore = ["setup.py"]
 testimg = "tests/fixture-01.png"
@@ -60,3 +61,20 @@ def myhist():
 @pytest.fixture(scope="session")
 def mycolorkey():
     return ColorKey(testimg, "mbkmeans", 5, colorspace="RGB")
+
+
+@pytest.fixture(scope="session")
+def myplanner():
+    return Planner(testimg, ["kmeans", "mbkmeans"], ["RGB", "HSV"], 5)
+
+
+@pytest.fixture(scope="session")
+def myclust_sampled():
+    a = Artwork(testimg)
+    return Clust(a.img, "mbkmeans", 5, sample_pixels=1000, random_state=0)
+
+
+@pytest.fixture(scope="session")
+def myclust_quantized():
+    a = Artwork(testimg)
+    return Clust(a.img, "kmeans", 5, quantize_bits=5)
@@ -45,10 +45,12 @@ setup(
         "ffmpeg-python",
         "matplotlib",
         "numpy",
+        "Pillow",
         "PyQt5",
         "psutil",
         "scikit-image",
         "scikit-learn",
+        "threadpoolctl",
     ],
     entry_points = {
         "console_scripts": [
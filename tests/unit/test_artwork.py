@@ -2,6 +2,10 @@
 
 import numpy as np
 
+from colorkeys import codecjson
+from colorkeys import source
+from colorkeys.artwork import Artwork
+
 
 def test_filename(myartwork):
     assert myartwork.imgsrc == "tests/fixture-01.png"
@@ -25,3 +29,33 @@ def test_img_width(myartwork):
 
 def test_num_channels(myartwork):
     assert myartwork.num_channels == 3
+
+
+def test_img_rescaled(myartwork):
+    assert myartwork.img_rescaled.shape[:2] == (
+        myartwork.rescaled_height,
+        myartwork.rescaled_width,
+    )
+
+
+def test_filehash(myartwork):
+    assert myartwork.filehash == codecjson.get_filehash(myartwork.imgsrc)
+
+
+def test_max_side(myartwork):
+    for imgsrc in ("tests/fixture-01.jpg", "tests/fixture-01.png"):
+        artwork = Artwork(imgsrc, max_side=30)
+        assert artwork.img.shape == (25, 25, 3)
+        assert artwork.img.dtype == np.uint8
+        assert artwork.filehash == codecjson.get_filehash(imgsrc)
+    frame = Artwork("frame", img=myartwork.img, max_side=50)
+    assert frame.img.shape == (50, 50, 3)
+    assert frame.filehash == Artwork("frame", img=myartwork.img).filehash
+
+
+def test_downscale():
+    img = np.arange(5 * 4, dtype=np.uint8).reshape(5, 4, 1)
+    assert source.get_size(4, 5, 2) == (1, 1)
+    assert source.downscale(img, 5) is img
+    assert source.downscale(img, 2).tolist() == [[[5]]]
+    assert source.downscale(img.astype(float), 3)[:, :, 0].tolist() == [[2.5, 4.5], [10.5, 12.5]]
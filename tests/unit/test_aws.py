@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+
+from colorkeys import aws
+from colorkeys.constants import _const as CONSTANTS
+from colorkeys.querycache import QueryCache
+
+
+class FakeClient:
+    """DynamoDB client leaving the last item of each first request unprocessed."""
+    def __init__(self):
+        self.items = []
+        self.num_requests = 0
+
+    def batch_write_item(self, RequestItems):
+        self.num_requests += 1
+        (table, requests), = RequestItems.items()
+        if len(requests) > 1:
+            requests, unprocessed = requests[:-1], requests[-1:]
+        else:
+            unprocessed = []
+        self.items.extend(i["PutRequest"]["Item"] for i in requests)
+        return {"UnprocessedItems": {table: unprocessed} if unprocessed else {}}
+
+    def batch_get_item(self, RequestItems):
+        (table, request), = RequestItems.items()
+        keys = {(i["filehash"]["S"], i["selector"]["S"]) for i in self.items}
+        found = [i for i in request["Keys"] if (i["filehash"]["S"], i["selector"]["S"]) in keys]
+        return {"Responses": {table: found}}
+
+
+class FakeCache:
+    """Query cache recording the items put."""
+    def __init__(self):
+        self.items = []
+
+    def put_items(self, items):
+        self.items.extend(items)
+
+
+def get_colorkey(i):
+    return {
+        "filehash": f"{i:016x}",
+        "histogram": {"algo": "kmeans", "colorspace": "RGB", "n_clusters": 5},
+        "cpu": 1024,
+        "memory": 2048,
+        "timestamp": "2022-01-01T00:00:00+00:00",
+    }
+
+
+def test_get_batches():
+    colorkeys = [get_colorkey(0)] + [get_colorkey(i) for i in range(30)] + [get_colorkey(3)]
+    batches = list(aws.get_batches(colorkeys))
+    assert [len(i) for i in batches] == [CONSTANTS().DYNAMODB_BATCH_SIZE, 5]
+    assert batches[0][0]["selector"] == "kmeans#RGB#5#1024#2048#2022-01-01T00:00:00+00:00"
+
+
+def test_load_dynamodb(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(aws, "get_dynamodb_client", lambda site: client)
+    colorkeys = [get_colorkey(i) for i in range(60)]
+    assert aws.load_dynamodb("local", "test", colorkeys, workers=2) == 60
+    assert sorted(i["filehash"]["S"] for i in client.items) == [f"{i:016x}" for i in range(60)]
+    assert client.num_requests > 3
+
+
+def test_load_dynamodb_failed_uncached(monkeypatch):
+    class FailingClient(FakeClient):
+        def batch_write_item(self, RequestItems):
+            (table, requests), = RequestItems.items()
+            return {"UnprocessedItems": {table: requests}}
+
+    monkeypatch.setattr(aws, "get_dynamodb_client", lambda site: FailingClient())
+    monkeypatch.setattr(aws.time, "sleep", lambda secs: None)
+    my_cache = FakeCache()
+    with pytest.raises(RuntimeError):
+        aws.load_dynamodb("local", "test", [get_colorkey(i) for i in range(5)], cache=my_cache)
+    assert my_cache.items == []
+
+
+def test_load_dynamodb_existing(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setattr(aws, "get_dynamodb_client", lambda site: client)
+    aws.load_dynamodb("local", "test", [get_colorkey(i) for i in range(10)])
+    colorkeys = [get_colorkey(i) for i in range(20)]
+    colorkeys[0]["extra"] = "changed"  # Same key, first write wins.
+    my_cache = FakeCache()
+    assert aws.load_dynamodb("local", "test", colorkeys, cache=my_cache) == 10
+    assert len(client.items) == 20
+    assert all("extra" not in i for i in client.items)
+    assert [i["filehash"] for i in my_cache.items] == [f"{i:016x}" for i in range(10, 20)]
+
+
+@pytest.mark.skipif("DYNAMODB_URL_LOCAL" not in os.environ, reason="local DynamoDB endpoint not set")
+def test_load_dynamodb_local():
+    client = aws.get_dynamodb_client("local")
+    table = f"colorkeys-test-{os.getpid()}"
+    client.create_table(
+        TableName = table,
+        KeySchema = [
+            {"AttributeName": "filehash", "KeyType": "HASH"},
+            {"AttributeName": "selector", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions = [
+            {"AttributeName": "filehash", "AttributeType": "S"},
+            {"AttributeName": "selector", "AttributeType": "S"},
+        ],
+        BillingMode = "PAY_PER_REQUEST",
+    )
+    try:
+        colorkeys = [get_colorkey(i) for i in range(60)]
+        colorkeys[40]["extra"] = "changed"
+        colorkeys[40]["filehash"] = colorkeys[0]["filehash"]  # Same key, another batch.
+        assert aws.load_dynamodb("local", table, colorkeys, workers=4) == 59
+        colorkeys = [get_colorkey(i) for i in range(70)]
+        colorkeys[0]["extra"] = "changed"
+        assert aws.load_dynamodb("local", table, colorkeys, workers=4) == 11  # 40 and 60-69.
+        items = client.scan(TableName=table)["Items"]
+        assert len(items) == 70
+        assert all("extra" not in i for i in items)
+    finally:
+        client.delete_table(TableName=table)
+
+
+class FakePaginator:
+    """Query paginator returning two pages of one item per filehash."""
+    def paginate(self, **kwargs):
+        values = kwargs["ExpressionAttributeValues"]
+        for i in range(2):
+            item = {
+                "filehash": values[":filehash"],
+                "selector": {"S": f"{values[':selector']['S']}{i}"},
+                "memory": {"N": "2048"},
+            }
+            yield {"Items": [item]}
+
+
+class FakeQueryClient:
+    def get_paginator(self, operation_name):
+        return FakePaginator()
+
+
+def test_query_many_dynamodb(monkeypatch):
+    monkeypatch.setattr(aws, "get_dynamodb_client", lambda site: FakeQueryClient())
+    filehashes = [f"{i:016x}" for i in range(20)]
+    items = aws.query_many_dynamodb("local", "test", filehashes, "kmeans", "RGB", 5, workers=4)
+    items = list(items)
+    assert [i["filehash"] for i in items[::2]] == filehashes
+    assert items[1]["selector"] == "kmeans#RGB#5#1"
+    assert aws.replace_decimals(items[0])["memory"] == 2048
+
+
+def test_query_many_dynamodb_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(aws, "get_dynamodb_client", lambda site: FakeQueryClient())
+    filehashes = [f"{i:016x}" for i in range(20)]
+    with QueryCache(tmp_path / "query.sqlite") as my_cache:
+        items = list(aws.query_many_dynamodb("local", "test", filehashes, "kmeans", "RGB", 5, cache=my_cache))
+        monkeypatch.setattr(aws, "get_dynamodb_client", lambda site: None)
+        items_cached = list(aws.query_many_dynamodb("local", "test", filehashes, "kmeans", "RGB", 5, cache=my_cache))
+        assert items_cached == items
+        assert my_cache.hits == 20
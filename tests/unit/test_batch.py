@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+
+from colorkeys import batch
+
+
+def test_get_size():
+    assert batch.get_size("tests/fixture-01.png") > 0
+    assert batch.get_size("https://example.com/a.png") > batch.get_size("tests/fixture-01.png")
+
+
+def test_run_pool():
+    imgsrcs = ["tests/fixture-01.jpg", "tests/missing.png", "tests/fixture-01.png"]
+    analysis_kwargs = {
+        "algos": ["mbkmeans"],
+        "colorspaces": ["RGB", "HSV"],
+        "num_clusters": 5,
+        "epoch_seconds": "12345678",
+    }
+    results = list(batch.run_pool(imgsrcs, 2, analysis_kwargs))
+    assert [i for i, _ in results] == imgsrcs
+    assert [len(objs) for _, objs in results] == [2, 0, 2]
+    assert results[0][1][0]["filename"] == "fixture-01.jpg"
+    assert list(batch.run_pool([], 2, analysis_kwargs)) == []
+
+
+def test_run_pool_stream():
+    imgsrcs = ["tests/fixture-01.png", "tests/fixture-01.jpg", "tests/fixture-01.png"]
+    analysis_kwargs = {
+        "algos": ["mbkmeans"],
+        "colorspaces": ["RGB"],
+        "num_clusters": 5,
+        "epoch_seconds": "12345678",
+    }
+    results = batch.run_pool(imgsrcs, 2, analysis_kwargs)
+    assert next(results)[0] == "tests/fixture-01.png"
+    assert [i for i, _ in results] == imgsrcs[1:]
+
+
+def test_run_pool_worker_died(monkeypatch, tmp_path):
+    poison = str(tmp_path / "poison.png")
+    shutil.copy("tests/fixture-01.png", poison)
+    imgsrcs = ["tests/fixture-01.png", "tests/fixture-01.jpg"] * 3 + [poison]
+    analysis_kwargs = {
+        "algos": ["mbkmeans"],
+        "colorspaces": ["RGB"],
+        "num_clusters": 5,
+        "epoch_seconds": "12345678",
+    }
+    analyse = batch.analyse
+
+    def analyse_or_die(imgsrc, **kwargs):
+        if imgsrc == poison:
+            os._exit(1)
+        return analyse(imgsrc, **kwargs)
+
+    # Worker processes are forked, so they inherit the patch.
+    monkeypatch.setattr(batch, "analyse", analyse_or_die)
+    results = list(batch.run_pool(imgsrcs, 2, analysis_kwargs))
+    assert [i for i, _ in results] == imgsrcs
+    assert [len(objs) for _, objs in results] == [1] * 6 + [0]
+
+
+def test_prefetch():
+    imgsrcs = ["tests/fixture-01.jpg", "tests/fixture-01.png"] * 3
+    reads = list(batch.prefetch(imgsrcs, 2, 2))
+    assert [i for i, _ in reads] == imgsrcs
+    assert all(a.imgsrc == i for i, a in reads)
+    assert reads[0][1].filehash == reads[2][1].filehash != reads[1][1].filehash
+
+
+def test_reuse(mycolorkey):
+    palettes, objs = batch.reuse("tests/fixture-01.jpg", [mycolorkey], "12345678")
+    assert palettes[0].hist is mycolorkey.hist
+    assert objs[0]["filename"] == "fixture-01.jpg"
+    assert objs[0]["reused_from"] == "fixture-01.png"
+    assert objs[0]["filehash"] != mycolorkey.filehash
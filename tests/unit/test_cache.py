@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+import json
+
+from colorkeys.cache import Cache
+from colorkeys.cache import get_entry
+from colorkeys.planner import Planner
+
+testimg = "tests/fixture-01.png"
+
+
+def test_get_key(tmp_path):
+    my_cache = Cache(tmp_path)
+    key = my_cache.get_key("0", "kmeans", "RGB", 5, random_state=0)
+    assert key == my_cache.get_key("0", "kmeans", "RGB", 5, random_state=0)
+    assert key != my_cache.get_key("0", "kmeans", "RGB", 5, random_state=1)
+    assert key != Cache(tmp_path, version="1").get_key("0", "kmeans", "RGB", 5, random_state=0)
+
+
+def test_put_get(tmp_path, mycolorkey):
+    my_cache = Cache(tmp_path)
+    assert my_cache.get("a" * 32) is None
+    my_cache.put("a" * 32, get_entry(mycolorkey.hist))
+    assert my_cache.get("a" * 32)["hist_centroids"] == get_entry(mycolorkey.hist)["hist_centroids"]
+    assert (my_cache.hits, my_cache.misses) == (1, 1)
+    assert Cache(tmp_path, refresh=True).get("a" * 32) is None
+
+
+def test_evict(tmp_path, mycolorkey):
+    entry = get_entry(mycolorkey.hist)
+    my_cache = Cache(tmp_path, max_bytes=1000)
+    for i in range(10):
+        my_cache.put(f"{i:032x}", entry)
+    assert len(list(tmp_path.glob("*/*.json"))) < 10
+    assert my_cache.get(f"{9:032x}") is not None
+
+
+def test_put_overwrite(tmp_path, mycolorkey):
+    entry = get_entry(mycolorkey.hist)
+    my_cache = Cache(tmp_path, max_bytes=2 * len(json.dumps(entry)) + 10)
+    my_cache.put("a" * 32, entry)
+    my_cache.put("b" * 32, entry)
+    for _ in range(3):
+        my_cache.put("a" * 32, entry)
+    assert my_cache.get("b" * 32) is not None
+
+
+def test_planner_cached(tmp_path):
+    my_cache = Cache(tmp_path)
+    clust_kwargs = {"random_state": 0}
+    args = (testimg, ["kmeans"], ["RGB", "HSV"], 5)
+    palettes = Planner(*args, cache=my_cache, clust_kwargs=clust_kwargs).run()
+    palettes_cached = Planner(*args, cache=my_cache, clust_kwargs=clust_kwargs).run()
+    assert my_cache.hits == 2
+    assert [i.hist.hist_centroids for i in palettes_cached] == [
+        get_entry(i.hist)["hist_centroids"] for i in palettes
+    ]
+    assert palettes_cached[0].hist.hist_bar.shape == palettes[0].hist.hist_bar.shape
@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 
+import numpy as np
+
+from colorkeys import centroids
 from sklearn import cluster
+from sklearn import metrics
 
 
 def test_clust(myclust):
@@ -9,3 +13,154 @@ def test_clust(myclust):
 
 def test_num_clusters(myclust):
     assert myclust.num_clusters == 5
+
+
+def test_labels(myclust):
+    assert myclust.labels.shape == (100 * 100,)
+
+
+def test_labels_sampled(myclust_sampled):
+    assert myclust_sampled.labels.shape == (100 * 100,)
+    assert myclust_sampled.labels.max() < 5
+
+
+def test_sample(myartwork):
+    rng = np.random.default_rng(0)
+    assert centroids.sample_uniform(myartwork.img, 1000, rng).shape == (1000, 3)
+    assert centroids.sample_tile(myartwork.img, 1024, rng).shape == (1024, 3)
+    for n in (1000, 100):
+        assert len(centroids.sample_tile(myartwork.img, n, rng)) == n
+    assert centroids.sample_reservoir(
+        centroids.iter_chunks(myartwork.img, chunk_pixels=999), 1000, rng
+    ).shape == (1000, 3)
+
+
+def test_assign_labels():
+    img = np.array([[0, 0, 0], [1, 1, 1], [0.9, 0.9, 0.8]])
+    cents = np.array([[1, 1, 1], [0, 0, 0]])
+    assert centroids.assign_labels(img, cents, chunk_pixels=2).tolist() == [1, 0, 0]
+
+
+def test_label_weights_quantized(myclust_quantized):
+    assert myclust_quantized.label_weights.sum() == 100 * 100
+    assert myclust_quantized.labels.shape == myclust_quantized.label_weights.shape
+
+
+def test_quantize():
+    img = np.array([[0, 0, 0], [1, 2, 3], [255, 255, 255]], dtype=np.uint8)
+    colors, counts = centroids.quantize(img, 5)
+    assert counts.tolist() == [2, 1]
+    assert colors.tolist() == [[0.5, 1, 1.5], [255, 255, 255]]
+
+
+def test_quantize_chunks():
+    img = np.random.default_rng(0).random((1000, 3))
+    weights = np.arange(1000)
+    colors, counts = centroids.quantize(img, 4, weights=weights)
+    colors_chunks, counts_chunks = centroids.quantize(img, 4, weights=weights, chunk_pixels=64)
+    assert np.array_equal(counts, counts_chunks)
+    assert np.allclose(colors, colors_chunks)
+
+
+def test_quantized_few_colors():
+    img = np.zeros((100, 100, 3), dtype=np.uint8)
+    img[:, 50:] = 255
+    for algo in ("kmeans", "mbkmeans", "npkmeans"):
+        clust = centroids.Clust(img, algo, 5, quantize_bits=5, random_state=0)
+        assert clust.centroids.shape == (5, 3)
+        assert sorted(np.bincount(clust.labels, weights=clust.label_weights, minlength=5)) == [0, 0, 0, 5000, 5000]
+
+
+def test_fit_view_unchanged(myartwork):
+    img = myartwork.img.astype(np.float32) / 255
+    expected = img.copy()
+    num_pixels = img.shape[0] * img.shape[1]
+    for method in ("uniform", "tile"):
+        centroids.Clust(img, "kmeans", 5, sample_pixels=num_pixels, sample_method=method)
+        assert np.array_equal(img, expected)
+
+
+def test_reduce_colors():
+    colors, counts = centroids.quantize(np.arange(256, dtype=np.uint8).repeat(3).reshape(-1, 3), 7)
+    reduced, reduced_counts = centroids.reduce_colors(colors / 255, counts, 16)
+    assert reduced.shape == (16, 3)
+    assert reduced_counts.sum() == 256
+    assert np.allclose(reduced[0] * 255, 7.5)
+
+
+def test_hac(myartwork):
+    clust = centroids.Clust(myartwork.img, "hac", 5)
+    assert clust.label_weights.sum() == myartwork.img.shape[0] * myartwork.img.shape[1]
+    assert clust.labels.shape == clust.label_weights.shape
+    assert clust.centroids.shape == (5, 3)
+
+
+def test_hac_few_colors():
+    img = np.zeros((100, 100, 3), dtype=np.uint8)
+    clust = centroids.Clust(img, "hac", 5)
+    assert clust.centroids.shape == (5, 3)
+    assert clust.label_weights.sum() == 100 * 100
+    img[:, 50:] = 255
+    clust = centroids.Clust(img, "hac", 5, metrics=True)
+    shares = np.bincount(clust.labels, weights=clust.label_weights, minlength=5)
+    assert sorted(shares) == [0, 0, 0, 5000, 5000]
+
+
+def test_warm_start(myartwork):
+    img = myartwork.img / 255
+    for algo in ("kmeans", "mbkmeans", "npkmeans"):
+        cold = centroids.Clust(img, algo, 5, random_state=0)
+        warm = centroids.Clust(img, algo, 5, random_state=0, init_centroids=cold.centroids)
+        assert warm.warm_start
+        assert not cold.warm_start
+        assert centroids.get_drift(cold.centroids, warm.centroids) < 0.1
+
+
+def test_warm_start_fallback(myartwork):
+    img = myartwork.img / 255
+    init = np.full((5, 3), 10.0)  # Far outside the image colors.
+    clust = centroids.Clust(img, "kmeans", 5, random_state=0, init_centroids=init)
+    assert not clust.warm_start
+    assert centroids.Clust(img, "kmeans", 5, init_centroids=np.zeros((6, 3))).warm_start is False
+
+
+def test_warm_start_fewer(myartwork):
+    img = myartwork.img / 255
+    fewer = centroids.Clust(img, "kmeans", 3, random_state=0)
+    clust = centroids.Clust(
+        img,
+        "kmeans",
+        5,
+        random_state = 0,
+        init_centroids = fewer.centroids,
+        partial_fit = False,
+        max_drift = None,
+    )
+    assert clust.warm_start
+    assert clust.centroids.shape == (5, 3)
+
+
+def test_metrics(myartwork):
+    img = myartwork.img / 255
+    clust = centroids.Clust(img, "kmeans", 5, random_state=0, metrics=True)
+    assert clust.inertia > 0
+    assert -1 <= clust.silhouette <= 1
+    assert centroids.Clust(img, "kmeans", 5, random_state=0).inertia is None
+
+
+def test_get_weighted_silhouette():
+    rng = np.random.default_rng(0)
+    X = rng.random((60, 3))
+    labels = rng.integers(0, 3, 60)
+    weights = rng.integers(1, 4, 60)
+    expected = metrics.silhouette_score(np.repeat(X, weights, axis=0), np.repeat(labels, weights))
+    assert np.isclose(centroids.get_weighted_silhouette(X, labels, weights), expected)
+    assert np.isclose(centroids.get_weighted_silhouette(X, labels, np.ones(60)), metrics.silhouette_score(X, labels))
+    assert centroids.get_weighted_silhouette(X, np.zeros(60, dtype=int), weights) is None
+
+
+def test_get_inertia():
+    img = np.array([[0.0, 0, 0], [1, 0, 0], [4, 0, 0]])
+    cents = np.array([[0.0, 0, 0], [4, 0, 0]])
+    assert centroids.get_inertia(img, cents) == 1 / 3
+    assert centroids.get_inertia(img, cents, np.array([1, 2, 1])) == 0.5
@@ -1,18 +1,53 @@
 #!/usr/bin/python3
 
+import argparse
+import pytest
+
+from colorkeys import cli
+
 
 def test_get_command(myargs):
     assert myargs == {
         "algos": ["mbkmeans"],
+        "analysis_max_side": None,
+        "assign_pixels": None,
         "aws": False,
+        "cache_dir": None,
+        "cache_size": 256,
         "colorspaces": ["RGB"],
         "debug": True,
         "debug_api": None,
+        "end": None,
+        "dtype": "float32",
         "export": False,
+        "export_format": "gzip",
         "images": [["tests/fixture-01.png"], ["tests/fixture-01.png"]],
+        "jobs": 1,
         "json": False,
+        "keyframes": False,
         "logid": None,
-        "num_clusters": 5,
+        "no_cache": False,
+        "num_clusters": [5],
         "plot": False,
+        "prefetch": 0,
         "prefix": "/tmp/logs",
+        "quantize_bits": None,
+        "readers": 1,
+        "refresh": False,
+        "sample_method": "uniform",
+        "sample_pixels": None,
+        "seed": None,
+        "shot_threshold": None,
+        "spf": 1,
+        "start": "00:00:00",
+        "warm_start": False,
     }
+
+
+def test_get_num_clusters():
+    assert cli.get_num_clusters("5") == [5]
+    assert cli.get_num_clusters("3,5,7") == [3, 5, 7]
+    assert cli.get_num_clusters("3-6") == [3, 4, 5, 6]
+    assert cli.get_num_clusters("3-12:3") == [3, 6, 9, 12]
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli.get_num_clusters("0-3")
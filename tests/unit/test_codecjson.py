@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import pickle
+import pytest
+
+from colorkeys import codecjson
+
+
+def test_get_run_context():
+    context = codecjson.get_run_context("12345678")
+    assert codecjson.get_run_context("12345678") is context
+    assert codecjson.get_run_context("87654321") is not context
+    assert context.task_info["task_hash"] == "12345678"
+    assert context.version
+
+
+def test_run_context_pickle():
+    context = codecjson.RunContext("12345678")
+    context_worker = pickle.loads(pickle.dumps(context))
+    assert context_worker.githash == context.githash
+    assert context_worker.task_info.keys() == context.task_info.keys()
+
+
+def test_compile(mycolorkey):
+    context = codecjson.RunContext("12345678")
+    obj = codecjson.compile(mycolorkey, "12345678", context=context, filehash="0")
+    assert obj["githash"] == context.githash
+    assert obj["task_hash"] == "12345678"
+    assert obj["histogram"]["n_clusters"] == mycolorkey.hist.num_clusters
+
+
+def test_iter_decode():
+    objs = [{"a": 1, "b": [1.5, "x]"]}, {"c": {"d": None}}]
+    streams = [
+        json.dumps(objs),
+        json.dumps(objs, indent=2),
+        "\n".join(json.dumps(i) for i in objs) + "\n",
+    ]
+    for str_ in streams:
+        f = io.BytesIO(str_.encode("utf-8"))
+        assert list(codecjson.iter_decode(f, chunk_size=7)) == [
+            codecjson.decode(json.dumps(i)) for i in objs
+        ]
+
+
+def test_iter_decode_malformed():
+    objs = [{"a": 1}, {"b": "x"}, {"c": True}]
+    lines = [json.dumps(objs[0]), '{"b": tru}'] + [json.dumps(objs[2])] * 10000
+    f = io.BytesIO("\n".join(lines).encode("utf-8"))
+    itr = codecjson.iter_decode(f, chunk_size=64)
+    assert next(itr) == objs[0]
+    with pytest.raises(json.JSONDecodeError):
+        next(itr)
+    assert f.tell() <= 128
@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 
+import gzip
+import json
+import os
+import zipfile
+
 from colorkeys import filepath
 from colorkeys.constants import _const as CONSTANTS
 
@@ -65,3 +70,52 @@ def test_get_files_shell_glob(myfilepaths_shell_glob):
         "tests/fixture-01.jpg",
         "tests/fixture-01.png",
     ]
+
+
+def test_ark_writer(tmp_path):
+    objs = [{"a": 1}, {"b": [2, 3]}]
+    for compression in CONSTANTS().EXPORT_COMPRESSIONS:
+        with filepath.ArkWriter(dest_dir=tmp_path, basename="0", compression=compression) as my_ark:
+            for obj in objs:
+                my_ark.write(obj)
+        assert my_ark.num_records == 2
+        if compression == "zip":
+            with zipfile.ZipFile(my_ark.path) as zf:
+                assert zf.namelist() == ["0.colorkeys.ndjson"]
+                lines = zf.read("0.colorkeys.ndjson").splitlines()
+        else:
+            with gzip.open(my_ark.path) as f:
+                lines = f.read().splitlines()
+        assert [json.loads(i) for i in lines] == objs
+
+
+def test_iter_records_truncated(tmp_path):
+    objs = [{"n": i} for i in range(100)]
+    with filepath.ArkWriter(dest_dir=tmp_path, basename="0") as my_ark:
+        for obj in objs[:50]:
+            my_ark.write(obj)
+        my_ark.flush()
+        for obj in objs[50:]:
+            my_ark.write(obj)
+        my_ark.flush()
+        # Crash before close, with the last flush cut short.
+        with open(my_ark.path, "r+b") as f:
+            f.truncate(os.path.getsize(my_ark.path) - 10)
+        records = list(filepath.iter_records(my_ark.path))
+    assert 50 <= len(records) < len(objs)
+    assert records == objs[:len(records)]
+
+
+def test_stream_records(tmp_path):
+    objs = [{"n": i} for i in range(50)]
+    with filepath.ArkWriter(dest_dir=tmp_path, basename="0", compression="zip") as my_ark:
+        for obj in objs[:20]:
+            my_ark.write(obj)
+    with filepath.ArkWriter(dest_dir=tmp_path, basename="1", compression="gzip") as my_ark:
+        for obj in objs[20:40]:
+            my_ark.write(obj)
+    (tmp_path / "2.colorkeys.json").write_text(json.dumps(objs[40:]))
+    filenames = filepath.get_record_files([[f"{tmp_path}/*"]])
+    assert len(filenames) == 3
+    records = filepath.stream_records(filenames, readers=2, queue_size=4)
+    assert sorted(i["n"] for i in records) == list(range(50))
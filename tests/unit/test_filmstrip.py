@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import os
+import pytest
+
+from colorkeys import filmstrip
+
+
+@pytest.mark.parametrize("start,end,spf,expected", [
+    (0, 10, 2, [0, 2, 4, 6, 8]),
+    (5, 15, 3, [5, 8, 11]),
+    (0, 1, 2, []),
+])
+def test_get_seek_positions(start, end, spf, expected):
+    assert filmstrip.get_seek_positions(start, end, spf) == expected
+
+
+@pytest.mark.parametrize("start,end,spf,num_segments", [
+    (0, 120, 1, 4),
+    (5, 100, 3, 7),
+    (0, 10, 2, 8),
+])
+def test_get_segments(start, end, spf, num_segments):
+    segments = filmstrip.get_segments(start, end, spf, num_segments)
+    assert len(segments) == min(num_segments, len(filmstrip.get_seek_positions(start, end, spf)))
+    positions = [
+        pos
+        for seg_start, seg_end in segments
+        for pos in filmstrip.get_seek_positions(seg_start, seg_end, spf)
+    ]
+    assert positions == filmstrip.get_seek_positions(start, end, spf)
+
+
+def test_get_num_segments():
+    assert filmstrip.get_num_segments(10, 4) == 4
+    assert filmstrip.get_num_segments(1000, 4) == 16
+
+
+def iter_segment_or_fail(video_file, seg_start, seg_end, spf):
+    """Iterate positions of segment, failing the second segment and killing
+    the worker of the fourth."""
+    if seg_start == 60:
+        raise ValueError("Bad segment")
+    if seg_start == 180:
+        os._exit(1)
+    for pos in filmstrip.get_seek_positions(seg_start, seg_end, spf):
+        yield pos, None
+
+
+def test_run_segments_failed(monkeypatch):
+    # Worker processes are forked, so they inherit the patches. Functions
+    # submitted are pickled by name, so are patched by module functions.
+    monkeypatch.setattr(filmstrip, "iter_segment", iter_segment_or_fail)
+    monkeypatch.setattr(
+        filmstrip,
+        "analyse_sequence",
+        lambda video_file, frames, **kwargs: ((pos, None, [{"pos": pos}]) for pos, _ in frames),
+    )
+    assert [i for i, _ in filmstrip.get_segments(0, 300, 1, filmstrip.get_num_segments(300, 2))] == [0, 60, 120, 180, 240]
+    results = list(filmstrip.run_segments("film.mp4", "00:00:00", "00:05:00", 1, 2, {}))
+    assert [pos for pos, _ in results] == list(range(300))
+    failed = [pos for pos, objs in results if not objs]
+    assert failed == list(range(60, 120)) + list(range(180, 240))
+    assert all(objs == [{"pos": pos}] for pos, objs in results if objs)
+
+
+def test_get_frame_label():
+    assert filmstrip.get_frame_label("film", 12) == "film-12.00"
+
+
+@pytest.mark.parametrize("spf,expected", [
+    (None, [0.0, 2.0, 4.5, 5.0, 10.0, 10.5]),
+    (3, [0.0, 4.5, 10.0]),
+    (5, [0.0, 5.0, 10.0]),
+])
+def test_thin_keyframes(spf, expected):
+    assert filmstrip.thin_keyframes([0.0, 2.0, 4.5, 5.0, 10.0, 10.5], spf) == expected
+
+
+def test_get_keyframe_segments():
+    keyframes = [0.0, 2.0, 4.5, 5.0, 10.0, 10.5, 12.0, 15.0]
+    segments = filmstrip.get_keyframe_segments(keyframes, 3, 2)
+    assert segments == [
+        ([0.0, 2.0, 4.5], [0.0, 4.5]),
+        ([10.0, 10.5, 12.0, 15.0], [10.0, 15.0]),
+    ]
+    assert filmstrip.get_keyframe_segments([], 3, 2) == []
+
+
+def test_signature():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (360, 640, 3), dtype=np.uint8)
+    signature = filmstrip.get_signature(frame)
+    assert signature.shape == (512,)
+    assert np.isclose(signature.sum(), 1)
+    assert filmstrip.get_distance(signature, filmstrip.get_signature(frame)) == 0
+    assert filmstrip.get_distance(signature, filmstrip.get_signature(frame // 4)) > 0.5
+    black = filmstrip.get_signature(np.zeros_like(frame))
+    white = filmstrip.get_signature(np.full_like(frame, 255))
+    assert filmstrip.get_distance(black, white) == 1
@@ -2,6 +2,10 @@
 
 import numpy as np
 
+from colorkeys.histogram import Hist
+from colorkeys.histogram import convert_colorspace
+from colorkeys.histogram import convert_dtype
+
 
 def test_num_clusters(myhist):
     assert myhist.num_clusters == 5
@@ -21,3 +25,21 @@ def test_hist_bar(myhist):
 
 def test_hist_bar_height(myhist):
     assert myhist.hist_bar_height == 30
+
+
+def test_convert_dtype(myartwork):
+    assert convert_dtype(myartwork.img, "float32").dtype == np.float32
+    assert convert_dtype(myartwork.img, "uint8").dtype == np.uint8
+
+
+def test_convert_colorspace(myartwork):
+    img = convert_dtype(myartwork.img, "uint8")
+    assert convert_colorspace(img, "HSV").dtype == np.uint8
+    img = convert_dtype(myartwork.img, "float32")
+    assert convert_colorspace(img, "HSV").dtype == np.float32
+
+
+def test_hist_uint8(myartwork):
+    h = Hist(myartwork.img, "kmeans", 5, "HSV", myartwork.rescaled_width, dtype="uint8")
+    assert np.isclose(h.hist.sum(), 1)
+    assert h.centroids.max() <= 1
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from colorkeys.histogram import Hist
+from colorkeys.kmeans import KMeans
+
+
+def test_fit():
+    rng = np.random.default_rng(0)
+    blobs = np.array([[0.1, 0.1, 0.1], [0.5, 0.5, 0.5], [0.9, 0.2, 0.2]])
+    X = np.repeat(blobs, 100, axis=0) + rng.normal(0, 0.01, (300, 3))
+    k = KMeans(3, random_state=0).fit(X)
+    assert np.bincount(k.labels_).tolist() == [100, 100, 100]
+    assert np.allclose(np.sort(k.cluster_centers_, axis=0), np.sort(blobs, axis=0), atol=0.01)
+    assert k.n_iter_ == len(k.iter_times_)
+
+
+def test_fit_weighted():
+    X = np.array([[0, 0, 0], [1, 1, 1], [1, 1, 1.1]])
+    k = KMeans(2, init=X[:2]).fit(X, sample_weight=[1, 3, 1])
+    assert np.allclose(k.cluster_centers_, [[0, 0, 0], [1, 1, 1.025]])
+    assert k.predict([[0.9, 0.9, 0.9]]).tolist() == [1]
+
+
+def test_npkmeans(myartwork):
+    h = Hist(myartwork.img, "npkmeans", 5, "RGB", myartwork.rescaled_width)
+    assert isinstance(h.clust, KMeans)
+    assert h.hist.shape == (5,)
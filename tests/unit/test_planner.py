@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import colorkeys
+
+from colorkeys.planner import Planner
+
+
+def test_stages(myplanner):
+    assert len(myplanner.stages) == 8
+
+
+def test_palette_keys(myplanner):
+    assert myplanner.palette_keys == [
+        ("palette", "kmeans", "RGB", 5),
+        ("palette", "kmeans", "HSV", 5),
+        ("palette", "mbkmeans", "RGB", 5),
+        ("palette", "mbkmeans", "HSV", 5),
+    ]
+
+
+def test_run(myplanner):
+    palettes = myplanner.run()
+    assert all(isinstance(i, colorkeys.colorkeys.ColorKey) for i in palettes)
+    assert [(i.hist.algo, i.hist.colorspace) for i in palettes] == [
+        ("kmeans", "RGB"),
+        ("kmeans", "HSV"),
+        ("mbkmeans", "RGB"),
+        ("mbkmeans", "HSV"),
+    ]
+
+
+def test_run_shared_img(myplanner):
+    palettes = myplanner.run()
+    assert all(i.img is palettes[0].img for i in palettes)
+
+
+def test_sweep():
+    planner = Planner("tests/fixture-01.png", ["kmeans"], ["RGB"], [5, 3, 4, 3])
+    assert planner.stages[("palette", "kmeans", "RGB", 4)].deps[-1] == ("palette", "kmeans", "RGB", 3)
+    palettes = planner.run()
+    assert [i.hist.num_clusters for i in palettes] == [3, 4, 5]
+    assert all(i.hist.inertia is not None for i in palettes)
+    assert [i.hist.warm_start for i in palettes] == [False, True, True]
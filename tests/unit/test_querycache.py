@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+from decimal import Decimal
+
+from colorkeys.querycache import QueryCache
+
+
+def get_item(filehash, selector):
+    return {"filehash": filehash, "selector": selector, "memory": Decimal("2048"), "percent": Decimal("0.5")}
+
+
+def test_get_put(tmp_path):
+    with QueryCache(tmp_path / "query.sqlite") as my_cache:
+        assert my_cache.get("0", "kmeans#RGB#5#") is None
+        my_cache.put("0", "kmeans#RGB#5#", [get_item("0", "kmeans#RGB#5#a")])
+        my_cache.put_items([get_item("0", "kmeans#RGB#5#b"), get_item("0", "kmeans#RGB#50#a")])
+        items = my_cache.get("0", "kmeans#RGB#5#")
+        assert [i["selector"] for i in items] == ["kmeans#RGB#5#a", "kmeans#RGB#5#b"]
+        assert items[0]["percent"] == Decimal("0.5")
+        assert my_cache.get("0", "kmeans#RGB#50#") is None
+        assert (my_cache.hits, my_cache.misses) == (1, 2)
+
+
+def test_ttl(tmp_path):
+    with QueryCache(tmp_path / "query.sqlite", ttl=-1) as my_cache:
+        my_cache.put("0", "kmeans#RGB#5#", [])
+        assert my_cache.get("0", "kmeans#RGB#5#") is None
+
+
+def test_invalidate(tmp_path):
+    with QueryCache(tmp_path / "query.sqlite") as my_cache:
+        my_cache.put("0", "kmeans#RGB#5#", [get_item("0", "kmeans#RGB#5#a")])
+        my_cache.put("1", "kmeans#RGB#5#", [])
+        my_cache.invalidate(["0"])
+        assert my_cache.get("0", "kmeans#RGB#5#") is None
+        assert my_cache.get("1", "kmeans#RGB#5#") == []
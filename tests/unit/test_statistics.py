@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from colorkeys import statistics as colorstats
+
+
+def get_colorkey(i):
+    return {
+        "histogram": {
+            "hist_centroids": [
+                {"percent": 0.6 - i / 100, "color": [i, 2 * i, 3]},
+                {"percent": 0.4 + i / 100, "color": [255 - i, 0, i]},
+            ]
+        }
+    }
+
+
+colorkeys = [get_colorkey(i) for i in range(10)]
+
+
+def test_get_tensor():
+    tensor = colorstats.get_tensor(colorkeys)
+    assert tensor.shape == (10, 2, 4)
+    assert np.allclose(tensor[3, 1], [252, 0, 3, 0.43])
+    with pytest.raises(ValueError):
+        colorstats.get_tensor(colorkeys, 3)
+
+
+def test_cluster_stats():
+    tensor = colorstats.get_tensor(colorkeys)
+    means = colorstats.get_cluster_means(tensor)
+    assert means.shape == (2, 4)
+    assert means[0, 0] == pytest.approx(4.5)
+    assert colorstats.get_cluster_stds(tensor)[0, 2] == 0
+    assert colorstats.get_cluster_percentiles(tensor, [50]).shape == (1, 2, 4)
+
+
+def test_welford():
+    tensor = colorstats.get_tensor(colorkeys)
+    my_welford = colorstats.Welford(2)
+    for chunk in colorstats.iter_tensors(colorkeys, 2, chunk_size=3):
+        my_welford.update(chunk)
+    assert my_welford.count == 10
+    assert np.allclose(my_welford.mean, colorstats.get_cluster_means(tensor))
+    assert np.allclose(my_welford.std, colorstats.get_cluster_stds(tensor))
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+from colorkeys.ward import Ward
+from sklearn import cluster
+from sklearn import metrics
+
+
+def test_fit():
+    X = np.random.default_rng(0).random((300, 3))
+    labels = Ward(5).fit(X).labels_
+    expected = cluster.AgglomerativeClustering(5).fit(X).labels_
+    assert metrics.adjusted_rand_score(labels, expected) == 1
+
+
+def test_fit_weighted():
+    rng = np.random.default_rng(0)
+    X = rng.random((100, 3))
+    w = rng.integers(1, 4, 100)
+    labels = Ward(4).fit(X, sample_weight=w).labels_
+    expected = cluster.AgglomerativeClustering(4).fit(np.repeat(X, w, axis=0)).labels_
+    assert metrics.adjusted_rand_score(np.repeat(labels, w), expected) == 1
+
+
+def test_centers():
+    X = np.array([[0, 0, 0], [0, 0, 1], [1, 1, 1]])
+    k = Ward(2).fit(X, sample_weight=[1, 3, 1])
+    assert sorted(k.cluster_centers_.tolist()) == [[0, 0, 0.75], [1, 1, 1]]
+    assert k.merges_.shape == (2, 3)